@@ -156,4 +156,48 @@ MAX_UPLOAD_SIZE = 52428800
 
 # File upload settings (for books)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Upper bound on (key, value) entries per field in the per-worker
+# autocomplete index used by SearchSuggestionsView
+SEARCH_SUGGESTIONS_MAX_ENTRIES = 500000
+
+# Ebook PDF text extraction (library.pdf_text). When async extraction is off,
+# run `manage.py extract_book_text` periodically instead.
+PDF_EXTRACTION_ASYNC = True
+PDF_EXTRACTION_WORKERS = 2
+
+# Search result caches, catalog version stamps (ETags) and the suggestion
+# change log live here. Run multiple workers only with a cache they all share
+# (Redis, Memcached): a per-process cache would keep serving stale 304s.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'e-lib',
+    }
+}
+
+# Precompressed catalog snapshots under MEDIA_ROOT/catalog (library.snapshots),
+# refreshed shard by shard on a background thread after catalog writes.
+CATALOG_SNAPSHOTS = True
+CATALOG_SNAPSHOTS_ASYNC = True
+
+# Per-worker LRU bound for serialized Book/Video fragments (library.fragments)
+FRAGMENT_CACHE_LOCAL_ENTRIES = 5000
+
+# Days a returned copy stays reserved for the next hold (library.BookHold)
+# before `manage.py expire_holds` passes it on.
+HOLD_PICKUP_DAYS = 3
+
+# Borrows due within this many days get a due-soon reminder
+# (`manage.py send_reminders`, library.reminders).
+REMINDER_DUE_SOON_DAYS = 2
+
+# Returned borrows older than this move from BorrowRecord to ArchivedBorrow
+# (`manage.py archive_borrows`, library.archive).
+BORROW_ARCHIVE_AFTER_DAYS = 180
+
+# Related books kept per book and list, and the seed ordering books that
+# share as many categories (`manage.py build_recommendations`,
+# library.recommendations).
+RECOMMENDATION_NEIGHBOURS = 10
+RECOMMENDATION_SEED = 0
@@ -0,0 +1,91 @@
+"""
+Two-tier borrow history.
+
+BorrowRecord is the hot tier: open borrows plus recently returned ones.
+``archive_returned()`` (run periodically by ``manage.py archive_borrows``)
+moves returned records older than BORROW_ARCHIVE_AFTER_DAYS to the compact
+ArchivedBorrow table in batches, keeping their ids, so active-borrow queries
+and the unique_active_borrow check only ever see the hot set. The helpers
+below read both tiers for history and reports.
+"""
+import heapq
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ArchivedBorrow, Book, BorrowRecord
+
+
+def archive_returned(days=None, batch_size=1000, now=None):
+    """
+    Move returned borrows whose return is older than ``days`` to
+    ArchivedBorrow, ``batch_size`` per transaction. Returns how many moved.
+    """
+    if days is None:
+        days = getattr(settings, 'BORROW_ARCHIVE_AFTER_DAYS', 180)
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # Served by the partial borrow_returned_idx index.
+            rows = list(BorrowRecord.objects.filter(
+                is_returned=True, return_date__lt=cutoff
+            ).order_by('return_date', 'id').values_list(
+                'pk', 'user_id', 'book_id', 'borrowed_date', 'due_date', 'return_date'
+            )[:batch_size])
+            if not rows:
+                return moved
+            ArchivedBorrow.objects.bulk_create([
+                ArchivedBorrow(
+                    id=pk, user_id=user_id, book_id=book_id,
+                    borrowed_date=borrowed_date, due_date=due_date, return_date=return_date,
+                )
+                for pk, user_id, book_id, borrowed_date, due_date, return_date in rows
+            ], ignore_conflicts=True)
+            BorrowRecord.objects.filter(pk__in=[row[0] for row in rows], is_returned=True).delete()
+        moved += len(rows)
+
+
+def merge_by(key, *tiers, reverse=False):
+    """Merge already sorted ``tiers`` into one list ordered by ``key``."""
+    return list(heapq.merge(*tiers, key=key, reverse=reverse))
+
+
+def borrow_counts(book_ids=None):
+    """``Counter({book_id: times borrowed})`` across both tiers."""
+    counts = Counter()
+    for model in (BorrowRecord, ArchivedBorrow):
+        queryset = model.objects.all()
+        if book_ids is not None:
+            queryset = queryset.filter(book_id__in=book_ids)
+        counts.update(dict(queryset.values('book_id').annotate(n=Count('id')).values_list('book_id', 'n')))
+    return counts
+
+
+def most_borrowed(limit=5):
+    """``[{'title', 'borrow_count'}]`` for the most borrowed books, both tiers."""
+    top = borrow_counts().most_common(limit)
+    titles = dict(Book.objects.filter(pk__in=[book_id for book_id, _ in top]).values_list('pk', 'title'))
+    rows = [{'title': titles[book_id], 'borrow_count': n} for book_id, n in top if book_id in titles]
+    if len(rows) < limit:
+        rows += [
+            {'title': title, 'borrow_count': 0}
+            for title in Book.objects.exclude(pk__in=[book_id for book_id, _ in top]).values_list(
+                'title', flat=True
+            )[:limit - len(rows)]
+        ]
+    return rows
+
+
+def recent_borrows(limit=5):
+    """The ``limit`` most recent borrows across both tiers, as dicts."""
+    columns = ('id', 'user__username', 'book__title', 'borrowed_date', 'due_date', 'return_date')
+    tiers = [
+        list(model.objects.order_by('-borrowed_date', '-id').values(*columns)[:limit])
+        for model in (BorrowRecord, ArchivedBorrow)
+    ]
+    return merge_by(lambda row: (row['borrowed_date'], row['id']), *tiers, reverse=True)[:limit]
@@ -0,0 +1,106 @@
+"""
+Resolve several catalog rails in one request.
+
+Category rails are answered together: one query maps the requested names to
+category ids and one windowed query over the Book.categories join table
+returns the newest available books of each category. Search rails go through
+the search index and its cache. Every book id collected along the way, plus
+the explicitly requested uuids, is then loaded with a single
+``WHERE id IN (...) OR book_uuid IN (...)`` query with prefetched categories.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import Book, Category
+from .search import search_books
+from .search_cache import search_cache
+
+
+def _search_ids(query, limit):
+    cache_key = search_cache.key_for(query)
+    if cache_key is None:
+        return []
+    ranked = search_cache.get_ranked(cache_key, limit)
+    if ranked is None:
+        ranked = search_books(query, limit)
+        search_cache.set_ranked(cache_key, ranked, limit)
+    return [book_id for book_id, _ in ranked[:limit]]
+
+
+def _category_ids(category_queries):
+    """
+    ``{key: [book_id, ...]}`` for category rails, newest books first, with
+    the same ``categories__name__icontains`` matching as BookListView.
+    """
+    if not category_queries:
+        return {}
+
+    condition = Q()
+    for query in category_queries:
+        condition |= Q(name__icontains=query['category'])
+    categories = list(Category.objects.filter(condition).values_list('id', 'name'))
+
+    matching = {}
+    for query in category_queries:
+        wanted = query['category'].lower()
+        matching[query['key']] = {cat_id for cat_id, name in categories if wanted in name.lower()}
+
+    all_ids = set().union(*matching.values())
+    if not all_ids:
+        return {query['key']: [] for query in category_queries}
+
+    max_limit = max(query['limit'] for query in category_queries)
+    Membership = Book.categories.through
+    rows = Membership.objects.filter(
+        category_id__in=all_ids,
+        book__is_available=True,
+    ).annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('category_id')],
+            order_by=[F('book__created_at').desc(), F('book_id').desc()],
+        )
+    ).filter(
+        position__lte=max_limit
+    ).values_list('category_id', 'book_id', 'book__created_at')
+
+    per_category = defaultdict(list)
+    for category_id, book_id, created_at in rows:
+        per_category[category_id].append((created_at, book_id))
+
+    results = {}
+    for query in category_queries:
+        merged = {}
+        for category_id in matching[query['key']]:
+            for created_at, book_id in per_category[category_id]:
+                merged[book_id] = created_at
+        ordered = sorted(merged.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        results[query['key']] = [book_id for book_id, _ in ordered[:query['limit']]]
+    return results
+
+
+def resolve_batch(queries, book_uuids):
+    """
+    Returns ``(rails, books, missing)``: book uuids per query key, the
+    books to serialize (each once) and requested uuids that do not exist.
+    """
+    rail_ids = _category_ids([query for query in queries if query.get('category')])
+    for query in queries:
+        if query.get('q'):
+            rail_ids[query['key']] = _search_ids(query['q'], query['limit'])
+
+    wanted_ids = {book_id for ids in rail_ids.values() for book_id in ids}
+    books = Book.objects.filter(
+        Q(id__in=wanted_ids) | Q(book_uuid__in=book_uuids)
+    ).prefetch_related('categories')
+    by_id = {book.id: book for book in books}
+
+    rails = {
+        query['key']: [by_id[book_id].book_uuid for book_id in rail_ids[query['key']] if book_id in by_id]
+        for query in queries
+    }
+    found_uuids = {book.book_uuid for book in by_id.values()}
+    missing = [uuid for uuid in book_uuids if uuid not in found_uuids]
+    return rails, list(by_id.values()), missing
@@ -0,0 +1,183 @@
+"""
+Bulk check-out and check-in for the circulation desk.
+
+A cart is processed with set-based SQL inside one transaction: the books,
+users, active borrows and ready holds involved are each read with a single
+query, copies are taken with one conditional UPDATE per book and put back
+with one ``UPDATE ... CASE`` over all books, new BorrowRecords are inserted
+with bulk_create and returned ones are closed with one conditional UPDATE
+per record. Every item gets its own result; invalid items are reported and
+skipped without failing the rest of the cart.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Book, BookHold, BorrowRecord, OverdueEntry, User, book_rows_updated, user_activity_recorded
+
+
+def _adjust_copies(deltas):
+    """Apply ``{book_id: delta}`` to available_copies in one UPDATE."""
+    deltas = {book_id: delta for book_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    Book.objects.filter(pk__in=deltas).update(available_copies=F('available_copies') + Case(
+        *[When(pk=book_id, then=Value(delta)) for book_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=models.IntegerField(),
+    ))
+    book_rows_updated(deltas)
+
+
+def bulk_borrow(items):
+    """
+    Check out ``items`` (dicts with ``book_uuid``, ``user`` id and ``days``).
+    Returns one result dict per item, in order.
+    """
+    results = [{'index': i, 'book_uuid': item['book_uuid'], 'user': item['user']} for i, item in enumerate(items)]
+    now = timezone.now()
+
+    with transaction.atomic():
+        books = {
+            book.book_uuid: book
+            for book in Book.objects.select_for_update().filter(
+                book_uuid__in={item['book_uuid'] for item in items}
+            ).only('id', 'book_uuid', 'book_type', 'available_copies')
+        }
+        user_ids = set(User.objects.filter(pk__in={item['user'] for item in items}).values_list('pk', flat=True))
+        book_ids = [book.pk for book in books.values()]
+        active = set(BorrowRecord.objects.filter(
+            book_id__in=book_ids, user_id__in=user_ids, is_returned=False
+        ).values_list('user_id', 'book_id'))
+        ready_holds = {
+            (user_id, book_id): pk
+            for pk, user_id, book_id in BookHold.objects.select_for_update().filter(
+                book_id__in=book_ids, user_id__in=user_ids, status=BookHold.READY
+            ).values_list('pk', 'user_id', 'book_id')
+        }
+
+        available = {book.pk: book.available_copies for book in books.values()}
+        taken = Counter()
+        claimed = []
+        from_hold = set()
+        accepted = []
+        for item, result in zip(items, results):
+            book = books.get(item['book_uuid'])
+            error = None
+            if book is None:
+                error = "Book not found"
+            elif item['user'] not in user_ids:
+                error = "User not found"
+            elif book.book_type == 'EBOOK':
+                error = "E-Books cannot be borrowed"
+            elif not 1 <= item['days'] <= 30:
+                error = "Borrowing period must be between 1-30 days"
+            elif (item['user'], book.pk) in active:
+                error = "User already has an active borrow for this book"
+            elif (item['user'], book.pk) in ready_holds:
+                claimed.append(ready_holds.pop((item['user'], book.pk)))
+                from_hold.add((item['user'], book.pk))
+            elif available[book.pk] - taken[book.pk] > 0:
+                taken[book.pk] += 1
+            else:
+                error = "No copies available"
+            if error:
+                result.update(status='error', error=error)
+                continue
+            active.add((item['user'], book.pk))
+            accepted.append((result, BorrowRecord(
+                user_id=item['user'], book_id=book.pk, due_date=now + timedelta(days=item['days'])
+            )))
+
+        if claimed:
+            BookHold.objects.filter(pk__in=claimed).update(status=BookHold.FULFILLED, closed_at=now)
+        # select_for_update() does not lock on SQLite, so a single borrow may
+        # have taken copies since they were read: each decrement only applies
+        # if the copies are still there, like Book.borrow_book's.
+        short = {
+            book_id for book_id, count in taken.items()
+            if not Book.objects.filter(pk=book_id, available_copies__gte=count).update(
+                available_copies=F('available_copies') - count
+            )
+        }
+        if len(short) < len(taken):
+            book_rows_updated([book_id for book_id in taken if book_id not in short])
+        if short:
+            kept = []
+            for result, record in accepted:
+                if record.book_id in short and (record.user_id, record.book_id) not in from_hold:
+                    result.update(status='error', error="No copies available")
+                else:
+                    kept.append((result, record))
+            accepted = kept
+        records = BorrowRecord.objects.bulk_create([record for _, record in accepted])
+        # bulk_create sends no post_save.
+        user_activity_recorded({record.user_id for record in records})
+
+    for (result, _), record in zip(accepted, records):
+        result.update(status='borrowed', record_id=record.pk, due_date=record.due_date)
+    return results
+
+
+def bulk_return(record_ids=(), items=()):
+    """
+    Check in borrows given by record id and/or by (``book_uuid``, ``user``)
+    pairs. Freed copies go to waiting holds first, as with single returns.
+    Returns ``(record_results, item_results)``.
+    """
+    record_results = [{'record_id': pk} for pk in record_ids]
+    item_results = [{'book_uuid': item['book_uuid'], 'user': item['user']} for item in items]
+    now = timezone.now()
+
+    with transaction.atomic():
+        lookup = Q(pk__in=list(record_ids))
+        for item in items:
+            lookup |= Q(book__book_uuid=item['book_uuid'], user_id=item['user'], is_returned=False)
+        rows = list(BorrowRecord.objects.select_for_update(of=('self',)).filter(lookup).values_list(
+            'pk', 'book_id', 'book__book_uuid', 'user_id', 'is_returned'
+        ))
+        by_pk = {row[0]: row for row in rows}
+        open_by_pair = {(row[2], row[3]): row for row in rows if not row[4]}
+
+        # record id -> (book id, result, its fields if closed, error if not)
+        closing = {}
+        for pk, result in zip(record_ids, record_results):
+            row = by_pk.get(pk)
+            if row is None:
+                result.update(status='error', error="Borrow record not found")
+            elif row[4] or pk in closing:
+                result.update(status='error', error="Book already returned")
+            else:
+                closing[pk] = (row[1], result, {}, "Book already returned")
+        for item, result in zip(items, item_results):
+            row = open_by_pair.get((item['book_uuid'], item['user']))
+            if row is None or row[0] in closing:
+                result.update(status='error', error="Active borrow record not found")
+            else:
+                closing[row[0]] = (row[1], result, {'record_id': row[0]}, "Active borrow record not found")
+
+        # select_for_update() does not lock on SQLite, so a single return may
+        # have closed a record since it was read: only the records these
+        # conditional UPDATEs close are credited, like bulk_borrow's
+        # decrements.
+        returned = Counter()
+        for pk, (book_id, result, fields, error) in list(closing.items()):
+            if BorrowRecord.objects.filter(pk=pk, is_returned=False).update(is_returned=True, return_date=now):
+                returned[book_id] += 1
+                result.update(status='returned', **fields)
+            else:
+                del closing[pk]
+                result.update(status='error', error=error)
+        if closing:
+            OverdueEntry.objects.filter(record_id__in=closing).delete()
+        with_holds = set(BookHold.objects.filter(
+            book_id__in=returned, status=BookHold.WAITING
+        ).values_list('book_id', flat=True).distinct())
+        for book_id in with_holds:
+            BookHold.release_copies(book_id, returned.pop(book_id))
+        _adjust_copies(returned)
+
+    return record_results, item_results
@@ -0,0 +1,108 @@
+"""
+Facet counts and facet filters for search results.
+
+The facet attributes of every matching book are read with a single query
+(categories come along through a LEFT JOIN), after which filtering and all
+counts are computed in one pass in Python. Asking for more facets therefore
+never adds database round trips.
+
+Filters are applied to that attribute map rather than through indexed SQL.
+The matching ids are a BM25 ranking computed in Python from the
+SearchPosting table (library.search), not a query the filters could be
+added to, and the counts need every match's attributes anyway; a filtered
+id query would add a round trip without reading fewer rows. The cost is one attribute query per ID_CHUNK_SIZE
+matches when the map is not cached yet (it is cached with the ranked ids,
+see library.search_cache), plus an O(matches) Python pass per request.
+"""
+from collections import Counter, defaultdict
+
+from .models import Book
+
+FACETS = ('category', 'book_type', 'availability', 'publisher')
+MAX_FACET_VALUES = 20
+ID_CHUNK_SIZE = 5000
+
+
+def book_attributes(book_ids):
+    """
+    ``{book_id: {facet: (value, ...)}}`` for the given books. Only more than
+    ID_CHUNK_SIZE matching books need more than one query.
+    """
+    attributes = {}
+    categories = defaultdict(set)
+    book_ids = list(book_ids)
+    for start in range(0, len(book_ids), ID_CHUNK_SIZE):
+        rows = Book.objects.filter(
+            id__in=book_ids[start:start + ID_CHUNK_SIZE]
+        ).values_list('id', 'book_type', 'available_copies', 'publisher', 'categories__name')
+        for book_id, book_type, available_copies, publisher, category in rows:
+            if category:
+                categories[book_id].add(category)
+            if book_id not in attributes:
+                attributes[book_id] = {
+                    'book_type': (book_type,),
+                    'availability': ('available' if available_copies > 0 else 'checked_out',),
+                    'publisher': (publisher,) if publisher else (),
+                }
+    for book_id, values in attributes.items():
+        values['category'] = tuple(sorted(categories.get(book_id, ())))
+    return attributes
+
+
+def filters_signature(filters):
+    return '&'.join(
+        f'{facet}={value}' for facet in sorted(filters) for value in sorted(filters[facet])
+    )
+
+
+def parse_filters(query_params):
+    """Facet filters from repeated query parameters, e.g. ?category=Fiction&category=Drama"""
+    filters = {}
+    for facet in FACETS:
+        values = [value for value in query_params.getlist(facet) if value]
+        if values:
+            filters[facet] = set(values)
+    return filters
+
+
+def _matches(book_values, filters):
+    for facet, wanted in filters.items():
+        if not wanted.intersection(book_values[facet]):
+            return False
+    return True
+
+
+def filter_ranked(ranked, attributes, filters):
+    """``ranked`` narrowed to books matching every facet filter, order kept."""
+    if not filters:
+        return ranked
+    return [
+        (book_id, score) for book_id, score in ranked
+        if book_id in attributes and _matches(attributes[book_id], filters)
+    ]
+
+
+def facet_counts(ranked, attributes, filters):
+    """
+    Count books per facet value. Each facet is counted with every filter
+    except its own applied, so a selected category still shows its siblings.
+    """
+    counters = {facet: Counter() for facet in FACETS}
+    for book_id, _ in ranked:
+        book_values = attributes.get(book_id)
+        if book_values is None:
+            continue
+        failed = [facet for facet, wanted in filters.items()
+                  if not wanted.intersection(book_values[facet])]
+        if len(failed) > 1:
+            continue
+        for facet in FACETS:
+            if not failed or failed == [facet]:
+                counters[facet].update(book_values[facet])
+    return {
+        facet: [
+            {'value': value, 'count': count}
+            for value, count in counters[facet].most_common(MAX_FACET_VALUES)
+        ]
+        for facet in FACETS
+    }
@@ -0,0 +1,139 @@
+"""
+Read-only serialization straight from ``values_list()`` rows.
+
+High-volume listings do not need model instances or per-row DRF field
+binding: these functions read plain tuples and build dicts with exactly the
+keys, key order and value formatting of BookSerializer, PublicBookSerializer
+and VideoSerializer (computed fields included), so they can be swapped in
+for unpaginated GET listings.
+"""
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from .models import Book, Video
+
+_datetime = serializers.DateTimeField()
+_date = serializers.DateField()
+
+BOOK_COLUMNS = (
+    'id', 'book_uuid', 'title', 'author', 'publisher', 'is_available', 'pdf_file',
+    'cover_image', 'total_copies', 'available_copies', 'is_featured', 'book_type',
+    'download_permission', 'created_at', 'external_source', 'description',
+    'publication_date', 'summary',
+)
+
+VIDEO_COLUMNS = (
+    'id', 'instructor', 'video_uuid', 'title', 'description', 'category', 'is_featured',
+    'video_file', 'thumbnail', 'upload_date', 'duration', 'created_at', 'external_source',
+)
+
+
+def _file_url(storage, name):
+    # Same as DRF's FileField/ImageField without a request in context.
+    return storage.url(name) if name else None
+
+
+def _datetime_repr(value):
+    return _datetime.to_representation(value) if value is not None else None
+
+
+def _date_repr(value):
+    return _date.to_representation(value) if value is not None else None
+
+
+def book_category_names(book_ids):
+    """``{book_id: [category name, ...]}`` in one query."""
+    names = defaultdict(list)
+    rows = Book.categories.through.objects.filter(
+        book_id__in=book_ids
+    ).order_by('id').values_list('book_id', 'category__name')
+    for book_id, name in rows:
+        names[book_id].append(name)
+    return names
+
+
+def book_dicts(queryset):
+    """BookSerializer-shaped dicts for ``queryset``, in two queries."""
+    rows = list(queryset.values_list(*BOOK_COLUMNS))
+    categories = book_category_names([row[0] for row in rows])
+    pdf_storage = Book._meta.get_field('pdf_file').storage
+    cover_storage = Book._meta.get_field('cover_image').storage
+
+    data = []
+    for (pk, book_uuid, title, author, publisher, is_available, pdf_file, cover_image,
+         total_copies, available_copies, is_featured, book_type, download_permission,
+         created_at, external_source, description, publication_date, summary) in rows:
+        data.append({
+            'id': pk,
+            'book_uuid': book_uuid,
+            'title': title,
+            'author': author,
+            'publisher': publisher,
+            'categories': categories.get(pk, []),
+            'is_available': is_available,
+            'pdf_file': _file_url(pdf_storage, pdf_file),
+            'cover_image': _file_url(cover_storage, cover_image),
+            'total_copies': total_copies,
+            'available_copies': available_copies,
+            'is_featured': is_featured,
+            'book_type': book_type,
+            'download_permission': download_permission,
+            'is_ebook': book_type == 'EBOOK',
+            'available_status': "Available" if available_copies > 0 else "Checked Out",
+            'created_at': _datetime_repr(created_at),
+            'external_source': external_source,
+            'is_external': bool(external_source),
+            'description': description,
+            'publication_date': _date_repr(publication_date),
+            'summary': summary,
+        })
+    return data
+
+
+def public_book_dicts(queryset):
+    """PublicBookSerializer-shaped dicts for ``queryset``, in two queries."""
+    rows = list(queryset.values_list('id', 'title', 'author', 'cover_image', 'description', 'available_copies'))
+    categories = book_category_names([row[0] for row in rows])
+    cover_storage = Book._meta.get_field('cover_image').storage
+    return [
+        {
+            'id': pk,
+            'title': title,
+            'author': author,
+            'category': categories.get(pk, []),
+            'cover_image': _file_url(cover_storage, cover_image),
+            'description': description,
+            'available_status': "Available" if available_copies > 0 else "Checked Out",
+        }
+        for pk, title, author, cover_image, description, available_copies in rows
+    ]
+
+
+def video_dicts(queryset):
+    """VideoSerializer-shaped dicts for ``queryset``, in one query."""
+    video_storage = Video._meta.get_field('video_file').storage
+    thumbnail_storage = Video._meta.get_field('thumbnail').storage
+    category_labels = dict(Video.VIDEO_CATEGORIES)
+
+    data = []
+    for (pk, instructor, video_uuid, title, description, category, is_featured, video_file,
+         thumbnail, upload_date, duration, created_at, external_source) in queryset.values_list(*VIDEO_COLUMNS):
+        data.append({
+            'id': pk,
+            'instructor': instructor,
+            'video_uuid': video_uuid,
+            'title': title,
+            'description': description,
+            'category': category,
+            'is_featured': is_featured,
+            'video_file': _file_url(video_storage, video_file),
+            'thumbnail': _file_url(thumbnail_storage, thumbnail),
+            'upload_date': _datetime_repr(upload_date),
+            'duration': duration,
+            'created_at': _datetime_repr(created_at),
+            'category_display': category_labels.get(category, category),
+            'is_external': bool(external_source),
+            'external_source': external_source,
+        })
+    return data
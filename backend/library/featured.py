@@ -0,0 +1,69 @@
+"""
+Featured book rotation.
+
+A new FeaturedBook set is drawn by ``manage.py rotate_featured``, run from
+the scheduler (e.g. cron every 12 hours, or hourly with ``--if-expired``),
+never on the request path. Books are sampled by seeking to random ids in the
+primary key range, so a draw costs a handful of index lookups however large
+the catalog is. The latest set is what FeaturedBookView serves, looked up
+with one indexed query; its ETag follows the stored "featured" stamp, which
+the set's signals replace in the same transaction, so the web workers see
+rotations made by the cron process.
+"""
+import random
+
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .models import Book, FeaturedBook
+
+SET_SIZE = 4
+ROTATION_HOURS = 12
+
+
+def sample_available_ids(k, rng=random):
+    """
+    Up to ``k`` distinct ids of available books, drawn by jumping to random
+    points of the id range and taking the next available book. Books after
+    long id gaps are a little more likely to be picked; that is fine for a
+    showcase and keeps every draw O(k) index seeks.
+    """
+    bounds = Book.objects.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    available = Book.objects.filter(is_available=True).order_by('pk').values_list('pk', flat=True)
+    chosen = []
+    for _ in range(k * 4):
+        if len(chosen) == k:
+            break
+        start = rng.randint(bounds['low'], bounds['high'])
+        pk = available.filter(pk__gte=start).first()
+        if pk is None:
+            pk = available.first()
+        if pk is None:
+            return []
+        if pk not in chosen:
+            chosen.append(pk)
+    if len(chosen) < k:
+        # Small or sparse catalogs: top up with whatever is left.
+        chosen += list(available.exclude(pk__in=chosen)[:k - len(chosen)])
+    return chosen
+
+
+def rotate(hours=ROTATION_HOURS, now=None):
+    """Create and return a new featured set expiring in ``hours``."""
+    with transaction.atomic():
+        featured_set = FeaturedBook.objects.create(
+            expires_at=(now or timezone.now()) + timezone.timedelta(hours=hours)
+        )
+        featured_set.books.set(sample_available_ids(SET_SIZE))
+    return featured_set
+
+
+def current_set():
+    """
+    The latest featured set, or None before the first rotation. An expired
+    set keeps being served until the scheduler replaces it.
+    """
+    return FeaturedBook.objects.order_by('-created_at', '-id').first()
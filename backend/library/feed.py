@@ -0,0 +1,197 @@
+"""
+Personalized "for you" feed in two stages.
+
+Candidate generation runs in batch (``manage.py build_feeds``). New activity
+(a borrow or a newly opened book) only marks the user's row stale, and
+``manage.py build_feeds --stale``, run every few minutes, rebuilds just those
+users from the neighbour lists of their own seed books.
+
+A user's seeds are the books they borrowed, from both borrow tiers, and the
+books they opened in the reader (ReadingSession), weighted by kind and by
+recency. Seeds are joined with the precomputed BookNeighbour lists in NumPy,
+scores are summed per (user, candidate) and the best CANDIDATES ids are
+written to UserFeed, one compact row per user. Books the user already had
+are never candidates.
+
+At request time UserFeedView reads that row, drops books borrowed since it
+was built and books that are unavailable, and returns the first ``limit``.
+A stale row is served until it is rebuilt. Users without candidates get the
+most borrowed books, computed by whichever process misses them in its cache
+and kept for POPULAR_TIMEOUT.
+"""
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .archive import borrow_counts
+from .models import ArchivedBorrow, Book, BookNeighbour, BorrowRecord, ReadingSession, UserFeed
+
+CANDIDATES = 50
+HALF_LIFE_DAYS = 180
+SEED_WEIGHTS = {'borrow': 1.0, 'reading': 0.6}
+# Co-borrow scores are cosines (0..1), category scores count shared
+# categories (1..n).
+KIND_WEIGHTS = {BookNeighbour.CO_BORROW: 1.0, BookNeighbour.CATEGORY: 0.25}
+USER_BATCH = 5000
+NEIGHBOUR_CHUNK = 900
+POPULAR_KEY = 'library:feed:popular'
+POPULAR_TIMEOUT = 60 * 60
+
+
+def _seeds(user_ids, now):
+    """``(users, books, weights)`` with one row per distinct (user, book)."""
+    sources = [
+        (BorrowRecord, 'borrowed_date', SEED_WEIGHTS['borrow']),
+        (ArchivedBorrow, 'borrowed_date', SEED_WEIGHTS['borrow']),
+        (ReadingSession, 'last_accessed', SEED_WEIGHTS['reading']),
+    ]
+    users, books, weights = [], [], []
+    for model, date_field, weight in sources:
+        rows = model.objects.filter(user_id__in=user_ids).values_list('user_id', 'book_id', date_field).order_by()
+        for user_id, book_id, when in rows:
+            age_days = max(0.0, (now - when).total_seconds() / 86400)
+            users.append(user_id)
+            books.append(book_id)
+            weights.append(weight * 0.5 ** (age_days / HALF_LIFE_DAYS))
+    if not users:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, np.empty(0)
+    pairs, inverse = np.unique(
+        np.stack([np.array(users, dtype=np.int64), np.array(books, dtype=np.int64)], axis=1),
+        axis=0, return_inverse=True,
+    )
+    totals = np.bincount(inverse.ravel(), weights=np.array(weights), minlength=len(pairs))
+    return pairs[:, 0], pairs[:, 1], totals
+
+
+def _neighbours(book_ids=None):
+    """
+    ``(books, neighbours, weights)`` of BookNeighbour, sorted by book; only
+    the lists of ``book_ids`` when given.
+    """
+    queryset = BookNeighbour.objects.values_list('book_id', 'neighbour_id', 'kind', 'score').order_by('book_id')
+    if book_ids is None:
+        rows = list(queryset)
+    else:
+        # Sorted chunks keep the concatenation sorted by book.
+        book_ids = sorted(book_ids)
+        rows = []
+        for start in range(0, len(book_ids), NEIGHBOUR_CHUNK):
+            rows += queryset.filter(book_id__in=book_ids[start:start + NEIGHBOUR_CHUNK])
+    books = np.array([row[0] for row in rows], dtype=np.int64)
+    neighbours = np.array([row[1] for row in rows], dtype=np.int64)
+    weights = np.array([KIND_WEIGHTS.get(row[2], 0) * row[3] for row in rows], dtype=np.float64)
+    return books, neighbours, weights
+
+
+def candidates(user_ids, now=None, neighbours=None):
+    """
+    ``{user_id: [book_id, ...]}``, best first, for users with any history.
+    ``neighbours`` is a preloaded ``_neighbours()``; by default only the
+    lists of the users' seed books are read.
+    """
+    now = now or timezone.now()
+    seed_users, seed_books, seed_weights = _seeds(user_ids, now)
+    if neighbours is None:
+        neighbours = _neighbours(np.unique(seed_books).tolist())
+    books, targets, target_weights = neighbours
+    if not len(seed_users) or not len(books):
+        return {}
+
+    # Join every seed with its book's neighbour list.
+    starts = np.searchsorted(books, seed_books, side='left')
+    counts = np.searchsorted(books, seed_books, side='right') - starts
+    seed_index = np.repeat(np.arange(len(seed_users)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    neighbour_index = np.repeat(starts, counts) + offsets
+    users = seed_users[seed_index]
+    picks = targets[neighbour_index]
+    scores = seed_weights[seed_index] * target_weights[neighbour_index]
+
+    # Nothing the user already borrowed or opened.
+    width = int(max(picks.max(initial=0), seed_books.max(initial=0))) + 1
+    keep = ~np.isin(users * width + picks, seed_users * width + seed_books)
+    users, picks, scores = users[keep], picks[keep], scores[keep]
+    if not len(users):
+        return {}
+
+    keys, inverse = np.unique(users * width + picks, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=scores, minlength=len(keys))
+    users, picks = keys // width, keys % width
+    order = np.lexsort((picks, -np.round(totals, 9), users))
+    users, picks = users[order], picks[order]
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    rank = np.arange(len(users)) - np.repeat(starts, np.diff(np.r_[starts, len(users)]))
+    keep = rank < CANDIDATES
+
+    result = {}
+    for user_id, book_id in zip(users[keep].tolist(), picks[keep].tolist()):
+        result.setdefault(user_id, []).append(book_id)
+    return result
+
+
+def popular_ids(refresh=False):
+    """
+    The most borrowed book ids, both tiers. Computed on a cache miss rather
+    than only by the batch job, whose cache the web workers may not share.
+    """
+    book_ids = None if refresh else cache.get(POPULAR_KEY)
+    if book_ids is None:
+        book_ids = [book_id for book_id, _ in borrow_counts().most_common(CANDIDATES)]
+        cache.set(POPULAR_KEY, book_ids, POPULAR_TIMEOUT)
+    return book_ids
+
+
+def stale_user_ids():
+    return list(UserFeed.objects.filter(stale_since__isnull=False).values_list('user_id', flat=True))
+
+
+def build_feeds(user_ids=None):
+    """
+    Regenerate the candidates of ``user_ids`` (everyone with history when
+    None, which also refreshes the popular fallback). Returns users written.
+    """
+    now = timezone.now()
+    neighbours = None
+    if user_ids is None:
+        active = set()
+        for model in (BorrowRecord, ArchivedBorrow, ReadingSession):
+            active.update(model.objects.values_list('user_id', flat=True).distinct())
+        stale = set(UserFeed.objects.values_list('user_id', flat=True)) - active
+        user_ids = sorted(active | stale)
+        popular_ids(refresh=True)
+        # Everyone is rebuilt, so read the whole table once.
+        neighbours = _neighbours()
+    user_ids = list(user_ids)
+
+    written = 0
+    for start in range(0, len(user_ids), USER_BATCH):
+        batch = user_ids[start:start + USER_BATCH]
+        fresh = candidates(batch, now, neighbours)
+        # Activity marked after ``now`` is not covered by this build.
+        covered = UserFeed.objects.filter(user_id__in=batch).exclude(stale_since__gt=now)
+        with transaction.atomic():
+            covered.filter(user_id__in=[pk for pk in batch if pk not in fresh]).delete()
+            UserFeed.objects.bulk_create(
+                [UserFeed(user_id=user_id, book_ids=book_ids, built_at=now) for user_id, book_ids in fresh.items()],
+                update_conflicts=True, unique_fields=['user'], update_fields=['book_ids', 'built_at'],
+            )
+            covered.filter(stale_since__isnull=False).update(stale_since=None)
+        written += len(fresh)
+    return written
+
+
+def feed_for(user, limit=10):
+    """Stage two: the user's first ``limit`` candidates still worth showing."""
+    book_ids = UserFeed.objects.filter(user=user).values_list('book_ids', flat=True).first()
+    if not book_ids:
+        # No row, or one only marked stale and not built yet.
+        book_ids = popular_ids()
+    # Archived borrows were already excluded when the row was built.
+    borrowed = set(BorrowRecord.objects.filter(user=user).values_list('book_id', flat=True))
+    wanted = [book_id for book_id in book_ids if book_id not in borrowed]
+    books = Book.objects.filter(pk__in=wanted, is_available=True, available_copies__gt=0).only(
+        'id', 'book_uuid', 'title', 'author', 'cover_image'
+    ).in_bulk()
+    return [books[book_id] for book_id in wanted if book_id in books][:limit]
@@ -0,0 +1,152 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?expand=`` for serializer output.
+
+``fields`` is a comma separated list of field names, with dots selecting
+inside nested objects (``fields=id,due_date,book.title``). ``expand`` lists
+the nested objects to embed; when it is given, every other expandable field
+(see ``SparseFieldsMixin.expandable_fields``) collapses to its identifier.
+Without either parameter serializers behave exactly as before.
+
+sparse_queryset() walks the pruned serializer and restricts the queryset to
+the columns, joins and prefetches it still reads, so trimmed fields like
+``description`` are not even fetched from the database.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+
+
+def parse_field_list(value):
+    """``'id,book.title'`` -> ``{'id': None, 'book': {'title': None}}``."""
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        parts = [part.strip() for part in path.split('.') if part.strip()]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            if node.get(part) is None:
+                node[part] = {}
+            node = node[part]
+        node.setdefault(parts[-1], None)
+    return tree
+
+
+def parse_fieldsets(request):
+    """``(fields, expand)`` trees from the query string, None when absent."""
+    params = request.query_params
+    return parse_field_list(params.get('fields')), parse_field_list(params.get('expand'))
+
+
+class SparseFieldsMixin:
+    """
+    ModelSerializer mixin accepting ``fields`` and ``expand`` trees.
+
+    ``expandable_fields`` maps nested serializer fields to the source they
+    collapse to, and ``field_columns`` lists the model columns read by
+    computed fields (method fields, properties) so queries can be pruned.
+    """
+    expandable_fields = {}
+    field_columns = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.apply_fieldsets(fields, expand)
+
+    def apply_fieldsets(self, fields=None, expand=None):
+        self.fieldsets_applied = fields is not None or expand is not None
+        if expand is not None:
+            for name, source in self.expandable_fields.items():
+                if name in expand or name not in self.fields:
+                    continue
+                self.fields[name] = serializers.ReadOnlyField(source=source)
+
+        if fields is not None:
+            requested = set(fields) | set(expand or ())
+            unknown = requested - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError({
+                    'fields': [f"Unknown field(s): {', '.join(sorted(unknown))}"]
+                })
+            for name in list(self.fields):
+                if name not in requested:
+                    self.fields.pop(name)
+
+        for name, field in self.fields.items():
+            nested_fields = (fields or {}).get(name)
+            nested_expand = (expand or {}).get(name)
+            if isinstance(field, SparseFieldsMixin) and (nested_fields or nested_expand):
+                field.apply_fieldsets(nested_fields, nested_expand)
+
+
+def _concrete_names(model):
+    return [field.name for field in model._meta.concrete_fields]
+
+
+def _collect(serializer, model, prefix, plan):
+    """Add the columns, joins and prefetches ``serializer`` reads to ``plan``."""
+    columns, select, prefetch = plan
+    field_columns = getattr(serializer, 'field_columns', {})
+    needs_all = False
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, (ManyRelatedField, serializers.ListSerializer)):
+            prefetch.add(prefix + field.source)
+            continue
+        if name in field_columns:
+            columns.update(prefix + column for column in field_columns[name])
+            continue
+        if field.source == '*':
+            needs_all = True
+            continue
+
+        current_model, path = model, prefix
+        attrs = field.source_attrs
+        for i, attr in enumerate(attrs):
+            try:
+                model_field = current_model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                # Property or method: unknown dependencies.
+                if path == prefix:
+                    needs_all = True
+                else:
+                    columns.update(path + column for column in _concrete_names(current_model))
+                break
+            if model_field.many_to_many or model_field.one_to_many:
+                prefetch.add(path + model_field.name)
+                break
+            columns.add(path + model_field.name)
+            last = i == len(attrs) - 1
+            if model_field.is_relation and (not last or isinstance(field, serializers.BaseSerializer)):
+                select.add(path + model_field.name)
+                current_model = model_field.related_model
+                path = path + model_field.name + '__'
+                if last:
+                    _collect(field, current_model, path, plan)
+
+    if needs_all:
+        columns.update(prefix + column for column in _concrete_names(model))
+
+
+def sparse_queryset(queryset, serializer_class, fields=None, expand=None, required_columns=(), **kwargs):
+    """
+    Restrict ``queryset`` to what ``serializer_class`` renders with the given
+    fieldsets, plus ``required_columns`` the caller reads itself (to sort or
+    merge on, say). Returned unchanged when no fieldsets were requested.
+    """
+    if fields is None and expand is None:
+        return queryset
+    serializer = serializer_class(fields=fields, expand=expand, **kwargs)
+    plan = (set(), set(), set())
+    _collect(serializer, queryset.model, '', plan)
+    columns, select, prefetch = plan
+    # Joins kept from the view but no longer rendered would conflict with only().
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*sorted(select))
+    if prefetch:
+        queryset = queryset.prefetch_related(*sorted(prefetch))
+    return queryset.only(*sorted(columns.union(required_columns)))
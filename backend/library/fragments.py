@@ -0,0 +1,220 @@
+"""
+Per-object cache of serialized Book and Video representations.
+
+Every object has a row version in the shared cache, replaced by model
+signals whenever the object (or, for books, their categories) changes.
+Fragments are stored under ``(kind, id, version)`` in two tiers: a bounded
+in-process LRU and the shared cache behind it. A lookup costs one get_many
+for the versions of all requested objects, plus one for the fragments
+missing from the local tier; stale fragments simply stop being addressed.
+
+BookSerializer and VideoSerializer read through this cache (see
+FragmentCachedMixin), so book detail, listings, featured sets, borrow
+records and search results all share the same fragments.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models
+from rest_framework import serializers
+
+from .versioning import get_stamps, incr_counter
+
+KEY_PREFIX = 'library:fragment'
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+PRIMED_CONTEXT_KEY = '_primed_fragments'
+
+
+class LRU:
+    """Thread-safe bounded mapping that evicts the least recently used key."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class FragmentCache:
+    def __init__(self, kind):
+        self.kind = kind
+        self.local = LRU(getattr(settings, 'FRAGMENT_CACHE_LOCAL_ENTRIES', 5000))
+        self._stats_keys = {
+            name: f'{KEY_PREFIX}:{kind}:stats:{name}' for name in ('local_hits', 'shared_hits', 'misses')
+        }
+
+    def _version_key(self, pk):
+        return f'{KEY_PREFIX}:{self.kind}:v:{pk}'
+
+    def _generation_key(self):
+        return f'{KEY_PREFIX}:{self.kind}:generation'
+
+    def _fragment_key(self, pk, version):
+        return f'{KEY_PREFIX}:{self.kind}:{pk}:{version}'
+
+    def stamps(self, pks):
+        """``{pk: (generation, stamp)}``; both are ``time_ns`` of the last change."""
+        keys = {self._version_key(pk): pk for pk in pks}
+        found = get_stamps([self._generation_key(), *keys])
+        generation = found[self._generation_key()]
+        return {pk: (generation, found[key]) for key, pk in keys.items()}
+
+    def render_many(self, instances, render):
+        """
+        Representations of ``instances`` in order, calling ``render(instance)``
+        only for objects whose current version is cached in neither tier.
+
+        A rendered fragment is only stored when the instance was loaded after
+        its version was last stamped. Otherwise a write may have committed
+        between loading the row and reading the version, and the stale row
+        would be cached under the new version.
+        """
+        stamps = self.stamps({instance.pk for instance in instances})
+        versions = {pk: '%s.%s' % stamp for pk, stamp in stamps.items()}
+        results = {}
+        shared_keys = {}
+        local_hits = 0
+        for instance in instances:
+            version = versions[instance.pk]
+            entry = self.local.get(instance.pk)
+            if entry is not None and entry[0] == version:
+                results[instance.pk] = entry[1]
+                local_hits += 1
+            else:
+                shared_keys[self._fragment_key(instance.pk, version)] = instance.pk
+
+        shared_hits = misses = 0
+        if shared_keys:
+            found = cache.get_many(list(shared_keys))
+            fresh = {}
+            for instance in instances:
+                if instance.pk in results:
+                    continue
+                version = versions[instance.pk]
+                key = self._fragment_key(instance.pk, version)
+                data = found.get(key)
+                if data is None:
+                    data = dict(render(instance))
+                    misses += 1
+                    results[instance.pk] = data
+                    # Rows built in memory carry no load time: never stored.
+                    if getattr(instance, '_loaded_at', 0) <= max(stamps[instance.pk]):
+                        continue
+                    fresh[key] = data
+                else:
+                    shared_hits += 1
+                self.local.set(instance.pk, (version, data))
+                results[instance.pk] = data
+            if fresh:
+                cache.set_many(fresh, FRAGMENT_TIMEOUT)
+
+        self._record(local_hits=local_hits, shared_hits=shared_hits, misses=misses)
+        # Shallow copies: callers may add keys to what they get back.
+        return [dict(results[instance.pk]) for instance in instances]
+
+    def invalidate(self, pks):
+        stamp = time.time_ns()
+        cache.set_many({self._version_key(pk): stamp for pk in pks}, timeout=None)
+
+    def invalidate_all(self):
+        cache.set(self._generation_key(), time.time_ns(), timeout=None)
+
+    def _record(self, **counts):
+        for name, count in counts.items():
+            if count:
+                incr_counter(self._stats_keys[name], count)
+
+    def stats(self):
+        counts = cache.get_many(list(self._stats_keys.values()))
+        values = {name: counts.get(key, 0) for name, key in self._stats_keys.items()}
+        lookups = sum(values.values())
+        hits = values['local_hits'] + values['shared_hits']
+        return {
+            **values,
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+            'local_hit_rate': round(values['local_hits'] / lookups, 4) if lookups else None,
+            'local_entries': len(self.local),
+        }
+
+    def reset_stats(self):
+        cache.delete_many(list(self._stats_keys.values()))
+
+
+book_fragments = FragmentCache('book')
+video_fragments = FragmentCache('video')
+
+
+class FragmentCachedMixin:
+    """
+    Serializer mixin reading full representations through ``fragment_cache``.
+
+    Bypassed for write serializers, when a request is in the context
+    (absolute file URLs) and when sparse fieldsets pruned the output.
+    """
+    fragment_cache = None
+
+    def uses_fragments(self):
+        return (
+            not hasattr(self, 'initial_data')
+            and 'request' not in self.context
+            and not getattr(self, 'fieldsets_applied', False)
+        )
+
+    def render_uncached(self, instance):
+        return super().to_representation(instance)
+
+    def to_representation(self, instance):
+        if not self.uses_fragments():
+            return super().to_representation(instance)
+        primed = self.context.get(PRIMED_CONTEXT_KEY, {}).get((self.fragment_cache.kind, instance.pk))
+        if primed is not None:
+            return dict(primed)
+        return self.fragment_cache.render_many([instance], self.render_uncached)[0]
+
+
+class FragmentListSerializer(serializers.ListSerializer):
+    """Batches fragment lookups for ``many=True`` on a FragmentCachedMixin child."""
+
+    def to_representation(self, data):
+        if not self.child.uses_fragments():
+            return super().to_representation(data)
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        return self.child.fragment_cache.render_many(list(iterable), self.child.render_uncached)
+
+
+def prime_fragments(serializer, field_name, instances):
+    """
+    Batch-load the fragments that the nested ``field_name`` of a list child
+    serializer will render, so each row then reads from the context.
+    """
+    field = serializer.child.fields.get(field_name)
+    if not isinstance(field, FragmentCachedMixin) or not field.uses_fragments():
+        return
+    related = {getattr(instance, field.source).pk: getattr(instance, field.source) for instance in instances}
+    rendered = field.fragment_cache.render_many(list(related.values()), field.render_uncached)
+    primed = serializer.context.setdefault(PRIMED_CONTEXT_KEY, {})
+    for obj, data in zip(related.values(), rendered):
+        primed[(field.fragment_cache.kind, obj.pk)] = data
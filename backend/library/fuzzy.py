@@ -0,0 +1,149 @@
+"""
+Typo-tolerant matching for book titles and authors.
+
+Every distinct word of a title or author is stored once in SearchVocabulary
+together with its character trigrams (SearchTrigram). A misspelled query word
+is matched by looking up its own trigrams, which prunes the candidates to
+words sharing enough of them; only that short list is ranked by trigram
+similarity and edit distance. Plain tables keep this portable across SQLite
+and PostgreSQL without pg_trgm.
+"""
+import math
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Book, SearchTrigram, SearchVocabulary
+from .search import tokenize
+
+SIMILARITY_THRESHOLD = 0.3
+MIN_WORD_LENGTH = 3
+MAX_CANDIDATES = 20
+
+
+def trigrams(word):
+    """pg_trgm style trigrams: the word padded with two leading and one trailing space."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def vocabulary_terms(title, author):
+    return {
+        term for term in tokenize(title) + tokenize(author)
+        if len(term) >= MIN_WORD_LENGTH and not term.isdigit()
+    }
+
+
+def edit_distance(a, b):
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def update_vocabulary(previous_terms, current_terms):
+    """Apply one book's change of title/author words to the vocabulary refcounts."""
+    removed = set(previous_terms) - set(current_terms)
+    added = set(current_terms) - set(previous_terms)
+    if not removed and not added:
+        return
+    with transaction.atomic():
+        if removed:
+            SearchVocabulary.objects.filter(term__in=removed).update(book_count=F('book_count') - 1)
+            SearchVocabulary.objects.filter(term__in=removed, book_count__lte=0).delete()
+        if added:
+            SearchVocabulary.objects.bulk_create([
+                SearchVocabulary(term=term, book_count=0, trigram_count=len(trigrams(term)))
+                for term in added
+            ], ignore_conflicts=True)
+            SearchVocabulary.objects.filter(term__in=added).update(book_count=F('book_count') + 1)
+            new_entries = SearchVocabulary.objects.filter(term__in=added, book_count=1)
+            SearchTrigram.objects.bulk_create([
+                SearchTrigram(trigram=trigram, vocabulary_id=entry_id)
+                for entry_id, term in new_entries.values_list('id', 'term')
+                for trigram in trigrams(term)
+            ], ignore_conflicts=True)
+
+
+def rebuild_vocabulary(batch_size=1000):
+    SearchVocabulary.objects.all().delete()
+    counts = {}
+    for title, author in Book.objects.values_list('title', 'author').iterator(chunk_size=batch_size):
+        for term in vocabulary_terms(title, author):
+            counts[term] = counts.get(term, 0) + 1
+    SearchVocabulary.objects.bulk_create([
+        SearchVocabulary(term=term, book_count=count, trigram_count=len(trigrams(term)))
+        for term, count in counts.items()
+    ], batch_size=batch_size)
+    entries = SearchVocabulary.objects.values_list('id', 'term').iterator(chunk_size=batch_size)
+    batch = []
+    for entry_id, term in entries:
+        batch.extend(SearchTrigram(trigram=trigram, vocabulary_id=entry_id) for trigram in trigrams(term))
+        if len(batch) >= batch_size:
+            SearchTrigram.objects.bulk_create(batch, batch_size=batch_size)
+            batch = []
+    SearchTrigram.objects.bulk_create(batch, batch_size=batch_size)
+    return len(counts)
+
+
+def similar_terms(word, limit=5, threshold=SIMILARITY_THRESHOLD):
+    """
+    Vocabulary words similar to ``word`` as ``(term, similarity)`` pairs,
+    best first. Similarity is shared trigrams over the union of both sets.
+    """
+    word_trigrams = trigrams(word)
+    # similarity >= threshold implies at least this many shared trigrams,
+    # which lets the database discard most candidates in the HAVING clause.
+    min_shared = max(1, math.ceil(threshold * len(word_trigrams)))
+    candidates = SearchTrigram.objects.filter(
+        trigram__in=word_trigrams
+    ).values(
+        'vocabulary__term', 'vocabulary__trigram_count', 'vocabulary__book_count'
+    ).annotate(
+        shared=Count('id')
+    ).filter(
+        shared__gte=min_shared
+    ).order_by('-shared')[:MAX_CANDIDATES]
+
+    scored = []
+    for row in candidates:
+        term = row['vocabulary__term']
+        shared = row['shared']
+        similarity = shared / (len(word_trigrams) + row['vocabulary__trigram_count'] - shared)
+        if similarity >= threshold and term != word:
+            scored.append((
+                -similarity, edit_distance(word, term), -row['vocabulary__book_count'], term
+            ))
+    scored.sort()
+    return [(term, -similarity) for similarity, _, _, term in scored[:limit]]
+
+
+def correct_query(query):
+    """
+    "Did you mean" rewrite of ``query``: every word that is not in the
+    vocabulary is replaced by its closest match. Returns None when nothing
+    could be corrected.
+    """
+    tokens = tokenize(query)
+    long_tokens = [token for token in tokens if len(token) >= MIN_WORD_LENGTH]
+    known = set(SearchVocabulary.objects.filter(
+        term__in=long_tokens
+    ).values_list('term', flat=True))
+
+    corrected, changed = [], False
+    for token in tokens:
+        if len(token) >= MIN_WORD_LENGTH and token not in known:
+            matches = similar_terms(token, limit=1)
+            if matches:
+                corrected.append(matches[0][0])
+                changed = True
+                continue
+        corrected.append(token)
+    return ' '.join(corrected) if changed else None
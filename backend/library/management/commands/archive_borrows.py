@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from library.archive import archive_returned
+
+
+class Command(BaseCommand):
+    help = "Move old returned borrow records to the borrow archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help="Archive borrows returned more than this many days ago "
+                                 "(default: BORROW_ARCHIVE_AFTER_DAYS)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        moved = archive_returned(days=options['days'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Archived {moved} borrow records"))
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from library.search import forget_stats, index_stats, query_terms, search_books
+
+
+class Command(BaseCommand):
+    help = "Time full BM25 rankings against top-k searches on the current search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='+', help="Queries to time, e.g. 'history' 'war and pe'")
+        parser.add_argument('--limit', type=int, default=20, help="Results wanted by the top-k search")
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per variant; the best one is reported")
+        parser.add_argument(
+            '--cold', action='store_true',
+            help="Recount document frequencies on every run instead of using the cached counts"
+        )
+
+    def handle(self, *args, **options):
+        total, _ = index_stats()
+        if not total:
+            raise CommandError("The search index is empty; run rebuild_search_index first")
+        self.stdout.write(f"{total} indexed books")
+        limit = options['limit']
+        for query in options['queries']:
+            terms = [term for group in query_terms(query) for term in group]
+            timings = []
+            for variant in (lambda: search_books(query), lambda: search_books(query, limit)):
+                best = None
+                for _ in range(options['repeat']):
+                    if options['cold']:
+                        forget_stats(terms)
+                    start = time.perf_counter()
+                    results = variant()
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                timings.append((best, results))
+            (full_time, ranked), (top_time, top) = timings
+            if top != ranked[:limit]:
+                raise CommandError(f"Top {limit} of {query!r} differs from the full ranking")
+            self.stdout.write(
+                f"{query!r}: {len(ranked)} matches, full ranking {full_time * 1000:.1f} ms, "
+                f"top {limit} {top_time * 1000:.1f} ms ({full_time / max(top_time, 1e-9):.1f}x)"
+            )
+        self.stdout.write(self.style.SUCCESS("Done"))
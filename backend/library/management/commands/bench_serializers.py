@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from library.fast_serializers import book_dicts, public_book_dicts, video_dicts
+from library.models import Book, Video
+from library.serializers import BookSerializer, PublicBookSerializer, VideoSerializer
+
+
+class Command(BaseCommand):
+    help = "Time DRF serializers against the values_list() serializers on the current catalog"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help="Runs per variant; the best one is reported")
+        parser.add_argument('--limit', type=int, default=None, help="Only serialize the first N rows")
+
+    def handle(self, *args, **options):
+        books = Book.objects.order_by('id')
+        videos = Video.objects.order_by('id')
+        if options['limit']:
+            books, videos = books[:options['limit']], videos[:options['limit']]
+        # A request in the context bypasses the fragment cache, so the DRF
+        # side renders every row as a cold listing would. .all() clones, so no
+        # run reuses an earlier run's result cache.
+        context = {'request': None}
+        with_categories = books.prefetch_related('categories')
+        cases = [
+            ('BookSerializer', lambda: BookSerializer(with_categories.all(), many=True, context=context).data,
+             lambda: book_dicts(books)),
+            ('PublicBookSerializer', lambda: PublicBookSerializer(with_categories.all(), many=True).data,
+             lambda: public_book_dicts(books)),
+            ('VideoSerializer', lambda: VideoSerializer(videos.all(), many=True, context=context).data,
+             lambda: video_dicts(videos)),
+        ]
+        renderer = JSONRenderer()
+        for name, serializer, fast in cases:
+            timings = []
+            for variant in (serializer, fast):
+                best = None
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    body = renderer.render(variant())
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                timings.append(best)
+            self.stdout.write(
+                f"{name}: {len(body)} bytes, serializer {timings[0] * 1000:.1f} ms, "
+                f"values_list {timings[1] * 1000:.1f} ms ({timings[0] / max(timings[1], 1e-9):.1f}x)"
+            )
+        self.stdout.write(self.style.SUCCESS("Done"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from library.snapshots import CATALOGS, refresh
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precompressed public catalog snapshots in MEDIA_ROOT"
+
+    def add_arguments(self, parser):
+        parser.add_argument('catalogs', nargs='*', help=f"Any of: {', '.join(sorted(CATALOGS))} (default: all)")
+
+    def handle(self, *args, **options):
+        names = options['catalogs'] or sorted(CATALOGS)
+        unknown = set(names) - set(CATALOGS)
+        if unknown:
+            raise CommandError(f"Unknown catalog(s): {', '.join(sorted(unknown))}")
+        for name in names:
+            refresh(name)
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {name} snapshot"))
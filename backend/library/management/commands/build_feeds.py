@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from library.feed import build_feeds, stale_user_ids
+
+
+class Command(BaseCommand):
+    help = "Regenerate every user's 'for you' candidates (run after build_recommendations)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Only rebuild feeds marked stale by new borrows or reading sessions',
+        )
+
+    def handle(self, *args, **options):
+        written = build_feeds(stale_user_ids() if options['stale'] else None)
+        self.stdout.write(self.style.SUCCESS(f"Feed candidates written for {written} users"))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from library.recommendations import (
+    build_neighbours, build_video_neighbours, neighbour_count, recommendation_seed, refresh_stale_video_neighbours,
+)
+
+
+class Command(BaseCommand):
+    help = "Rebuild the precomputed related-book and related-video lists"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbours', type=int, default=None,
+                            help="Neighbours kept per book (default: RECOMMENDATION_NEIGHBOURS)")
+        parser.add_argument('--seed', type=int, default=None,
+                            help="Tie-breaking seed for shared categories (default: RECOMMENDATION_SEED)")
+        parser.add_argument('--stale', action='store_true',
+                            help="Only refresh the related videos of videos saved or deleted since the last run")
+
+    def handle(self, *args, **options):
+        k = options['neighbours'] or neighbour_count()
+        seed = recommendation_seed() if options['seed'] is None else options['seed']
+        if options['stale']:
+            written, cleared = refresh_stale_video_neighbours(k)
+            self.stdout.write(self.style.SUCCESS(
+                f"VIDEO neighbours: {written} videos rewritten, {cleared} cleared (top {k})"
+            ))
+            return
+        for kind, (written, cleared) in build_neighbours(k, seed).items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{kind} neighbours: {written} books rewritten, {cleared} cleared (top {k})"
+            ))
+        written, cleared = build_video_neighbours(k)
+        self.stdout.write(self.style.SUCCESS(
+            f"VIDEO neighbours: {written} videos rewritten, {cleared} cleared (top {k})"
+        ))
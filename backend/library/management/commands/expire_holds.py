@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from library.models import BookHold
+
+
+class Command(BaseCommand):
+    help = "Expire holds whose reserved copy was not picked up and pass the copies on"
+
+    def handle(self, *args, **options):
+        expired = BookHold.expire_ready()
+        self.stdout.write(self.style.SUCCESS(f"Expired {expired} holds"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from library.pdf_text import extract_pending, queue_missing
+
+
+class Command(BaseCommand):
+    help = "Extract and index the text of ebook PDFs that changed since the last run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--retry-failed', action='store_true')
+
+    def handle(self, *args, **options):
+        queue_missing()
+        done, failed = extract_pending(workers=options['workers'], retry_failed=options['retry_failed'])
+        self.stdout.write(self.style.SUCCESS(f"Extracted {done} books, {failed} failed"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from library.fuzzy import rebuild_vocabulary
+from library.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index for every book"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options['batch_size'])
+        words = rebuild_vocabulary(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} books ({words} title/author words)"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from library.overdue import refresh_ledger
+
+
+class Command(BaseCommand):
+    help = "Record newly overdue borrows in the overdue ledger and drop returned ones"
+
+    def handle(self, *args, **options):
+        added, removed = refresh_ledger()
+        self.stdout.write(self.style.SUCCESS(f"Overdue ledger: {added} added, {removed} removed"))
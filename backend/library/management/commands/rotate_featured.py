@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from library.featured import ROTATION_HOURS, current_set, rotate
+
+
+class Command(BaseCommand):
+    help = "Draw a new featured book set"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=ROTATION_HOURS,
+                            help="How long the new set stays current")
+        parser.add_argument('--if-expired', action='store_true',
+                            help="Only rotate when the current set has expired (or there is none)")
+
+    def handle(self, *args, **options):
+        if options['if_expired']:
+            featured_set = current_set()
+            if featured_set is not None and featured_set.is_current():
+                self.stdout.write(f"Featured set {featured_set.pk} is current until {featured_set.expires_at}")
+                return
+        featured_set = rotate(hours=options['hours'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Featured set {featured_set.pk} with {featured_set.books.count()} books, "
+            f"expires {featured_set.expires_at}"
+        ))
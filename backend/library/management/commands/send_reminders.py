@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from library.reminders import dispatch
+
+
+class Command(BaseCommand):
+    help = "Email due-soon and overdue reminders that have not been sent yet"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        sent, logged = dispatch(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        verb = "Would send" if options['dry_run'] else "Sent"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {sent} messages covering {logged} reminders"))
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0031_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['created_at', 'id'], name='library_boo_created_5fc9b3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['borrowed_date', 'id'], name='library_bor_borrowe_433340_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['created_at', 'id'], name='library_vid_created_7cf5bd_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0032_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchVocabulary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, unique=True)),
+                ('book_count', models.PositiveIntegerField(default=0)),
+                ('trigram_count', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(db_index=True, max_length=3)),
+                ('vocabulary', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='library.searchvocabulary')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trigram', 'vocabulary'), name='unique_search_trigram')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.3 on 2026-10-18 05:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0033_search_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookText',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='text_extraction', serialize=False, to='library.book')),
+                ('source_name', models.CharField(blank=True, max_length=255)),
+                ('checksum', models.CharField(blank=True, max_length=40)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DONE', 'Done'), ('FAILED', 'Failed')], db_index=True, default='PENDING', max_length=10)),
+                ('page_count', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('text', models.TextField()),
+                ('length', models.FloatField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='library.book')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PagePosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(db_index=True, max_length=64)),
+                ('frequency', models.FloatField()),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='library.bookpage')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='bookpage',
+            constraint=models.UniqueConstraint(fields=('book', 'page_number'), name='unique_book_page'),
+        ),
+        migrations.AddConstraint(
+            model_name='pageposting',
+            constraint=models.UniqueConstraint(fields=('term', 'page'), name='unique_page_posting'),
+        ),
+    ]
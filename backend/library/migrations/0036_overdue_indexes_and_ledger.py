@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0035_book_holds'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueEntry',
+            fields=[
+                ('record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='overdue_entry', serialize=False, to='library.borrowrecord')),
+                ('due_date', models.DateTimeField()),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(condition=models.Q(('is_returned', False)), fields=['due_date', 'id'], name='borrow_open_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(fields=['user', 'is_returned'], name='library_bor_user_id_4a7f9c_idx'),
+        ),
+        migrations.AddField(
+            model_name='overdueentry',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='library.book'),
+        ),
+        migrations.AddField(
+            model_name='overdueentry',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='overdueentry',
+            index=models.Index(fields=['due_date', 'record'], name='library_ove_due_dat_185b66_idx'),
+        ),
+    ]
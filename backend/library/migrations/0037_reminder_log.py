@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0036_overdue_indexes_and_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReminderLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('DUE_SOON', 'Due soon'), ('OVERDUE', 'Overdue')], max_length=10)),
+                ('sent_at', models.DateTimeField(auto_now_add=True)),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='library.borrowrecord')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('record', 'kind'), name='unique_reminder_per_kind')],
+            },
+        ),
+    ]
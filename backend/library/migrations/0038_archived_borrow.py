@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:14
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0037_reminder_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBorrow',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('borrowed_date', models.DateTimeField()),
+                ('due_date', models.DateTimeField()),
+                ('return_date', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='borrowrecord',
+            index=models.Index(condition=models.Q(('is_returned', True)), fields=['return_date', 'id'], name='borrow_returned_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedborrow',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_borrows', to='library.book'),
+        ),
+        migrations.AddField(
+            model_name='archivedborrow',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_borrows', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedborrow',
+            index=models.Index(fields=['user', 'return_date'], name='library_arc_user_id_d7d50e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedborrow',
+            index=models.Index(fields=['book', 'user'], name='library_arc_book_id_342997_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedborrow',
+            index=models.Index(fields=['borrowed_date', 'id'], name='library_arc_borrowe_6a0caa_idx'),
+        ),
+    ]
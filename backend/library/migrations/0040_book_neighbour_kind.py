@@ -0,0 +1,26 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0039_book_neighbour'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='bookneighbour',
+            name='unique_neighbour_rank',
+        ),
+        migrations.AddField(
+            model_name='bookneighbour',
+            name='kind',
+            field=models.CharField(choices=[('CO_BORROW', 'Borrowed together'), ('CATEGORY', 'Shared categories')], default='CO_BORROW', max_length=10),
+        ),
+        migrations.AddConstraint(
+            model_name='bookneighbour',
+            constraint=models.UniqueConstraint(fields=('book', 'kind', 'rank'), name='unique_neighbour_rank'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0040_book_neighbour_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VideoNeighbour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('neighbour', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='library.video')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbours', to='library.video')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('video', 'rank'), name='unique_video_neighbour_rank')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0042_user_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfeed',
+            name='stale_since',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='userfeed',
+            name='built_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
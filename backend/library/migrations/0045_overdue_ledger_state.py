@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0044_version_stamp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueLedgerState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('watermark', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:58
+
+from django.db import migrations, models
+from django.db.models import Avg, F, Value
+
+# library.search.K1 and B at the time of this migration.
+K1 = 1.2
+B = 0.75
+
+
+def compute_impacts(apps, schema_editor):
+    SearchDocument = apps.get_model('library', 'SearchDocument')
+    SearchPosting = apps.get_model('library', 'SearchPosting')
+    avg_length = SearchDocument.objects.aggregate(avg=Avg('length'))['avg'] or 1.0
+    SearchPosting.objects.update(impact=F('frequency') * Value(K1 + 1) / (
+        F('frequency') + Value(K1) * (Value(1 - B) + Value(B) * F('length') / Value(avg_length))
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0045_overdue_ledger_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchposting',
+            name='impact',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(compute_impacts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='searchposting',
+            index=models.Index(fields=['term', '-impact', 'book'], name='search_posting_impact_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.3 on 2026-10-18 07:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0046_search_posting_impact'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StaleVideoNeighbours',
+            fields=[
+                ('video_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('stale_since', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,12 +1,15 @@
+import time
 import uuid
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from django.db import models
-from django.db.models import Count
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import FileExtensionValidator
-import random
-from django.db.models.signals import post_save
+from django.db import IntegrityError, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 
 class User(AbstractUser):
@@ -35,6 +38,26 @@ class BorrowRecord(models.Model):
     is_returned = models.BooleanField(default=False)
 
     class Meta:
+        indexes = [
+            models.Index(fields=['borrowed_date', 'id']),
+            # Open/overdue borrows: is_returned=False AND due_date < now,
+            # ordered by (due_date, id) as OverduePagination pages them.
+            # Partial, so it only holds open borrows and matches the
+            # NOT is_returned predicate on every backend.
+            models.Index(
+                fields=['due_date', 'id'],
+                condition=models.Q(is_returned=False),
+                name='borrow_open_due_idx',
+            ),
+            # A user's current borrows / history.
+            models.Index(fields=['user', 'is_returned']),
+            # Returned borrows waiting to be moved to ArchivedBorrow.
+            models.Index(
+                fields=['return_date', 'id'],
+                condition=models.Q(is_returned=True),
+                name='borrow_returned_idx',
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['user', 'book'],
@@ -43,10 +66,259 @@ class BorrowRecord(models.Model):
             )
         ]
 
+    def mark_returned(self):
+        """
+        Close this borrow and put its copy back, in one transaction. Returns
+        False when another request already returned it.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            closed = BorrowRecord.objects.filter(pk=self.pk, is_returned=False).update(
+                is_returned=True, return_date=now
+            )
+            if not closed:
+                return False
+            OverdueEntry.objects.filter(record_id=self.pk).delete()
+            BookHold.release_copies(self.book_id)
+        self.is_returned = True
+        self.return_date = now
+        return True
+
+class ArchivedBorrow(models.Model):
+    """
+    Cold tier of BorrowRecord: returned borrows older than
+    BORROW_ARCHIVE_AFTER_DAYS, moved here in batches by
+    ``manage.py archive_borrows`` under their original id. Borrow history and
+    reports read both tables (library.archive).
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_borrows')
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='archived_borrows')
+    borrowed_date = models.DateTimeField()
+    due_date = models.DateTimeField()
+    return_date = models.DateTimeField()
+
+    is_returned = True
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'return_date']),
+            models.Index(fields=['book', 'user']),
+            models.Index(fields=['borrowed_date', 'id']),
+        ]
+
+class OverdueEntry(models.Model):
+    """
+    Materialized overdue ledger: one row per open borrow past its due date.
+    Filled by ``manage.py refresh_overdue_ledger`` and emptied by returns, so
+    overdue counts and reports read O(overdue) rows.
+    """
+    record = models.OneToOneField(
+        BorrowRecord, on_delete=models.CASCADE, primary_key=True, related_name='overdue_entry'
+    )
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    book = models.ForeignKey('Book', on_delete=models.CASCADE)
+    due_date = models.DateTimeField()
+    detected_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['due_date', 'record']),
+        ]
+
+class OverdueLedgerState(models.Model):
+    """
+    Singleton row holding the cut-off of the last ledger refresh, written in
+    the same transaction as the OverdueEntry rows it covers.
+    """
+    watermark = models.DateTimeField()
+
+class ReminderLog(models.Model):
+    """
+    Which due-soon / overdue reminders went out (or were skipped, for users
+    without an email address), so dispatcher reruns skip them.
+    """
+    DUE_SOON = 'DUE_SOON'
+    OVERDUE = 'OVERDUE'
+    KINDS = [
+        (DUE_SOON, 'Due soon'),
+        (OVERDUE, 'Overdue'),
+    ]
+
+    record = models.ForeignKey(BorrowRecord, on_delete=models.CASCADE, related_name='reminders')
+    kind = models.CharField(max_length=10, choices=KINDS)
+    sent_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['record', 'kind'], name='unique_reminder_per_kind')
+        ]
+
+class BookHold(models.Model):
+    """
+    A place in a book's FIFO waiting list. When a copy comes back it goes to
+    the oldest WAITING hold, which becomes READY for HOLD_PICKUP_DAYS; the
+    holder's next borrow consumes it. Unclaimed READY holds are expired by
+    ``manage.py expire_holds``, passing the copy on.
+    """
+    WAITING = 'WAITING'
+    READY = 'READY'
+    FULFILLED = 'FULFILLED'
+    EXPIRED = 'EXPIRED'
+    CANCELLED = 'CANCELLED'
+    STATUSES = [
+        (WAITING, 'Waiting'),
+        (READY, 'Ready for pickup'),
+        (FULFILLED, 'Fulfilled'),
+        (EXPIRED, 'Expired'),
+        (CANCELLED, 'Cancelled'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='holds')
+    book = models.ForeignKey('Book', on_delete=models.CASCADE, related_name='holds')
+    status = models.CharField(max_length=10, choices=STATUSES, default=WAITING)
+    created_at = models.DateTimeField(auto_now_add=True)
+    ready_at = models.DateTimeField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Queue head and queue position lookups.
+            models.Index(fields=['book', 'status', 'created_at', 'id']),
+            # Expiry sweep.
+            models.Index(fields=['status', 'expires_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'book'],
+                condition=models.Q(status__in=['WAITING', 'READY']),
+                name='unique_open_hold'
+            )
+        ]
+
+    def queue_position(self):
+        """1-based position among the book's waiting holds, None if not waiting."""
+        if self.status != self.WAITING:
+            return None
+        return BookHold.objects.filter(
+            models.Q(created_at__lt=self.created_at) | models.Q(created_at=self.created_at, id__lt=self.id),
+            book_id=self.book_id,
+            status=self.WAITING,
+        ).count() + 1
+
+    @classmethod
+    def with_queue_positions(cls, holds):
+        """
+        ``holds`` as a list, each with ``waiting_position`` set to what
+        queue_position() would return: one windowed query numbers the waiting
+        holds of all their books instead of a COUNT per hold.
+        """
+        holds = list(holds)
+        book_ids = {hold.book_id for hold in holds if hold.status == cls.WAITING}
+        positions = {}
+        if book_ids:
+            positions = dict(cls.objects.filter(book_id__in=book_ids, status=cls.WAITING).annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=[F('book_id')],
+                    order_by=[F('created_at').asc(), F('id').asc()],
+                )
+            ).values_list('id', 'position'))
+        for hold in holds:
+            hold.waiting_position = positions.get(hold.pk)
+        return holds
+
+    @classmethod
+    def place(cls, user, book):
+        if book.book_type == 'EBOOK':
+            raise ValueError("E-Books cannot be placed on hold")
+        if book.available_copies > 0:
+            raise ValueError("Copies are available, borrow the book instead")
+        if BorrowRecord.objects.filter(user=user, book=book, is_returned=False).exists():
+            raise ValueError("You already have an active borrow for this book")
+        try:
+            with transaction.atomic():
+                return cls.objects.create(user=user, book=book)
+        except IntegrityError:
+            raise ValueError("You already have a hold on this book")
+
+    @classmethod
+    def release_copies(cls, book_id, count=1):
+        """
+        Give ``count`` freed copies of a book to its oldest waiting holds and
+        put the rest back on the shelf. Runs in the caller's transaction;
+        returns the number of holds that became ready.
+        """
+        remaining = count
+        while remaining:
+            head = list(cls.objects.filter(
+                book_id=book_id, status=cls.WAITING
+            ).order_by('created_at', 'id').values_list('pk', flat=True)[:remaining])
+            if not head:
+                break
+            now = timezone.now()
+            # Conditional: a concurrent release may have taken some of them.
+            remaining -= cls.objects.filter(pk__in=head, status=cls.WAITING).update(
+                status=cls.READY,
+                ready_at=now,
+                expires_at=now + timedelta(days=settings.HOLD_PICKUP_DAYS),
+            )
+        if remaining:
+            Book.objects.filter(pk=book_id).update(available_copies=F('available_copies') + remaining)
+            book_rows_updated([book_id])
+        return count - remaining
+
+    @classmethod
+    def claim(cls, user, book_id):
+        """Consume the user's READY hold on a book; True if there was one."""
+        return bool(cls.objects.filter(user=user, book_id=book_id, status=cls.READY).update(
+            status=cls.FULFILLED, closed_at=timezone.now()
+        ))
+
+    def cancel(self):
+        with transaction.atomic():
+            now = timezone.now()
+            if BookHold.objects.filter(pk=self.pk, status=self.READY).update(status=self.CANCELLED, closed_at=now):
+                BookHold.release_copies(self.book_id)
+            elif not BookHold.objects.filter(pk=self.pk, status=self.WAITING).update(status=self.CANCELLED, closed_at=now):
+                return False
+        self.status = self.CANCELLED
+        return True
+
+    @classmethod
+    def expire_ready(cls):
+        """Expire unclaimed READY holds and pass their copies on; returns the count."""
+        now = timezone.now()
+        overdue = cls.objects.filter(status=cls.READY, expires_at__lt=now).values_list('pk', 'book_id')
+        by_book = {}
+        for pk, book_id in overdue:
+            by_book.setdefault(book_id, []).append(pk)
+        expired = 0
+        for book_id, pks in by_book.items():
+            with transaction.atomic():
+                count = cls.objects.filter(pk__in=pks, status=cls.READY, expires_at__lt=now).update(
+                    status=cls.EXPIRED, closed_at=now
+                )
+                if count:
+                    cls.release_copies(book_id, count)
+            expired += count
+        return expired
+
+class LoadTimeMixin:
+    """Stamps rows read from the database with ``_loaded_at`` (``time_ns``)."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The fragment cache compares this with the row's version stamp.
+        instance._loaded_at = time.time_ns()
+        return instance
+
 def generate_book_uuid():
     return f"BOOK-{uuid.uuid4().hex[:6].upper()}"
 
-class Book(models.Model):
+class Book(LoadTimeMixin, models.Model):
     """
     This model represents a book.
     """
@@ -92,61 +364,69 @@ class Book(models.Model):
     )
 
     def borrow_book(self, user, days):
+        """
+        Take a copy with a conditional UPDATE (no read-check-write race, no
+        full-row save) and insert the BorrowRecord in the same transaction.
+        The unique_active_borrow constraint rejects a second active borrow.
+        """
         if self.book_type == 'EBOOK':
             raise ValueError("E-Books cannot be borrowed")
             
         if days > 30 or days < 1:
             raise ValueError("Borrowing period must be between 1-30 days")     
-         
-        if BorrowRecord.objects.filter(user=user, book=self, is_returned=False).exists():
-            raise ValueError("You already have an active borrow for this book")
-                  
-        if self.available_copies <= 0:
-            raise ValueError("No copies available")
-            
-        self.available_copies -= 1
-        self.save()
-        
+
         due_date = timezone.now() + timedelta(days=days)
-        return BorrowRecord.objects.create(
-            user=user,
-            book=self,
-            due_date=due_date
-        )
-    def return_book(self):
-        self.available_copies += 1
-        self.save()
+        try:
+            with transaction.atomic():
+                # A copy held for this user was never put back on the shelf.
+                from_hold = BookHold.claim(user, self.pk)
+                if not from_hold:
+                    taken = Book.objects.filter(pk=self.pk, available_copies__gt=0).update(
+                        available_copies=F('available_copies') - 1
+                    )
+                    if not taken:
+                        raise ValueError("No copies available")
+                record = BorrowRecord.objects.create(user=user, book=self, due_date=due_date)
+                if not from_hold:
+                    book_rows_updated([self.pk])
+        except IntegrityError:
+            raise ValueError("You already have an active borrow for this book")
+        if not from_hold:
+            self.available_copies = max(0, self.available_copies - 1)
+        return record
       
     def get_related_books(self):
-        """Get books with similar categories"""
-        return Book.objects.filter(
-            categories__in=self.categories.all()
-        ).exclude(
-            id=self.id
-        ).annotate(
-            common_categories=Count('categories')
-        ).order_by('-common_categories', '?')[:4]  # 4 random books with most categories in comm
-    
+        """Books sharing the most categories with this one (precomputed, deterministic)"""
+        related = [
+            neighbour.neighbour
+            for neighbour in self.neighbours.filter(kind=BookNeighbour.CATEGORY).select_related(
+                'neighbour'
+            ).order_by('rank')[:4]
+        ]
+        return related or self.live_category_picks()
+
     def get_enhanced_recommendations(self):
-        """Combine category-based and borrowing-pattern based recommendations"""
-        # Category-based
-        category_books = self.get_related_books()
-        
-        # Borrowing-pattern based (books often borrowed together)
-        frequently_co_borrowed = Book.objects.filter(
-            borrowrecord__user__in=User.objects.filter(
-                borrowrecord__book=self
-            )
-        ).exclude(
-            id=self.id
-        ).annotate(
-            borrow_count=Count('borrowrecord')
-        ).order_by('-borrow_count')[:2]
-        
-        # Combine and remove duplicates
-        all_recs = list(category_books) + list(frequently_co_borrowed)
-        unique_recs = list({b.id: b for b in all_recs}.values())
-        return unique_recs[:4]
+        """
+        Books most often borrowed together with this one, topped up with the
+        ones sharing most categories; both precomputed in BookNeighbour and
+        read with one query.
+        """
+        neighbours = self.neighbours.filter(rank__lt=4).select_related('neighbour')
+        ordered = sorted(neighbours, key=lambda n: (n.kind != BookNeighbour.CO_BORROW, n.rank))
+        recs = list({n.neighbour_id: n.neighbour for n in ordered}.values())
+        return recs[:4] or self.live_category_picks()
+
+    def live_category_picks(self, limit=4):
+        """
+        Fallback for books added since the last ``build_recommendations``:
+        the newest books sharing most categories, counted over the join of
+        this book's categories only.
+        """
+        return list(
+            Book.objects.filter(categories__in=self.categories.all()).exclude(pk=self.pk).annotate(
+                shared=Count('categories')
+            ).order_by('-shared', '-id')[:limit]
+        )
 
     def __str__(self):
         return f"{self.title} ({self.book_uuid})"
@@ -156,8 +436,99 @@ class Book(models.Model):
             models.Index(fields=['title']),
             models.Index(fields=['author']),
             models.Index(fields=['publisher']),
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+class SearchDocument(models.Model):
+    """Per-book statistics for the full-text index (see library.search)."""
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    length = models.FloatField(default=0)
+    indexed_at = models.DateTimeField(auto_now=True)
+
+
+class SearchPosting(models.Model):
+    """One (term, book) entry of the inverted index."""
+    term = models.CharField(max_length=64, db_index=True)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_postings')
+    frequency = models.FloatField()
+    length = models.FloatField()
+    # idf-free BM25 score of the term for this book (see library.search.impact)
+    impact = models.FloatField(default=0.0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'book'], name='unique_search_posting')
+        ]
+        indexes = [
+            # Best postings of a term first, for top-k search.
+            models.Index(fields=['term', '-impact', 'book'], name='search_posting_impact_idx'),
+        ]
+
+class SearchVocabulary(models.Model):
+    """Distinct title/author words, used for typo-tolerant matching (see library.fuzzy)."""
+    term = models.CharField(max_length=64, unique=True)
+    book_count = models.PositiveIntegerField(default=0)
+    trigram_count = models.PositiveSmallIntegerField()
+
+
+class SearchTrigram(models.Model):
+    trigram = models.CharField(max_length=3, db_index=True)
+    vocabulary = models.ForeignKey(SearchVocabulary, on_delete=models.CASCADE, related_name='trigrams')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'vocabulary'], name='unique_search_trigram')
         ]
 
+class BookText(models.Model):
+    """Extraction state of a book's PDF (see library.pdf_text)."""
+    PENDING = 'PENDING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+    STATUSES = [(PENDING, 'Pending'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='text_extraction')
+    source_name = models.CharField(max_length=255, blank=True)
+    checksum = models.CharField(max_length=40, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING, db_index=True)
+    page_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class BookPage(models.Model):
+    """Text of one PDF page, the unit of ebook content search."""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.PositiveIntegerField()
+    text = models.TextField()
+    length = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'page_number'], name='unique_book_page')
+        ]
+
+
+class PagePosting(models.Model):
+    term = models.CharField(max_length=64, db_index=True)
+    page = models.ForeignKey(BookPage, on_delete=models.CASCADE, related_name='postings')
+    frequency = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'page'], name='unique_page_posting')
+        ]
+
+class VersionStamp(models.Model):
+    """
+    Version stamp kept in the database, for scopes changed by management
+    commands: a stamp bumped in another process's cache is never seen by the
+    web workers (library.versioning).
+    """
+    scope = models.CharField(max_length=50, primary_key=True)
+    stamp = models.BigIntegerField()
+    expires_at = models.DateTimeField(null=True, blank=True)
+
 class FeaturedBook(models.Model):
     books = models.ManyToManyField('Book')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -174,30 +545,146 @@ class FeaturedBook(models.Model):
         
     @classmethod
     def create_featured_set(cls):
-        available_books = Book.objects.filter(is_available=True)
-        count = available_books.count()
-        
-        if count < 4:
-            featured_books = list(available_books) if count > 0 else []
-        else:
-            featured_books = random.sample(list(available_books), 4)
-        
-        featured_set = cls.objects.create(
-            expires_at=timezone.now() + timezone.timedelta(hours=12)
-        )
-        featured_set.books.set(featured_books)
-        return featured_set
+        """Draw a new set now; normally done by ``manage.py rotate_featured``."""
+        from .featured import rotate
+        return rotate()
 
     def is_current(self):
         return timezone.now() < self.expires_at
 
+class BookNeighbour(models.Model):
+    """
+    Precomputed related books, best first: books often borrowed together
+    with this one, and books sharing the most categories with it. Rebuilt by
+    ``manage.py build_recommendations`` (library.recommendations).
+    """
+    CO_BORROW = 'CO_BORROW'
+    CATEGORY = 'CATEGORY'
+    KINDS = [
+        (CO_BORROW, 'Borrowed together'),
+        (CATEGORY, 'Shared categories'),
+    ]
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    kind = models.CharField(max_length=10, choices=KINDS, default=CO_BORROW)
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            # Also the index behind a book's recommendation lookup.
+            models.UniqueConstraint(fields=['book', 'kind', 'rank'], name='unique_neighbour_rank')
+        ]
+
 @receiver(post_save, sender=Book)
-def check_featured_books(sender, instance, **kwargs):
-    if not FeaturedBook.objects.filter(expires_at__gt=timezone.now()).exists():
-        try:
-            FeaturedBook.create_featured_set()
-        except:
-            pass 
+def index_book_for_search(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .search import index_book
+    from .search_cache import search_cache
+    terms = index_book(instance)
+    transaction.on_commit(lambda: search_cache.invalidate_terms(terms))
+
+@receiver(post_delete, sender=Book)
+def unindex_book_for_search(sender, instance, **kwargs):
+    from .search import book_terms, forget_stats
+    from .search_cache import search_cache
+    terms = set(book_terms(instance)[0])
+    forget_stats(terms)
+    transaction.on_commit(lambda: search_cache.invalidate_terms(terms))
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def invalidate_search_on_category_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Cached search pages embed each book's category names.
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    from .search import indexed_terms
+    from .search_cache import search_cache
+    if not reverse:
+        book_ids = [instance.pk]
+    elif pk_set is not None:
+        book_ids = list(pk_set)
+    else:
+        book_ids = list(instance.book_set.values_list('pk', flat=True))
+    terms = indexed_terms(book_ids)
+    transaction.on_commit(lambda: search_cache.invalidate_terms(terms))
+
+@receiver(pre_save, sender=Book)
+def remember_indexed_book_values(sender, instance, raw=False, **kwargs):
+    instance._previous_values = {}
+    if instance.pk and not raw:
+        instance._previous_values = Book.objects.filter(
+            pk=instance.pk
+        ).values('title', 'author', 'publisher', 'pdf_file').first() or {}
+
+@receiver(post_save, sender=Book)
+def publish_book_suggestions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .suggestions import book_changes, publish_changes
+    current = {'title': instance.title, 'author': instance.author, 'publisher': instance.publisher}
+    changes = book_changes(getattr(instance, '_previous_values', {}), current)
+    transaction.on_commit(lambda: publish_changes(changes))
+
+@receiver(post_save, sender=Book)
+def update_fuzzy_vocabulary(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .fuzzy import update_vocabulary, vocabulary_terms
+    previous = getattr(instance, '_previous_values', {})
+    update_vocabulary(
+        vocabulary_terms(previous.get('title'), previous.get('author')),
+        vocabulary_terms(instance.title, instance.author)
+    )
+
+@receiver(post_save, sender=Book)
+def schedule_pdf_text_extraction(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .pdf_text import schedule_extraction
+    schedule_extraction(instance)
+
+@receiver(post_delete, sender=Book)
+def retract_fuzzy_vocabulary(sender, instance, **kwargs):
+    from .fuzzy import update_vocabulary, vocabulary_terms
+    update_vocabulary(vocabulary_terms(instance.title, instance.author), set())
+
+@receiver(post_delete, sender=Book)
+def retract_book_suggestions(sender, instance, **kwargs):
+    from .suggestions import book_changes, publish_changes
+    previous = {'title': instance.title, 'author': instance.author, 'publisher': instance.publisher}
+    changes = book_changes(previous, {})
+    transaction.on_commit(lambda: publish_changes(changes))
+
+@receiver(pre_save, sender=Category)
+def remember_category_name(sender, instance, raw=False, **kwargs):
+    instance._suggestion_previous = None
+    if instance.pk and not raw:
+        instance._suggestion_previous = Category.objects.filter(
+            pk=instance.pk
+        ).values_list('name', flat=True).first()
+
+@receiver(post_save, sender=Category)
+def publish_category_suggestions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .suggestions import publish_changes
+    previous = getattr(instance, '_suggestion_previous', None)
+    if previous != instance.name:
+        changes = [('category', [instance.name], [previous] if previous else [])]
+        transaction.on_commit(lambda: publish_changes(changes))
+    if previous and previous != instance.name:
+        from .search import indexed_terms
+        from .search_cache import search_cache
+        terms = indexed_terms(instance.book_set.values('pk'))
+        transaction.on_commit(lambda: search_cache.invalidate_terms(terms))
+
+@receiver(post_delete, sender=Category)
+def retract_category_suggestions(sender, instance, **kwargs):
+    from .suggestions import publish_changes
+    changes = [('category', [], [instance.name])]
+    transaction.on_commit(lambda: publish_changes(changes))
 
 class ReadingSession(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -208,10 +695,22 @@ class ReadingSession(models.Model):
     class Meta:
         unique_together = ['user', 'book']
 
+class UserFeed(models.Model):
+    """
+    Precomputed "for you" candidates of a user, best first, as a compact id
+    list. Built by ``manage.py build_feeds``; new activity only sets
+    ``stale_since`` and ``build_feeds --stale`` rebuilds those rows
+    (library.feed).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='feed')
+    book_ids = models.JSONField(default=list)
+    built_at = models.DateTimeField(null=True, blank=True)
+    stale_since = models.DateTimeField(null=True, blank=True, db_index=True)
+
 def generate_video_uuid():
     return f"VIDEO-{uuid.uuid4().hex[:6].upper()}"
 
-class Video(models.Model):
+class Video(LoadTimeMixin, models.Model):
     VIDEO_CATEGORIES = (
         ('TUTORIAL', 'Tutorial'),
         ('LECTURE', 'Lecture'),
@@ -248,4 +747,216 @@ class Video(models.Model):
         return bool(self.external_source)
 
     def __str__(self):
-        return f"{self.title} ({self.get_category_display()})"
\ No newline at end of file
+        return f"{self.title} ({self.get_category_display()})"
+
+    def get_related_videos(self):
+        """Most similar videos by title, instructor and category (precomputed)"""
+        return [
+            neighbour.neighbour
+            for neighbour in self.neighbours.select_related('neighbour').order_by('rank')[:4]
+        ]
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id']),
+        ]
+
+class VideoNeighbour(models.Model):
+    """
+    Precomputed related videos, best first. Saving or deleting a video
+    queues it in StaleVideoNeighbours and ``build_recommendations --stale``
+    refreshes the affected lists; ``manage.py build_recommendations``
+    rebuilds them all (library.recommendations).
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'rank'], name='unique_video_neighbour_rank')
+        ]
+
+class StaleVideoNeighbours(models.Model):
+    """
+    Videos saved or deleted since their neighbours were last refreshed. A
+    plain id rather than a foreign key, so deleted videos stay queued.
+    """
+    video_id = models.BigIntegerField(primary_key=True)
+    stale_since = models.DateTimeField()
+
+def _bump_versions(*scopes, timeout=None):
+    from .versioning import bump
+    transaction.on_commit(lambda: bump(*scopes, timeout=timeout))
+
+@receiver([post_save, post_delete], sender=Book)
+@receiver(m2m_changed, sender=Book.categories.through)
+def bump_book_version(sender, **kwargs):
+    _bump_versions('books')
+
+@receiver([post_save, post_delete], sender=Category)
+def bump_category_version(sender, **kwargs):
+    _bump_versions('categories')
+
+@receiver([post_save, post_delete], sender=Video)
+def bump_video_version(sender, **kwargs):
+    _bump_versions('videos')
+
+@receiver([post_save, post_delete], sender=User)
+def bump_user_version(sender, created=True, **kwargs):
+    if created:
+        _bump_versions('users')
+
+@receiver(post_save, sender=FeaturedBook)
+@receiver(m2m_changed, sender=FeaturedBook.books.through)
+@receiver(post_delete, sender=FeaturedBook)
+def bump_featured_version(sender, raw=False, action='post_', **kwargs):
+    from .versioning import bump_stored
+    if raw or action.startswith('pre_'):
+        return
+    # Stored in the database: sets are rotated by a cron process. The stamp
+    # lapses together with the latest set, so clients revalidating after
+    # expiry see that it is no longer current.
+    expires_at = FeaturedBook.objects.order_by('-created_at', '-id').values_list('expires_at', flat=True).first()
+    bump_stored('featured', expires_at=expires_at)
+
+def _schedule_snapshot(name, pks=None):
+    from .snapshots import schedule
+    transaction.on_commit(lambda: schedule(name, pks))
+
+@receiver([post_save, post_delete], sender=Book)
+def refresh_book_snapshot(sender, instance, **kwargs):
+    _schedule_snapshot('books', [instance.pk])
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def refresh_book_snapshot_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # Category side: the affected books are spread over any shard.
+        _schedule_snapshot('books')
+    else:
+        _schedule_snapshot('books', [instance.pk])
+
+@receiver([post_save, post_delete], sender=Category)
+def refresh_book_snapshot_category(sender, **kwargs):
+    _schedule_snapshot('books')
+
+@receiver([post_save, post_delete], sender=Video)
+def refresh_video_snapshot(sender, instance, **kwargs):
+    _schedule_snapshot('videos', [instance.pk])
+
+def _invalidate_fragments(kind, pks=None):
+    from .fragments import book_fragments, video_fragments
+    fragments = book_fragments if kind == 'book' else video_fragments
+    if pks is None:
+        transaction.on_commit(fragments.invalidate_all)
+    else:
+        pks = list(pks)
+        transaction.on_commit(lambda: fragments.invalidate(pks))
+
+@receiver([post_save, post_delete], sender=Book)
+def invalidate_book_fragment(sender, instance, **kwargs):
+    _invalidate_fragments('book', [instance.pk])
+
+@receiver(m2m_changed, sender=Book.categories.through)
+def invalidate_book_fragment_categories(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        _invalidate_fragments('book', [instance.pk])
+    else:
+        _invalidate_fragments('book', pk_set)
+
+@receiver(post_save, sender=Category)
+def invalidate_book_fragments_category(sender, instance, created=False, raw=False, **kwargs):
+    # Fragments embed category names; only a rename changes them.
+    previous = getattr(instance, '_suggestion_previous', None)
+    if not created and not raw and previous != instance.name:
+        _invalidate_fragments('book')
+
+@receiver(post_delete, sender=Category)
+def invalidate_book_fragments_category_delete(sender, **kwargs):
+    _invalidate_fragments('book')
+
+@receiver([post_save, post_delete], sender=Video)
+def invalidate_video_fragment(sender, instance, **kwargs):
+    _invalidate_fragments('video', [instance.pk])
+
+def user_activity_recorded(user_ids):
+    """
+    Mark the feeds of users with new borrows or reading sessions stale, in
+    one upsert; ``manage.py build_feeds --stale`` regenerates them off the
+    request path. Called by the receiver below and by bulk paths that
+    bypass signals.
+    """
+    now = timezone.now()
+    feeds = [UserFeed(user_id=user_id, stale_since=now) for user_id in user_ids]
+    if feeds:
+        UserFeed.objects.bulk_create(
+            feeds, update_conflicts=True, unique_fields=['user'], update_fields=['stale_since'],
+        )
+
+@receiver(post_save, sender=BorrowRecord)
+@receiver(post_save, sender=ReadingSession)
+def refresh_feed_on_activity(sender, instance, created=False, raw=False, **kwargs):
+    # New seeds only; returns and page turns leave the candidates as they are.
+    if created and not raw:
+        user_activity_recorded([instance.user_id])
+
+VIDEO_SIMILARITY_FIELDS = ('title', 'instructor', 'category')
+
+@receiver(pre_save, sender=Video)
+def remember_video_similarity_values(sender, instance, raw=False, **kwargs):
+    instance._similarity_values = None
+    if instance.pk and not raw:
+        instance._similarity_values = Video.objects.filter(pk=instance.pk).values(*VIDEO_SIMILARITY_FIELDS).first()
+
+def video_similarity_changed(video_ids):
+    """
+    Queue the neighbour lists ``video_ids`` can affect for a refresh, in one
+    upsert; ``manage.py build_recommendations --stale`` recomputes them off
+    the request path, since that reads every video.
+    """
+    now = timezone.now()
+    rows = [StaleVideoNeighbours(video_id=video_id, stale_since=now) for video_id in video_ids]
+    if rows:
+        StaleVideoNeighbours.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=['video_id'], update_fields=['stale_since'],
+        )
+
+@receiver(post_save, sender=Video)
+def refresh_video_neighbours_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    current = {field: getattr(instance, field) for field in VIDEO_SIMILARITY_FIELDS}
+    if getattr(instance, '_similarity_values', None) == current:
+        return
+    video_similarity_changed([instance.pk])
+
+@receiver(pre_delete, sender=Video)
+def remember_video_neighbour_of(sender, instance, **kwargs):
+    # These rows cascade with the video; their owners need a new list.
+    instance._neighbour_of = list(
+        VideoNeighbour.objects.filter(neighbour=instance).values_list('video_id', flat=True)
+    )
+
+@receiver(post_delete, sender=Video)
+def refresh_video_neighbours_on_delete(sender, instance, **kwargs):
+    video_similarity_changed([instance.pk] + getattr(instance, '_neighbour_of', []))
+
+def book_rows_updated(pks):
+    """
+    Invalidation for Book rows changed with queryset.update(), which sends
+    no signals: what the Book post_save receivers would have done for
+    columns that are not indexed for search.
+    """
+    from .search import indexed_terms
+    from .search_cache import search_cache
+    pks = list(pks)
+    terms = indexed_terms(pks)
+    transaction.on_commit(lambda: search_cache.invalidate_terms(terms))
+    _bump_versions('books')
+    _invalidate_fragments('book', pks)
+    _schedule_snapshot('books', pks)
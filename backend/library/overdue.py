@@ -0,0 +1,48 @@
+"""
+Overdue ledger maintenance and O(overdue) overdue queries.
+
+``refresh_ledger()`` (run periodically by ``manage.py
+refresh_overdue_ledger``) records every open borrow that has passed its due
+date in OverdueEntry and stores the cut-off it used as a watermark in
+OverdueLedgerState, in the same transaction, so every process sees it.
+Returns delete their entry immediately, so between runs the overdue set is
+the ledger plus open borrows that fell due after the watermark; both parts
+are index range scans over overdue rows only.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BorrowRecord, OverdueEntry, OverdueLedgerState
+
+LEDGER_STATE_ID = 1
+
+
+def overdue_records(now=None):
+    """Open overdue borrows, served by the partial borrow_open_due_idx index."""
+    return BorrowRecord.objects.filter(is_returned=False, due_date__lt=now or timezone.now())
+
+
+def refresh_ledger(now=None):
+    """Bring the ledger up to ``now``; returns ``(added, removed)``."""
+    now = now or timezone.now()
+    with transaction.atomic():
+        new = overdue_records(now).filter(overdue_entry__isnull=True).values_list(
+            'pk', 'user_id', 'book_id', 'due_date'
+        )
+        added = OverdueEntry.objects.bulk_create([
+            OverdueEntry(record_id=pk, user_id=user_id, book_id=book_id, due_date=due_date)
+            for pk, user_id, book_id, due_date in new
+        ], batch_size=1000, ignore_conflicts=True)
+        # Safety net for records closed without going through a return path.
+        removed, _ = OverdueEntry.objects.filter(record__is_returned=True).delete()
+        OverdueLedgerState.objects.update_or_create(pk=LEDGER_STATE_ID, defaults={'watermark': now})
+    return len(added), removed
+
+
+def overdue_count(now=None):
+    now = now or timezone.now()
+    watermark = OverdueLedgerState.objects.filter(pk=LEDGER_STATE_ID).values_list('watermark', flat=True).first()
+    if watermark is None or watermark > now:
+        # Ledger never built.
+        return overdue_records(now).count()
+    return OverdueEntry.objects.count() + overdue_records(now).filter(due_date__gte=watermark).count()
@@ -0,0 +1,216 @@
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET/COUNT, the cursor stores the ordering key of the last row
+that was sent and the next page seeks past it with a WHERE clause, so page
+500 costs the same index range scan as page 1. Search ranks in Python, so its
+cursors page through a cached ranking instead, loading only the part of it
+that a page shows (see paginate_ranked_window()).
+
+Listings stay unpaginated unless the client opts in by sending a ``cursor``
+query parameter (empty for the first page), which keeps existing clients that
+expect a plain array working.
+"""
+import base64
+import json
+from bisect import bisect_right
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise NotFound('Invalid cursor')
+    if not isinstance(values, list):
+        raise NotFound('Invalid cursor')
+    return values
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek pagination over a queryset ordered by ``ordering``. The last field
+    must be unique (normally ``id``) so every row has a distinct position.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+
+    def is_requested(self, request):
+        return self.cursor_query_param in request.query_params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_seek_filter(self, model, values):
+        """
+        Rows strictly after ``values`` in ordering order:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        if len(values) != len(self.ordering):
+            raise NotFound('Invalid cursor')
+        fields = [name.lstrip('-') for name in self.ordering]
+        try:
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(fields, values)
+            ]
+        except DjangoValidationError:
+            raise NotFound('Invalid cursor')
+
+        seek = Q()
+        for i, name in enumerate(self.ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            condition = Q(**{f'{fields[i]}__{lookup}': values[i]})
+            for field, value in zip(fields[:i], values[:i]):
+                condition &= Q(**{field: value})
+            seek |= condition
+        return seek
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return a page of rows, or None when the client did not ask for paging."""
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        loaded, deferred = queryset.query.deferred_loading
+        if loaded and not deferred:
+            # Sparse fieldsets: the cursor is built from the ordering columns.
+            queryset = queryset.only(*loaded, *(name.lstrip('-') for name in self.ordering))
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.get_seek_filter(queryset.model, decode_cursor(cursor)))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.next_position = None
+        if self.has_next:
+            last = rows[-1]
+            self.next_position = [getattr(last, name.lstrip('-')) for name in self.ordering]
+        return rows
+
+    def decode_ranked_cursor(self, cursor):
+        """
+        ``(score, id, index)`` of the last entry sent. The index is a hint
+        (absent from older cursors) and only trusted after checking it.
+        """
+        values = decode_cursor(cursor)
+        if len(values) not in (2, 3):
+            raise NotFound('Invalid cursor')
+        try:
+            return float(values[0]), int(values[1]), int(values[2]) if len(values) == 3 else None
+        except (TypeError, ValueError):
+            raise NotFound('Invalid cursor')
+
+    def set_ranked_page(self, page, start, total):
+        self.has_next = start + len(page) < total
+        self.next_position = None
+        if self.has_next:
+            last_id, last_score = page[-1]
+            self.next_position = [last_score, last_id, start + len(page) - 1]
+        return page
+
+    def paginate_ranked(self, ranked, request):
+        """
+        Page through an in-memory ``[(id, score), ...]`` list ordered by
+        descending score then id, as returned by library.search.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        start = 0
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            score, last_id, _ = self.decode_ranked_cursor(cursor)
+            # key= (Python 3.10+) bisects in O(log n) without copying ``ranked``.
+            start = bisect_right(ranked, (-score, last_id), key=lambda row: (-row[1], row[0]))
+        return self.set_ranked_page(ranked[start:start + page_size], start, len(ranked))
+
+    def paginate_ranked_window(self, read, request):
+        """
+        paginate_ranked() reading only the entries the page needs:
+        ``read(start, stop)`` returns ``(ranked[start:stop], len(ranked))``,
+        or None when that part of the ranking is not at hand. Returns None
+        when the page cannot be served this way, i.e. the cursor has no index
+        or the entry at its index is no longer the one it names (the ranking
+        changed); paginate_ranked() over the whole ranking still can.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            window = read(0, page_size)
+            if window is None:
+                return None
+            page, total = window
+            return self.set_ranked_page(page, 0, total)
+
+        score, last_id, index = self.decode_ranked_cursor(cursor)
+        if index is None or index < 0:
+            return None
+        # The last entry sent is read again to check the index.
+        window = read(index, index + 1 + page_size)
+        if window is None:
+            return None
+        entries, total = window
+        if not entries or tuple(entries[0]) != (last_id, score):
+            return None
+        return self.set_ranked_page(entries[1:], index + 1, total)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class CatalogPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class BorrowRecordPagination(KeysetPagination):
+    ordering = ('-borrowed_date', '-id')
+
+
+class OverduePagination(KeysetPagination):
+    ordering = ('due_date', 'id')
+
+
+class SearchCursorPagination(KeysetPagination):
+    page_size = 10
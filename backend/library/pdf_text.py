@@ -0,0 +1,254 @@
+"""
+Full-text indexing of ebook PDFs.
+
+When a book's ``pdf_file`` changes, its BookText row is marked pending and the
+extraction is handed to a process pool after the transaction commits, so
+uploads never wait for it. Extracted text is stored one BookPage per PDF page
+with its own inverted index (PagePosting), which lets search_pages() return
+the page a phrase appears on.
+
+Pending books can also be processed in batch with
+``manage.py extract_book_text``.
+"""
+import logging
+import multiprocessing
+import re
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Avg, Count
+
+from .models import Book, BookPage, BookText, PagePosting
+from .pdf_worker import extract_pages
+from .search import bm25_scores, normalize, rank, tokenize
+
+logger = logging.getLogger(__name__)
+
+STATS_CACHE_KEY = 'library:page_search:stats'
+STATS_CACHE_TIMEOUT = 300
+SNIPPET_RADIUS = 80
+PHRASE_BOOST = 2.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'PDF_EXTRACTION_WORKERS', 2),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def schedule_extraction(book):
+    """
+    Called from the Book post_save signal. Queues extraction only when the
+    stored file name changed; the worker additionally skips files whose
+    content checksum is unchanged.
+    """
+    if not book.pdf_file:
+        # Only a book that had a file can have an extraction to drop.
+        previous = getattr(book, '_previous_values', None)
+        if previous is None or previous.get('pdf_file'):
+            BookText.objects.filter(book_id=book.pk).delete()
+        return
+    extraction, created = BookText.objects.get_or_create(book_id=book.pk)
+    if not created and extraction.source_name == book.pdf_file.name \
+            and extraction.status != BookText.FAILED:
+        return
+    extraction.source_name = book.pdf_file.name
+    extraction.status = BookText.PENDING
+    extraction.error = ''
+    extraction.save(update_fields=['source_name', 'status', 'error', 'updated_at'])
+
+    if getattr(settings, 'PDF_EXTRACTION_ASYNC', True):
+        book_id, source_name, path, checksum = book.pk, book.pdf_file.name, book.pdf_file.path, extraction.checksum
+        transaction.on_commit(lambda: submit(book_id, source_name, path, checksum))
+
+
+def submit(book_id, source_name, path, checksum=''):
+    try:
+        future = get_executor().submit(extract_pages, book_id, source_name, path, checksum)
+    except RuntimeError:
+        # Pool shut down (e.g. interpreter exit); the management command
+        # will pick the book up later.
+        logger.warning("Could not queue PDF extraction for book %s", book_id)
+        return
+    future.add_done_callback(lambda done: _on_extracted(book_id, source_name, done))
+
+
+def _mark_failed(book_id, source_name, error):
+    BookText.objects.filter(book_id=book_id, source_name=source_name).update(
+        status=BookText.FAILED, error=str(error)
+    )
+
+
+def _on_extracted(book_id, source_name, future):
+    # Runs on the executor's result thread, which has its own connection.
+    try:
+        try:
+            store_extraction(*future.result())
+        except Exception as exc:
+            logger.exception("PDF extraction failed for book %s", book_id)
+            _mark_failed(book_id, source_name, exc)
+    finally:
+        connection.close()
+
+
+def page_terms(text):
+    frequencies = defaultdict(float)
+    for term in tokenize(text):
+        frequencies[term] += 1.0
+    return frequencies
+
+
+def store_extraction(book_id, source_name, checksum, pages):
+    """
+    Replace a book's page index with text extracted from ``source_name``.
+    Results for a file that is no longer the book's current one (replaced
+    again, or removed, while extracting) are dropped.
+    """
+    current = BookText.objects.filter(book_id=book_id, source_name=source_name)
+    if pages is None:
+        current.update(status=BookText.DONE, error='')
+        return
+
+    with transaction.atomic():
+        # Claim first: the UPDATE takes the write lock, so the source cannot
+        # change between this check and the page rewrite.
+        if not current.update(checksum=checksum, status=BookText.DONE, page_count=len(pages), error=''):
+            return
+        BookPage.objects.filter(book_id=book_id).delete()
+        page_rows, page_frequencies = [], []
+        for number, text in enumerate(pages, 1):
+            frequencies = page_terms(text)
+            if not frequencies:
+                continue
+            page_rows.append(BookPage(
+                book_id=book_id, page_number=number, text=text,
+                length=sum(frequencies.values())
+            ))
+            page_frequencies.append(frequencies)
+        created = BookPage.objects.bulk_create(page_rows)
+        if any(page.pk is None for page in created):
+            # Backends that cannot return ids from bulk_create.
+            created = list(BookPage.objects.filter(book_id=book_id).order_by('page_number'))
+        PagePosting.objects.bulk_create([
+            PagePosting(term=term, page_id=page.pk, frequency=frequency)
+            for page, frequencies in zip(created, page_frequencies)
+            for term, frequency in frequencies.items()
+        ], batch_size=1000)
+    cache.delete(STATS_CACHE_KEY)
+
+
+def extract_pending(workers=None, retry_failed=False):
+    """Extract every pending (optionally also failed) book in a process pool."""
+    statuses = [BookText.PENDING] + ([BookText.FAILED] if retry_failed else [])
+    jobs = []
+    for extraction in BookText.objects.filter(status__in=statuses).select_related('book'):
+        pdf_file = extraction.book.pdf_file
+        if pdf_file:
+            jobs.append((extraction.book_id, pdf_file.name, pdf_file.path, extraction.checksum))
+
+    done = failed = 0
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = {pool.submit(extract_pages, *job): job[:2] for job in jobs}
+        for future, (book_id, source_name) in futures.items():
+            try:
+                store_extraction(*future.result())
+                done += 1
+            except Exception as exc:
+                _mark_failed(book_id, source_name, exc)
+                failed += 1
+    return done, failed
+
+
+def queue_missing():
+    """Create pending BookText rows for books with a PDF but no extraction yet."""
+    missing = Book.objects.exclude(pdf_file='').exclude(pdf_file__isnull=True).filter(text_extraction__isnull=True)
+    BookText.objects.bulk_create([
+        BookText(book_id=book_id, source_name=name, status=BookText.PENDING)
+        for book_id, name in missing.values_list('id', 'pdf_file')
+    ])
+
+
+def page_index_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        aggregate = BookPage.objects.aggregate(count=Count('pk'), avg_length=Avg('length'))
+        stats = (aggregate['count'], aggregate['avg_length'] or 0.0)
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def _snippet(text, query_tokens):
+    normalized = normalize(text)
+    position = -1
+    for token in query_tokens:
+        match = re.search(r'\b' + re.escape(token), normalized)
+        if match:
+            position = match.start()
+            break
+    if position < 0:
+        return text[:2 * SNIPPET_RADIUS].strip()
+    start = max(0, position - SNIPPET_RADIUS)
+    return ' '.join(text[start:position + SNIPPET_RADIUS].split())
+
+
+def search_pages(query, limit=50):
+    """
+    Rank PDF pages against ``query`` and keep the best page per book.
+
+    Pages containing the whole query as a phrase are boosted. Returns a list
+    of dicts with ``book_id``, ``page_number``, ``score`` and ``snippet``.
+    """
+    tokens = tokenize(query)
+    # Exact terms only: prefix expansion comes from the metadata index.
+    groups = [[token] for token in dict.fromkeys(tokens)]
+    if not groups:
+        return []
+    total, avg_length = page_index_stats()
+    if not total:
+        return []
+
+    postings = defaultdict(list)
+    pages = {}
+    all_terms = {term for group in groups for term in group}
+    rows = PagePosting.objects.filter(term__in=all_terms).values_list(
+        'term', 'page_id', 'frequency', 'page__length', 'page__book_id', 'page__page_number'
+    )
+    for term, page_id, frequency, length, book_id, page_number in rows:
+        postings[term].append((page_id, frequency, length))
+        pages[page_id] = (book_id, page_number)
+
+    scores = bm25_scores(groups, postings, total, avg_length)
+    candidates = rank(scores, limit * 5)
+
+    texts = dict(BookPage.objects.filter(
+        pk__in=[page_id for page_id, _ in candidates]
+    ).values_list('pk', 'text'))
+    phrase = ' '.join(tokens)
+
+    best = {}
+    for page_id, score in candidates:
+        text = texts.get(page_id, '')
+        if len(tokens) > 1 and phrase in ' '.join(tokenize(text)):
+            score *= PHRASE_BOOST
+        book_id, page_number = pages[page_id]
+        if book_id not in best or score > best[book_id]['score']:
+            best[book_id] = {
+                'book_id': book_id,
+                'page_number': page_number,
+                'score': score,
+                'snippet': _snippet(text, tokens),
+            }
+    return sorted(best.values(), key=lambda hit: (-hit['score'], hit['book_id']))[:limit]
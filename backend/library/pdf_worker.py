@@ -0,0 +1,41 @@
+"""
+PDF text extraction that runs inside worker processes.
+
+This module must stay free of Django imports so it can be loaded by a
+freshly spawned process; all database work happens in library.pdf_text.
+"""
+import hashlib
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_checksum(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def extract_pages(book_id, source_name, path, known_checksum=''):
+    """
+    Return ``(book_id, source_name, checksum, pages)`` where ``pages`` is the
+    text of each page, or None when the file content matches
+    ``known_checksum`` and does not need extracting again. ``source_name``
+    is passed through so the result can be matched to the job.
+    """
+    checksum = file_checksum(path)
+    if checksum == known_checksum:
+        return book_id, source_name, checksum, None
+
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = []
+    for page in reader.pages:
+        try:
+            pages.append(page.extract_text() or '')
+        except Exception:
+            # One unreadable page should not lose the rest of the book.
+            pages.append('')
+    return book_id, source_name, checksum, pages
@@ -0,0 +1,371 @@
+"""
+Item-to-item book recommendations, precomputed offline with NumPy.
+
+``manage.py build_recommendations`` fills BookNeighbour with two lists per
+book, RECOMMENDATION_NEIGHBOURS long:
+
+* borrowed together: the distinct (user, book) pairs of both borrow tiers
+  give co-borrow counts, normalized to cosine similarity::
+
+      score(a, b) = users(a and b) / sqrt(users(a) * users(b))
+
+* shared categories: a book x category membership matrix multiplied by its
+  transpose in row batches gives the number of categories each pair shares.
+  Equal counts are ordered by a hash of the pair and RECOMMENDATION_SEED, so
+  every build with the same data and seed produces the same lists.
+
+VideoNeighbour holds related videos, scored by title token cosine, same
+instructor and same category (VIDEO_WEIGHTS). Video signals only queue a
+saved or deleted video (StaleVideoNeighbours); ``build_recommendations
+--stale``, run every few minutes, refreshes just the lists those can affect.
+
+Only books whose list changed are rewritten and the stored "recommendations"
+version stamp (a VersionStamp row, visible to every web worker) is bumped
+in the same transaction when anything did, so recommendation responses are
+deterministic, cacheable and ETagged. Serving them is one lookup on
+(book, kind, rank); books added since the last build fall back to a live
+shared-category query (Book.live_category_picks).
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import ArchivedBorrow, Book, BookNeighbour, BorrowRecord, StaleVideoNeighbours, Video, VideoNeighbour
+from .search import normalize, tokenize
+from .versioning import bump_stored
+
+# Heavy borrowers add n^2 pairs and say little about any one book; only
+# this many of their books (the highest ids) are counted.
+MAX_BOOKS_PER_USER = 200
+# Upper bound on pairs expanded (or similarity cells computed) at once, to
+# keep memory flat.
+PAIR_CHUNK = 2_000_000
+# Related videos: title cosine (0..1), same instructor, same category.
+VIDEO_WEIGHTS = {'title': 3.0, 'instructor': 2.0, 'category': 1.0}
+
+
+def neighbour_count():
+    return getattr(settings, 'RECOMMENDATION_NEIGHBOURS', 10)
+
+
+def recommendation_seed():
+    return getattr(settings, 'RECOMMENDATION_SEED', 0)
+
+
+def borrow_pairs():
+    """Distinct ``(users, books)`` arrays over current and archived borrows."""
+    chunks = [
+        np.array(list(model.objects.values_list('user_id', 'book_id').order_by()), dtype=np.int64).reshape(-1, 2)
+        for model in (BorrowRecord, ArchivedBorrow)
+    ]
+    pairs = np.unique(np.concatenate(chunks), axis=0)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def _cap_per_user(users, books, limit):
+    """Keep at most ``limit`` books per user, the highest ids first."""
+    order = np.lexsort((-books, users))
+    users, books = users[order], books[order]
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    sizes = np.diff(np.r_[starts, len(users)])
+    position = np.arange(len(users)) - np.repeat(starts, sizes)
+    keep = position < limit
+    return users[keep], books[keep]
+
+
+def co_occurrence(users, books):
+    """
+    Sparse co-borrow counts as ``(a, b, count)`` arrays over ordered pairs
+    a != b, plus sorted ``(book_ids, users_per_book)``. ``users`` must be
+    grouped.
+    """
+    starts = np.flatnonzero(np.r_[True, users[1:] != users[:-1]])
+    sizes = np.diff(np.r_[starts, len(users)])
+    squares = sizes * sizes
+    keys, counts = [], []
+    group = 0
+    while group < len(starts):
+        # Expand as many users as fit in one chunk (at least one).
+        end = group + max(1, int(np.searchsorted(np.cumsum(squares[group:]), PAIR_CHUNK, side='right')))
+        chunk_starts, chunk_sizes, chunk_squares = starts[group:end], sizes[group:end], squares[group:end]
+        offsets = np.arange(chunk_squares.sum()) - np.repeat(np.cumsum(chunk_squares) - chunk_squares, chunk_squares)
+        n = np.repeat(chunk_sizes, chunk_squares)
+        base = np.repeat(chunk_starts, chunk_squares)
+        a = books[base + offsets // n]
+        b = books[base + offsets % n]
+        different = a != b
+        chunk_keys, chunk_counts = np.unique(
+            np.stack([a[different], b[different]], axis=1), axis=0, return_counts=True
+        )
+        keys.append(chunk_keys)
+        counts.append(chunk_counts)
+        group = end
+
+    popularity = np.unique(books, return_counts=True)
+    if not keys:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, popularity
+    keys = np.concatenate(keys)
+    counts = np.concatenate(counts)
+    merged, inverse = np.unique(keys, axis=0, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=counts, minlength=len(merged)).astype(np.int64)
+    return merged[:, 0], merged[:, 1], totals, popularity
+
+
+def top_neighbours(k=None):
+    """``{book_id: [(neighbour_id, score), ...]}``, best first, ``k`` each."""
+    k = k or neighbour_count()
+    users, books = borrow_pairs()
+    if not len(users):
+        return {}
+    users, books = _cap_per_user(users, books, MAX_BOOKS_PER_USER)
+    a, b, counts, (book_ids, book_users) = co_occurrence(users, books)
+    if not len(a):
+        return {}
+    users_a = book_users[np.searchsorted(book_ids, a)]
+    users_b = book_users[np.searchsorted(book_ids, b)]
+    scores = counts / np.sqrt(users_a * users_b)
+
+    # Best first within each book; ties go to the more borrowed, then lower id.
+    order = np.lexsort((b, -users_b, -scores, a))
+    a, b, scores = a[order], b[order], scores[order]
+    starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+    sizes = np.diff(np.r_[starts, len(a)])
+    rank = np.arange(len(a)) - np.repeat(starts, sizes)
+    keep = rank < k
+
+    result = {}
+    for book_id, neighbour_id, score in zip(a[keep].tolist(), b[keep].tolist(), scores[keep].tolist()):
+        result.setdefault(book_id, []).append((neighbour_id, round(score, 6)))
+    return result
+
+
+def _pair_hash(a, b, seed):
+    """Deterministic 32-bit pseudo-random value per (a, b) pair (splitmix64)."""
+    with np.errstate(over='ignore'):
+        x = (a.astype(np.uint64) << np.uint64(32)) ^ b.astype(np.uint64) ^ np.uint64(seed)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        x = x ^ (x >> np.uint64(31))
+    return (x >> np.uint64(32)).astype(np.int64)
+
+
+def category_neighbours(k=None, seed=None):
+    """
+    ``{book_id: [(neighbour_id, shared_categories), ...]}``, most shared
+    first with seeded tie-breaking, ``k`` each.
+    """
+    k = k or neighbour_count()
+    seed = recommendation_seed() if seed is None else seed
+    membership = np.array(
+        list(Book.categories.through.objects.values_list('book_id', 'category_id').order_by()), dtype=np.int64
+    ).reshape(-1, 2)
+    if not len(membership):
+        return {}
+    book_ids, rows = np.unique(membership[:, 0], return_inverse=True)
+    _, category_columns = np.unique(membership[:, 1], return_inverse=True)
+    matrix = np.zeros((len(book_ids), category_columns.max() + 1), dtype=np.float32)
+    matrix[rows.ravel(), category_columns.ravel()] = 1
+    k = min(k, len(book_ids) - 1)
+    if k < 1:
+        return {}
+
+    result = {}
+    batch = max(1, PAIR_CHUNK // len(book_ids))
+    for start in range(0, len(book_ids), batch):
+        end = min(start + batch, len(book_ids))
+        shared = (matrix[start:end] @ matrix.T).astype(np.int64)
+        shared[np.arange(end - start), np.arange(start, end)] = 0
+        # Shared count in the high bits, pair hash below it: one sort key.
+        keys = (shared << 32) | _pair_hash(book_ids[start:end, None], book_ids[None, :], seed)
+        keys[shared == 0] = -1
+        top = np.argpartition(-keys, k - 1, axis=1)[:, :k]
+        top_keys = np.take_along_axis(keys, top, axis=1)
+        order = np.argsort(-top_keys, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        for offset, picked in enumerate(top):
+            neighbours = [
+                (int(book_ids[column]), float(shared[offset, column]))
+                for column in picked if shared[offset, column] > 0
+            ]
+            if neighbours:
+                result[int(book_ids[start + offset])] = neighbours
+    return result
+
+
+def _store(model, owner, fresh, owners=None, **filters):
+    """
+    Make the ``filters`` rows of ``model`` match ``fresh`` (``{owner_id:
+    [(neighbour_id, score), ...]}``), touching only owners whose list
+    changed; with ``owners`` only those owners are considered. Returns
+    ``(written, cleared)`` owner counts.
+    """
+    owner_id = f'{owner}_id'
+    rows = model.objects.filter(**filters)
+    if owners is not None:
+        rows = rows.filter(**{f'{owner_id}__in': list(owners)})
+    stored = {}
+    for pk, neighbour_id, score in rows.order_by(owner_id, 'rank').values_list(owner_id, 'neighbour_id', 'score'):
+        stored.setdefault(pk, []).append((neighbour_id, round(score, 6)))
+
+    changed = [pk for pk, neighbours in fresh.items() if stored.get(pk) != neighbours]
+    cleared = [pk for pk in stored if pk not in fresh]
+    stale = changed + cleared
+    with transaction.atomic():
+        for start in range(0, len(stale), 500):
+            model.objects.filter(**filters, **{f'{owner_id}__in': stale[start:start + 500]}).delete()
+        model.objects.bulk_create([
+            model(**filters, **{owner_id: pk}, neighbour_id=neighbour_id, rank=rank, score=score)
+            for pk in changed
+            for rank, (neighbour_id, score) in enumerate(fresh[pk])
+        ], batch_size=1000)
+        if stale:
+            # Stored: builds run in a management command's process.
+            bump_stored('recommendations')
+    return len(changed), len(cleared)
+
+
+def build_neighbours(k=None, seed=None):
+    """
+    Recompute both neighbour lists. Returns ``{kind: (books_written,
+    books_cleared)}``.
+    """
+    return {
+        BookNeighbour.CO_BORROW: _store(BookNeighbour, 'book', top_neighbours(k), kind=BookNeighbour.CO_BORROW),
+        BookNeighbour.CATEGORY: _store(
+            BookNeighbour, 'book', category_neighbours(k, seed), kind=BookNeighbour.CATEGORY
+        ),
+    }
+
+
+def _video_features():
+    """Category, instructor and title token arrays for all videos."""
+    videos = list(Video.objects.order_by('pk').values_list('pk', 'title', 'instructor', 'category'))
+    ids = np.array([video[0] for video in videos], dtype=np.int64)
+    _, instructors = np.unique([normalize(video[2]).strip() for video in videos], return_inverse=True)
+    _, categories = np.unique([video[3] for video in videos], return_inverse=True)
+
+    vocabulary = {}
+    docs, terms = [], []
+    for row, video in enumerate(videos):
+        for token in set(tokenize(video[1])):
+            docs.append(row)
+            terms.append(vocabulary.setdefault(token, len(vocabulary)))
+    docs = np.array(docs, dtype=np.int64)
+    terms = np.array(terms, dtype=np.int64)
+    # Plain token sets, not idf: a pair's score must not depend on the rest
+    # of the catalog, or every upload would shift every list.
+    weights = np.ones(len(terms))
+    norms = np.sqrt(np.bincount(docs, minlength=len(videos)))
+    return {
+        'ids': ids,
+        'instructors': instructors.ravel(),
+        'categories': categories.ravel(),
+        'docs': docs,
+        'terms': terms,
+        'weights': weights,
+        'norms': norms,
+    }
+
+
+def _video_scores(features, rows):
+    """``len(rows) x videos`` similarity matrix; zero on the diagonal."""
+    n = len(features['ids'])
+    scores = VIDEO_WEIGHTS['category'] * (
+        features['categories'][rows, None] == features['categories'][None, :]
+    ).astype(np.float64)
+    scores += VIDEO_WEIGHTS['instructor'] * (
+        features['instructors'][rows, None] == features['instructors'][None, :]
+    )
+
+    # Title cosine, over the vocabulary of these rows only.
+    docs, terms, weights = features['docs'], features['terms'], features['weights']
+    row_terms = np.unique(terms[np.isin(docs, rows)])
+    if len(row_terms):
+        used = np.isin(terms, row_terms)
+        columns = np.searchsorted(row_terms, terms[used])
+        matrix = np.zeros((n, len(row_terms)))
+        matrix[docs[used], columns] = weights[used]
+        norms = features['norms']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cosine = (matrix[rows] @ matrix.T) / (norms[rows, None] * norms[None, :])
+        scores += VIDEO_WEIGHTS['title'] * np.nan_to_num(cosine)
+
+    scores[np.arange(len(rows)), rows] = 0
+    return scores
+
+
+def _video_top(features, rows, k):
+    """``{video_id: [(neighbour_id, score), ...]}`` for ``rows``; newer wins ties."""
+    ids = features['ids']
+    result = {}
+    batch = max(1, PAIR_CHUNK // max(1, len(ids)))
+    for start in range(0, len(rows), batch):
+        chunk = rows[start:start + batch]
+        scores = np.round(_video_scores(features, chunk), 6)
+        order = np.lexsort((np.broadcast_to(-ids, scores.shape), -scores))[:, :k]
+        for offset, (row, picked) in enumerate(zip(chunk, order)):
+            neighbours = [
+                (int(ids[column]), float(scores[offset, column]))
+                for column in picked if scores[offset, column] > 0
+            ]
+            if neighbours:
+                result[int(ids[row])] = neighbours
+    return result
+
+
+def build_video_neighbours(k=None):
+    """Recompute every video's neighbours. Returns ``(written, cleared)``."""
+    now = timezone.now()
+    features = _video_features()
+    fresh = _video_top(features, np.arange(len(features['ids'])), k or neighbour_count())
+    result = _store(VideoNeighbour, 'video', fresh)
+    StaleVideoNeighbours.objects.exclude(stale_since__gt=now).delete()
+    return result
+
+
+def refresh_stale_video_neighbours(k=None):
+    """
+    refresh_video_neighbours() for the videos queued in
+    StaleVideoNeighbours. Returns ``(written, cleared)``.
+    """
+    now = timezone.now()
+    # Videos queued after ``now`` are not covered by this refresh.
+    queued = StaleVideoNeighbours.objects.exclude(stale_since__gt=now)
+    video_ids = list(queued.values_list('video_id', flat=True))
+    if not video_ids:
+        return 0, 0
+    result = refresh_video_neighbours(video_ids, k)
+    queued.filter(video_id__in=video_ids).delete()
+    return result
+
+
+def refresh_video_neighbours(video_ids, k=None):
+    """
+    Incremental refresh after ``video_ids`` were added, changed or deleted:
+    recompute the lists of those videos, of videos listing one of them, and
+    of videos the changed ones now score high enough to enter. Similarity is
+    symmetric, so one row per changed video finds the latter.
+    """
+    k = k or neighbour_count()
+    features = _video_features()
+    ids = features['ids']
+    affected = set(video_ids)
+    affected.update(VideoNeighbour.objects.filter(neighbour_id__in=video_ids).values_list('video_id', flat=True))
+    changed_rows = np.flatnonzero(np.isin(ids, list(video_ids)))
+    if len(changed_rows):
+        best = np.round(_video_scores(features, changed_rows), 6).max(axis=0)
+        lists = {
+            pk: (count, low)
+            for pk, count, low in VideoNeighbour.objects.values('video_id').annotate(
+                count=Count('id'), low=Min('score')
+            ).values_list('video_id', 'count', 'low')
+        }
+        for pk, score in zip(ids.tolist(), best.tolist()):
+            count, low = lists.get(pk, (0, 0))
+            if score > 0 and (count < k or score >= low):
+                affected.add(pk)
+    rows = np.flatnonzero(np.isin(ids, list(affected)))
+    return _store(VideoNeighbour, 'video', _video_top(features, rows, k), owners=affected)
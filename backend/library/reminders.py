@@ -0,0 +1,100 @@
+"""
+Batched due-soon and overdue email reminders.
+
+Open borrows due within REMINDER_DUE_SOON_DAYS, and open borrows already past
+due, are read through the partial borrow_open_due_idx index and filtered
+against ReminderLog. They are grouped into one message per user and sent in
+batches over a single mail connection. Each batch is logged in ReminderLog
+right after it is delivered, so a rerun (or a run after a crash) only sends
+what is still missing. Reminders for users without an email address are
+logged as well, without a message, so reruns do not select them again.
+
+Run ``manage.py send_reminders`` from a single scheduler; the mail backend
+comes from the usual EMAIL_* settings, e.g. ``EMAIL_HOST=localhost`` and
+``EMAIL_PORT=1025`` with ``python -m aiosmtpd -n -l localhost:1025`` as a
+local stand-in.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import BorrowRecord, ReminderLog
+from .overdue import overdue_records
+
+
+def pending_reminders(now=None):
+    """``{user_id: [(kind, record), ...]}`` for reminders not sent yet."""
+    now = now or timezone.now()
+    due_soon_until = now + timedelta(days=getattr(settings, 'REMINDER_DUE_SOON_DAYS', 2))
+    selections = [
+        (ReminderLog.DUE_SOON, BorrowRecord.objects.filter(
+            is_returned=False, due_date__gte=now, due_date__lt=due_soon_until
+        )),
+        (ReminderLog.OVERDUE, overdue_records(now)),
+    ]
+    pending = defaultdict(list)
+    for kind, records in selections:
+        records = records.exclude(reminders__kind=kind).select_related('user', 'book').only(
+            'id', 'due_date', 'user__id', 'user__email', 'user__first_name', 'user__username', 'book__title'
+        ).order_by('due_date', 'id')
+        for record in records:
+            pending[record.user_id].append((kind, record))
+    return pending
+
+
+def build_message(user, reminders):
+    overdue = [record for kind, record in reminders if kind == ReminderLog.OVERDUE]
+    due_soon = [record for kind, record in reminders if kind == ReminderLog.DUE_SOON]
+    lines = [f"Hello {user.first_name or user.username},", ""]
+    if overdue:
+        lines.append("These books are overdue, please return them as soon as possible:")
+        lines += [f"  - {record.book.title} (was due {record.due_date:%Y-%m-%d})" for record in overdue]
+        lines.append("")
+    if due_soon:
+        lines.append("These books are due soon:")
+        lines += [f"  - {record.book.title} (due {record.due_date:%Y-%m-%d})" for record in due_soon]
+        lines.append("")
+    subject = "Overdue library books" if overdue else "Library books due soon"
+    return EmailMessage(subject, '\n'.join(lines), settings.DEFAULT_FROM_EMAIL, [user.email])
+
+
+def dispatch(batch_size=100, dry_run=False, now=None, connection=None):
+    """
+    Send every pending reminder; returns ``(messages_sent, reminders_logged)``.
+    With ``dry_run`` nothing is sent or logged and the would-be counts are
+    returned.
+    """
+    pending = pending_reminders(now)
+    messages = []
+    unreachable = []
+    for reminders in pending.values():
+        user = reminders[0][1].user
+        if user.email:
+            messages.append((build_message(user, reminders), reminders))
+        else:
+            unreachable += reminders
+    if dry_run:
+        return len(messages), sum(len(reminders) for _, reminders in messages)
+    if unreachable:
+        ReminderLog.objects.bulk_create([
+            ReminderLog(record_id=record.pk, kind=kind) for kind, record in unreachable
+        ], ignore_conflicts=True)
+    if not messages:
+        return 0, 0
+
+    sent = logged = 0
+    connection = connection or get_connection()
+    with connection:
+        for start in range(0, len(messages), batch_size):
+            batch = messages[start:start + batch_size]
+            connection.send_messages([message for message, _ in batch])
+            logs = ReminderLog.objects.bulk_create([
+                ReminderLog(record_id=record.pk, kind=kind)
+                for _, reminders in batch for kind, record in reminders
+            ], ignore_conflicts=True)
+            sent += len(batch)
+            logged += len(logs)
+    return sent, logged
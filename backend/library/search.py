@@ -0,0 +1,434 @@
+"""
+Full-text search over the book catalog.
+
+Books are tokenized into an inverted index (SearchPosting rows keyed by term)
+which is kept in sync from the Book post_save signal. Queries only read the
+posting lists of their own terms and rank candidates with BM25, so the cost
+of a search depends on how many books contain the query terms rather than on
+the size of the catalog.
+
+Each posting also stores its impact, the term-frequency half of a BM25 score
+computed against the average book length at the time the book was indexed
+(rebuild_index() recomputes every impact against one average). A book's score
+for a term is then ``idf * impact``, and postings are indexed by (term,
+impact), so the top ``limit`` books of a query are found by reading each
+term's postings best first and stopping as soon as no unread posting can
+reach the top ``limit`` (Fagin's threshold algorithm), however many books
+match. ``manage.py bench_search`` times that against a full ranking.
+"""
+import heapq
+import math
+import re
+import unicodedata
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Count, F, Value
+
+from .models import Book, SearchDocument, SearchPosting
+
+# BM25 tuning constants
+K1 = 1.2
+B = 0.75
+
+# Per-field boosts applied to term frequencies (BM25F), so a title hit
+# counts for more than the same word buried in the description.
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'author': 2.0,
+    'publisher': 1.0,
+    'description': 1.0,
+}
+
+MAX_TERM_LENGTH = 64
+MAX_PREFIX_EXPANSIONS = 20
+STATS_CACHE_KEY = 'library:search:stats'
+STATS_CACHE_TIMEOUT = 300
+DF_CACHE_PREFIX = 'library:search:df:'
+# Postings read per term by the first round of top_scores(); each further
+# round reads twice as many. Terms with up to WHOLE_TERM_POSTINGS postings
+# are read whole instead, all in one query.
+TOP_BATCH = 64
+WHOLE_TERM_POSTINGS = 256
+# Rounds of sorted access before top_scores() falls back to MaxScore.
+MAX_TOP_ROUNDS = 3
+# Book ids per IN (...) clause, well below SQLite's bound parameter limit.
+MAX_ID_BATCH = 10000
+
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'that', 'the', 'to', 'with',
+])
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Lowercase and strip accents so 'Émile' and 'emile' index the same."""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return text.lower()
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in _TOKEN_RE.findall(normalize(text))
+        if token not in STOP_WORDS
+    ]
+
+
+def book_terms(book):
+    """Return ({term: weighted frequency}, weighted document length) for a book."""
+    frequencies = defaultdict(float)
+    length = 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        for term in tokenize(getattr(book, field, '')):
+            frequencies[term] += weight
+            length += weight
+    return frequencies, length
+
+
+def impact(frequency, length, avg_length):
+    """The BM25 term-frequency component of a score, which is ``idf * impact``."""
+    norm = K1 * (1 - B + B * length / (avg_length or length or 1.0))
+    return frequency * (K1 + 1) / (frequency + norm)
+
+
+def forget_stats(terms=()):
+    """Drop the cached index statistics, and the document frequencies of ``terms``."""
+    cache.delete_many([STATS_CACHE_KEY, *(f'{DF_CACHE_PREFIX}{term}' for term in terms)])
+
+
+def index_book(book):
+    """
+    (Re)build the postings for a single book. Returns every term the book
+    had before or has now, i.e. the terms whose results may have changed.
+    """
+    frequencies, length = book_terms(book)
+    _, avg_length = index_stats()
+    with transaction.atomic():
+        postings = SearchPosting.objects.filter(book_id=book.pk)
+        previous_terms = set(postings.values_list('term', flat=True))
+        postings.delete()
+        SearchPosting.objects.bulk_create([
+            SearchPosting(
+                term=term, book_id=book.pk, frequency=frequency, length=length,
+                impact=impact(frequency, length, avg_length),
+            )
+            for term, frequency in frequencies.items()
+        ])
+        SearchDocument.objects.update_or_create(
+            book_id=book.pk,
+            defaults={'length': length}
+        )
+    terms = previous_terms | set(frequencies)
+    forget_stats(terms)
+    return terms
+
+
+def indexed_terms(book_ids):
+    """Distinct index terms of the given books."""
+    return set(SearchPosting.objects.filter(
+        book_id__in=book_ids
+    ).values_list('term', flat=True).distinct())
+
+
+def rebuild_index(batch_size=1000):
+    """Reindex every book. Used for backfills and after bulk imports."""
+    SearchPosting.objects.all().delete()
+    SearchDocument.objects.all().delete()
+
+    indexed = 0
+    books = Book.objects.only('id', *FIELD_WEIGHTS).order_by('id')
+    postings, documents = [], []
+    for book in books.iterator(chunk_size=batch_size):
+        frequencies, length = book_terms(book)
+        postings.extend(
+            SearchPosting(term=term, book_id=book.pk, frequency=frequency, length=length)
+            for term, frequency in frequencies.items()
+        )
+        documents.append(SearchDocument(book_id=book.pk, length=length))
+        indexed += 1
+        if len(documents) >= batch_size:
+            SearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+            SearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+            postings, documents = [], []
+    SearchPosting.objects.bulk_create(postings, batch_size=batch_size)
+    SearchDocument.objects.bulk_create(documents, batch_size=batch_size)
+    # Every impact against the final average, in one statement.
+    avg_length = SearchDocument.objects.aggregate(avg=Avg('length'))['avg'] or 1.0
+    SearchPosting.objects.update(impact=F('frequency') * Value(K1 + 1) / (
+        F('frequency') + Value(K1) * (Value(1 - B) + Value(B) * F('length') / Value(avg_length))
+    ))
+    # Cached document frequencies expire on their own within
+    # STATS_CACHE_TIMEOUT; a rebuild does not change them anyway.
+    forget_stats()
+    return indexed
+
+
+def index_stats():
+    """Number of indexed books and their average length, cached briefly."""
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        aggregate = SearchDocument.objects.aggregate(count=Count('pk'), avg_length=Avg('length'))
+        stats = (aggregate['count'], aggregate['avg_length'] or 0.0)
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
+
+
+def document_frequencies(terms):
+    """``{term: number of indexed books containing it}``, cached like index_stats()."""
+    keys = {f'{DF_CACHE_PREFIX}{term}': term for term in terms}
+    frequencies = {keys[key]: df for key, df in cache.get_many(keys).items()}
+    missing = [term for term in terms if term not in frequencies]
+    if missing:
+        counted = dict(
+            SearchPosting.objects.filter(term__in=missing).order_by().values('term')
+            .annotate(df=Count('pk')).values_list('term', 'df')
+        )
+        for term in missing:
+            frequencies[term] = counted.get(term, 0)
+        # Not the zeros: a term first indexed by another process must match
+        # right away.
+        cache.set_many({f'{DF_CACHE_PREFIX}{term}': df for term, df in counted.items()}, STATS_CACHE_TIMEOUT)
+    return frequencies
+
+
+def prefix_expansions(prefix):
+    """
+    The first MAX_PREFIX_EXPANSIONS index terms starting with ``prefix``.
+    Each one is a single seek on the term index: a DISTINCT over the range
+    would read every posting of every matching term, and SQLite's LIKE
+    (startswith) cannot use the index at all.
+    """
+    end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    expansions = []
+    remaining = SearchPosting.objects.filter(term__gte=prefix, term__lt=end)
+    while len(expansions) < MAX_PREFIX_EXPANSIONS:
+        found = remaining.order_by('term').values_list('term', flat=True).first()
+        if found is None:
+            break
+        expansions.append(found)
+        remaining = SearchPosting.objects.filter(term__gt=found, term__lt=end)
+    return expansions
+
+
+def query_terms(query):
+    """
+    Split a query into groups of index terms. Every token matches exactly,
+    except the last one which also matches as a prefix while the user is
+    still typing it (i.e. the query does not end in whitespace).
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return []
+    groups = [[token] for token in tokens]
+    last = tokens[-1]
+    if not query[-1:].isspace() and len(last) >= 2:
+        groups[-1] = list(dict.fromkeys([last, *prefix_expansions(last)]))
+    return groups
+
+
+def bm25_scores(groups, postings, total, avg_length):
+    """
+    BM25 score per document. ``postings`` maps each term to a list of
+    ``(doc_id, frequency, length)`` and ``groups`` is the output of
+    query_terms().
+    """
+    avg_length = avg_length or 1.0
+    scores = defaultdict(float)
+    for group in groups:
+        # A prefix group contributes its best-matching expansion per document,
+        # so typing "tol" does not double count "tolkien" and "tolstoy".
+        best = {}
+        for term in group:
+            term_postings = postings.get(term)
+            if not term_postings:
+                continue
+            df = len(term_postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for doc_id, frequency, length in term_postings:
+                norm = K1 * (1 - B + B * length / avg_length)
+                score = idf * frequency * (K1 + 1) / (frequency + norm)
+                if score > best.get(doc_id, 0.0):
+                    best[doc_id] = score
+        for doc_id, score in best.items():
+            scores[doc_id] += score
+    return scores
+
+
+def rank(scores, limit=None):
+    """``[(doc_id, score), ...]`` by descending score, ties broken by id."""
+    ranked = ((score, doc_id) for doc_id, score in scores.items())
+    key = lambda item: (-item[0], item[1])
+    if limit is not None:
+        ranked = heapq.nsmallest(limit, ranked, key=key)
+    else:
+        ranked = sorted(ranked, key=key)
+    return [(doc_id, score) for score, doc_id in ranked]
+
+
+def impact_scores(groups, postings, weights):
+    """
+    Score per book from ``postings`` (``{term: [(book_id, impact), ...]}``)
+    and ``weights`` (``{term: idf}``). Like bm25_scores(), a group counts
+    its best-matching term only.
+    """
+    scores = defaultdict(float)
+    for group in groups:
+        best = {}
+        for term in group:
+            weight = weights.get(term, 0.0)
+            for book_id, value in postings.get(term, ()):
+                score = weight * value
+                if score > best.get(book_id, 0.0):
+                    best[book_id] = score
+        for book_id, score in best.items():
+            scores[book_id] += score
+    return scores
+
+
+def _impacts(terms, book_ids=None):
+    """``{term: [(book_id, impact), ...]}``, for the given books only unless None."""
+    postings = defaultdict(list)
+    batches = [None] if book_ids is None else [
+        book_ids[start:start + MAX_ID_BATCH] for start in range(0, len(book_ids), MAX_ID_BATCH)
+    ]
+    for batch in batches:
+        rows = SearchPosting.objects.filter(term__in=terms)
+        if batch is not None:
+            rows = rows.filter(book_id__in=batch)
+        for term, book_id, value in rows.values_list('term', 'book_id', 'impact'):
+            postings[term].append((book_id, value))
+    return postings
+
+
+def _unread_bounds(groups, weights, frontier, exhausted):
+    """Per group, the most it can add to the score of a book not seen yet."""
+    return [
+        max((weights[term] * frontier[term] for term in group if term in frontier and term not in exhausted),
+            default=0.0)
+        for group in groups
+    ]
+
+
+def top_scores(groups, weights, frequencies, limit):
+    """
+    Exact scores of at least the top ``limit`` books, reading as few
+    postings as possible. ``frequencies`` maps each term to its document
+    frequency.
+
+    Each round reads the next batch of every term's postings in descending
+    impact (sorted access), then every posting of the query's terms for the
+    books seen for the first time, which scores those books exactly. A book
+    not seen yet has no posting above any term's last read impact, so once
+    ``limit`` books score more than those impacts can add up to, no unread
+    book can overtake them. Rare terms, such as most prefix expansions, are
+    read whole up front.
+
+    When the impacts are too even for that to stop early, as with several
+    common terms, sorted access stops after MAX_TOP_ROUNDS rounds (or once
+    the next round would read more than half of what is left). The groups
+    whose bounds together cannot lift an unseen book to the current
+    ``limit``-th score are then only read for the books found in the rest
+    of the other groups (MaxScore).
+    """
+    terms = list(dict.fromkeys(term for group in groups for term in group if weights.get(term)))
+    read = dict.fromkeys(terms, 0)
+    frontier = {}
+    scores = {}
+    batch = max(limit, TOP_BATCH)
+    exhausted = {term for term in terms if frequencies[term] <= max(batch, WHOLE_TERM_POSTINGS)}
+    seen = set()
+    if exhausted:
+        seen = {book_id for rows in _impacts(exhausted).values() for book_id, _ in rows}
+    for _ in range(MAX_TOP_ROUNDS):
+        unread = sum(frequencies[term] - read[term] for term in terms if term not in exhausted)
+        if batch * (len(terms) - len(exhausted)) > unread / 2:
+            break
+        for term in terms:
+            if term in exhausted:
+                continue
+            rows = list(
+                SearchPosting.objects.filter(term=term).order_by('-impact', 'book_id')
+                .values_list('book_id', 'impact')[read[term]:read[term] + batch]
+            )
+            read[term] += len(rows)
+            if len(rows) < batch:
+                exhausted.add(term)
+            if rows:
+                frontier[term] = rows[-1][1]
+            seen.update(book_id for book_id, _ in rows if book_id not in scores)
+        scores.update(impact_scores(groups, _impacts(terms, list(seen)), weights) if seen else {})
+        seen = set()
+        if len(exhausted) == len(terms):
+            return scores
+        if len(scores) >= limit and heapq.nlargest(limit, scores.values())[-1] > sum(
+            _unread_bounds(groups, weights, frontier, exhausted)
+        ):
+            return scores
+        batch *= 2
+
+    pruned, cumulative = set(), 0.0
+    if not seen and len(scores) >= limit:
+        threshold = heapq.nlargest(limit, scores.values())[-1]
+        for bound, index in sorted(zip(_unread_bounds(groups, weights, frontier, exhausted), range(len(groups)))):
+            if cumulative + bound >= threshold:
+                break
+            cumulative += bound
+            pruned.add(index)
+    if not pruned:
+        return impact_scores(groups, _impacts(terms), weights)
+    # The unseen books of the other groups, each read from where sorted
+    # access stopped, with their partial scores.
+    partial = defaultdict(float)
+    for index, group in enumerate(groups):
+        if index in pruned:
+            continue
+        rest = defaultdict(list)
+        for term in group:
+            if term in frontier and term not in exhausted:
+                for book_id, value in SearchPosting.objects.filter(term=term).order_by(
+                    '-impact', 'book_id'
+                ).values_list('book_id', 'impact')[read[term]:]:
+                    if book_id not in scores:
+                        rest[term].append((book_id, value))
+        for book_id, score in impact_scores([group], rest, weights).items():
+            partial[book_id] += score
+    candidates = [book_id for book_id, score in partial.items() if score + cumulative >= threshold]
+    if len(candidates) * len(terms) > sum(frequencies[term] for term in terms) / 2:
+        return impact_scores(groups, _impacts(terms), weights)
+    if candidates:
+        scores.update(impact_scores(groups, _impacts(terms, candidates), weights))
+    return scores
+
+
+def search_books(query, limit=None):
+    """
+    Rank books against ``query`` with BM25.
+
+    Returns a list of ``(book_id, score)`` tuples ordered by descending score,
+    ties broken by id so the ordering is stable between requests. With a
+    ``limit``, only the top ``limit`` are returned, and only the postings
+    needed to find them are read (see top_scores()); the scores are the same
+    either way.
+    """
+    groups = query_terms(query)
+    if not groups:
+        return []
+
+    total, _ = index_stats()
+    if not total:
+        return []
+
+    all_terms = list(dict.fromkeys(term for group in groups for term in group))
+    frequencies = document_frequencies(all_terms)
+    weights = {
+        term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+        for term, df in frequencies.items() if df
+    }
+    if limit is not None:
+        return rank(top_scores(groups, weights, frequencies, limit), limit)
+    return rank(impact_scores(groups, _impacts(all_terms), weights), limit)
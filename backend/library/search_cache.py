@@ -0,0 +1,167 @@
+"""
+Result cache for BookSearchView.
+
+Cache keys embed a version number for every term a query depends on. When a
+book is saved or deleted, only the versions of the terms that book had or now
+has are bumped, so cached results for unrelated queries stay valid and no
+cache scan is needed to invalidate anything.
+
+The last token of a search-as-you-type query matches by prefix; it depends on
+a prefix tag built from its first PREFIX_TAG_LENGTH characters, which every
+changed term also bumps.
+
+Rankings are stored in chunks of RANKED_CHUNK entries, so a page deep into
+the results only loads the chunks it spans rather than the whole ranking.
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from .search import tokenize
+from .versioning import incr_counter
+
+CACHE_TIMEOUT = 600
+RANKED_CHUNK = 1000
+PREFIX_TAG_LENGTH = 3
+KEY_PREFIX = 'library:search_cache'
+HITS_KEY = f'{KEY_PREFIX}:hits'
+MISSES_KEY = f'{KEY_PREFIX}:misses'
+
+
+def _term_tag(term):
+    return f'{KEY_PREFIX}:v:t:{term}'
+
+
+def _prefix_tag(prefix):
+    return f'{KEY_PREFIX}:v:p:{prefix}'
+
+
+def normalize_query(query):
+    """Canonical form of a query: its tokens, plus whether the last is a prefix."""
+    tokens = list(dict.fromkeys(tokenize(query)))
+    is_prefix = bool(tokens) and not query[-1:].isspace() and len(tokens[-1]) >= 2
+    return tokens, is_prefix
+
+
+def query_tags(tokens, is_prefix):
+    tags = [_term_tag(token) for token in tokens]
+    if is_prefix:
+        tags[-1] = _prefix_tag(tokens[-1][:PREFIX_TAG_LENGTH])
+    return tags
+
+
+def term_tags(terms):
+    """Every tag a change to ``terms`` has to bump."""
+    tags = set()
+    for term in terms:
+        tags.add(_term_tag(term))
+        for length in range(2, PREFIX_TAG_LENGTH + 1):
+            if len(term) >= length:
+                tags.add(_prefix_tag(term[:length]))
+    return tags
+
+
+class SearchResultCache:
+    def key_for(self, query):
+        """
+        Versioned base key for ``query``, or None if the query has no terms.
+        Costs a single get_many for the tag versions.
+        """
+        tokens, is_prefix = normalize_query(query)
+        if not tokens:
+            return None
+        tags = query_tags(tokens, is_prefix)
+        versions = cache.get_many(tags)
+        signature = '|'.join(
+            [' '.join(tokens), '*' if is_prefix else '']
+            + [str(versions.get(tag, 0)) for tag in tags]
+        )
+        return f'{KEY_PREFIX}:{hashlib.sha1(signature.encode()).hexdigest()}'
+
+    def get_ranked(self, key, limit=None):
+        """The full ranking, or failing that the cached top ``limit`` if given."""
+        window = self.get_ranked_slice(key)
+        if window is not None:
+            return window[0]
+        if limit is not None:
+            return cache.get(f'{key}:top:{limit}')
+        return None
+
+    def get_ranked_slice(self, key, start=0, stop=None):
+        """
+        ``(ranked[start:stop], len(ranked))`` of the cached full ranking,
+        loading only the chunks the slice spans; None if not cached.
+        """
+        total = cache.get(f'{key}:ranked')
+        if total is None:
+            return None
+        stop = total if stop is None else min(stop, total)
+        if start >= stop:
+            return [], total
+        first = start // RANKED_CHUNK
+        keys = [f'{key}:ranked:{n}' for n in range(first, (stop - 1) // RANKED_CHUNK + 1)]
+        chunks = cache.get_many(keys)
+        if len(chunks) < len(keys):
+            # Partly evicted.
+            return None
+        entries = [entry for chunk_key in keys for entry in chunks[chunk_key]]
+        offset = first * RANKED_CHUNK
+        return entries[start - offset:stop - offset], total
+
+    def set_ranked(self, key, ranked, limit=None):
+        """Cache a full ranking, or a search_books(query, limit) result."""
+        if limit is not None:
+            cache.set(f'{key}:top:{limit}', ranked, CACHE_TIMEOUT)
+            return
+        cache.set_many({
+            f'{key}:ranked:{n}': ranked[start:start + RANKED_CHUNK]
+            for n, start in enumerate(range(0, len(ranked), RANKED_CHUNK))
+        }, CACHE_TIMEOUT)
+        # The length last: it is what marks the ranking as cached.
+        cache.set(f'{key}:ranked', len(ranked), CACHE_TIMEOUT)
+
+    def get_page(self, key, page_id):
+        data = cache.get(f'{key}:page:{page_id}')
+        self._record(data is not None)
+        return data
+
+    def set_page(self, key, page_id, data):
+        cache.set(f'{key}:page:{page_id}', data, CACHE_TIMEOUT)
+
+    def get_attributes(self, key):
+        return cache.get(f'{key}:attributes')
+
+    def set_attributes(self, key, attributes):
+        cache.set(f'{key}:attributes', attributes, CACHE_TIMEOUT)
+
+    def get_correction(self, key):
+        return cache.get(f'{key}:correction')
+
+    def set_correction(self, key, correction):
+        cache.set(f'{key}:correction', correction, CACHE_TIMEOUT)
+
+    def invalidate_terms(self, terms):
+        # Any fresh value works as a version, so a timestamp avoids the
+        # add()/incr() dance and cannot collide with an older version.
+        version = time.time_ns()
+        cache.set_many({tag: version for tag in term_tags(terms)}, timeout=None)
+
+    def _record(self, hit):
+        incr_counter(HITS_KEY if hit else MISSES_KEY)
+
+    def stats(self):
+        counts = cache.get_many([HITS_KEY, MISSES_KEY])
+        hits, misses = counts.get(HITS_KEY, 0), counts.get(MISSES_KEY, 0)
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else None,
+        }
+
+    def reset_stats(self):
+        cache.delete_many([HITS_KEY, MISSES_KEY])
+
+
+search_cache = SearchResultCache()
@@ -1,9 +1,12 @@
+from django.db import models
 from rest_framework import serializers
 
-from .models import Book, BorrowRecord, Category, FeaturedBook, User, Video
+from .fieldsets import SparseFieldsMixin
+from .fragments import FragmentCachedMixin, FragmentListSerializer, book_fragments, prime_fragments, video_fragments
+from .models import ArchivedBorrow, Book, BookHold, BorrowRecord, Category, FeaturedBook, User, Video
 from rest_framework import serializers
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = ['id', 'name', 'description', 'created_at']
@@ -14,7 +17,7 @@ class CategorySerializer(serializers.ModelSerializer):
         }
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(FragmentCachedMixin, SparseFieldsMixin, serializers.ModelSerializer):
     book_uuid = serializers.CharField(read_only=True)
     categories = serializers.SlugRelatedField(
         many=True,
@@ -23,6 +26,12 @@ class BookSerializer(serializers.ModelSerializer):
     )
     is_ebook = serializers.SerializerMethodField()
     is_external = serializers.BooleanField(read_only=True)
+    fragment_cache = book_fragments
+    field_columns = {
+        'is_ebook': ['book_type'],
+        'is_external': ['external_source'],
+        'available_status': ['available_copies'],
+    }
 
     available_status = serializers.SerializerMethodField()
     def get_available_status(self, obj):
@@ -43,18 +52,38 @@ class BookSerializer(serializers.ModelSerializer):
             'pdf_file': {'required': False, 'allow_null': True},
         }
         read_only_fields = ['is_available', 'created_at']
+        list_serializer_class = FragmentListSerializer
     def get_is_ebook(self, obj):
         return obj.book_type == 'EBOOK'
-class UserMiniSerializer(serializers.ModelSerializer):
+
+    def update(self, instance, validated_data):
+        # Write only the submitted columns: a full-row save would put back a
+        # stale available_copies over concurrent borrows and returns.
+        categories = validated_data.pop('categories', None)
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        if categories is not None:
+            instance.categories.set(categories)
+        return instance
+class UserMiniSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'first_name', 'last_name', 'email', 'role', 'created_at']
 
-class BorrowRecordSerializer(serializers.ModelSerializer):
+class BorrowRecordListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        records = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        prime_fragments(self, 'book', records)
+        return super().to_representation(records)
+
+class BorrowRecordSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     book = BookSerializer(read_only=True)
     user = UserMiniSerializer(read_only=True) 
     book_title = serializers.CharField(source='book.title', read_only=True)
     user_email = serializers.CharField(source='user.email', read_only=True)
+    expandable_fields = {'book': 'book.book_uuid', 'user': 'user_id'}
     
     class Meta:
         model = BorrowRecord
@@ -63,7 +92,31 @@ class BorrowRecordSerializer(serializers.ModelSerializer):
             'borrowed_date', 'return_date', 'is_returned', 'due_date'
         ]
         read_only_fields = ['borrowed_date', 'return_date', 'is_returned', 'due_date']
+        list_serializer_class = BorrowRecordListSerializer
+
+class ArchivedBorrowSerializer(BorrowRecordSerializer):
+    """Same shape as BorrowRecordSerializer, for the archive tier."""
+    is_returned = serializers.BooleanField(read_only=True)
+    field_columns = {'is_returned': ()}
+
+    class Meta(BorrowRecordSerializer.Meta):
+        model = ArchivedBorrow
     
+class BookHoldSerializer(serializers.ModelSerializer):
+    book_uuid = serializers.CharField(source='book.book_uuid', read_only=True)
+    book_title = serializers.CharField(source='book.title', read_only=True)
+    queue_position = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BookHold
+        fields = ['id', 'book_uuid', 'book_title', 'status', 'queue_position', 'created_at', 'ready_at', 'expires_at']
+
+    def get_queue_position(self, obj):
+        # Set for a whole list at once by BookHold.with_queue_positions().
+        if hasattr(obj, 'waiting_position'):
+            return obj.waiting_position
+        return obj.queue_position()
+
 class FeaturedBookSerializer(serializers.ModelSerializer):
     books = serializers.SerializerMethodField()
     is_current = serializers.BooleanField(read_only=True)
@@ -73,7 +126,7 @@ class FeaturedBookSerializer(serializers.ModelSerializer):
         fields = ['id', 'books', 'created_at', 'expires_at', 'is_current']
     
     def get_books(self, obj):
-        books = obj.books.all()[:4]  
+        books = obj.books.prefetch_related('categories')[:4]
         return BookSerializer(books, many=True).data
 
 class BookSearchSerializer(serializers.ModelSerializer):
@@ -103,9 +156,14 @@ class RelatedVideoSerializer(serializers.ModelSerializer):
         model = Video
         fields = ['id', 'title', 'thumbnail', 'duration']
 
-class VideoSerializer(serializers.ModelSerializer):
+class VideoSerializer(FragmentCachedMixin, SparseFieldsMixin, serializers.ModelSerializer):
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     is_external = serializers.BooleanField(read_only=True)
+    fragment_cache = video_fragments
+    field_columns = {
+        'category_display': ['category'],
+        'is_external': ['external_source'],
+    }
     
     class Meta:
         model = Video
@@ -114,6 +172,7 @@ class VideoSerializer(serializers.ModelSerializer):
             'video_file', 'thumbnail', 'upload_date', 'duration','created_at', 'category_display', 'is_external', 'external_source'
         ]
         read_only_fields = ['upload_date']
+        list_serializer_class = FragmentListSerializer
         extra_kwargs = {
             'instructor': {'required': True},
             'title': {'required': True},
@@ -128,12 +187,69 @@ class VideoSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Category is required")
         return value
     
-class PublicBookSerializer(serializers.ModelSerializer):
-    category = serializers.StringRelatedField()
+class PublicBookSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    category = serializers.StringRelatedField(source='categories', many=True)
+    available_status = serializers.SerializerMethodField()
+    field_columns = {'available_status': ['available_copies']}
+
+    def get_available_status(self, obj):
+        return "Available" if obj.available_copies > 0 else "Checked Out"
     
     class Meta:
         model = Book
         fields = [
             'id', 'title', 'author', 'category',
             'cover_image', 'description', 'available_status'
-        ]
\ No newline at end of file
+        ]
+
+class BatchQuerySerializer(serializers.Serializer):
+    key = serializers.CharField(max_length=100)
+    q = serializers.CharField(required=False, allow_blank=False, max_length=200)
+    category = serializers.CharField(required=False, allow_blank=False, max_length=100)
+    limit = serializers.IntegerField(required=False, default=10, min_value=1, max_value=50)
+
+    def validate(self, data):
+        if bool(data.get('q')) == bool(data.get('category')):
+            raise serializers.ValidationError("Each query needs exactly one of 'q' or 'category'")
+        return data
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    queries = BatchQuerySerializer(many=True, required=False, default=list)
+    book_uuids = serializers.ListField(
+        child=serializers.CharField(max_length=12), required=False, default=list, max_length=100
+    )
+
+    def validate_queries(self, value):
+        if len(value) > 20:
+            raise serializers.ValidationError("At most 20 queries per batch")
+        keys = [query['key'] for query in value]
+        if len(keys) != len(set(keys)):
+            raise serializers.ValidationError("Query keys must be unique")
+        return value
+
+
+class BulkBorrowItemSerializer(serializers.Serializer):
+    book_uuid = serializers.CharField(max_length=12)
+    user = serializers.IntegerField()
+    # Range is checked per item so one bad row does not reject the cart.
+    days = serializers.IntegerField(required=False, default=14)
+
+
+class BulkReturnItemSerializer(serializers.Serializer):
+    book_uuid = serializers.CharField(max_length=12)
+    user = serializers.IntegerField()
+
+
+class BulkBorrowSerializer(serializers.Serializer):
+    items = BulkBorrowItemSerializer(many=True, allow_empty=False, max_length=500)
+
+
+class BulkReturnSerializer(serializers.Serializer):
+    record_ids = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=500)
+    items = BulkReturnItemSerializer(many=True, required=False, default=list, max_length=500)
+
+    def validate(self, data):
+        if not data['record_ids'] and not data['items']:
+            raise serializers.ValidationError("Provide record_ids and/or items")
+        return data
@@ -0,0 +1,326 @@
+"""
+Pre-serialized, pre-compressed public catalog snapshots.
+
+Each catalog (public books, videos) is written under
+``MEDIA_ROOT/catalog/<name>/`` as:
+
+* ``shard-NNNN.ndjson``: rows whose id falls in one SHARD_SIZE range, one
+  JSON object per line, in the exact shape of the API listing;
+* ``shard-NNNN.ndjson.z`` and ``shard-NNNN.json.z``: the shard and its
+  slice of the JSON array (comma separated) as raw deflate segments, which
+  the joined ``.gz`` files are assembled from;
+* ``catalog.ndjson`` and ``catalog.json``: all shards joined, the latter
+  byte-identical to the unpaginated API response;
+* ``manifest.json``: shard row counts and the catalog version stamps
+  (library.versioning) the snapshot was built from.
+
+Every file has ``.gz`` and, when the ``brotli`` package is installed,
+``.br`` variants next to it, so a static file server (e.g. nginx
+``gzip_static`` / ``brotli_static``) can serve them without any Python.
+
+Book and video signals queue a rebuild of just the shards that changed. The
+joined files are then reassembled from the shard files without touching the
+database or compressing anything but the changed shards: each deflate
+segment ends byte aligned and not final, so the segments concatenate into
+one deflate stream, and the joined ``.gz`` is a single gzip member around
+them (some clients stop after the first member of a multi-member file).
+Brotli streams cannot be joined that way, so the joined ``.br`` files are
+only written by full rebuilds (``manage.py build_catalog_snapshot``, which
+should also run periodically) and are removed by incremental ones until the
+next full rebuild.
+"""
+import gzip
+import json
+import logging
+import os
+import struct
+import threading
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+from django.utils import timezone
+
+from .fast_serializers import public_book_dicts, video_dicts
+from .models import Book, Video
+from .versioning import get_versions
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip variants are written.
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = 'catalog'
+SHARD_SIZE = 1000
+CATALOGS = {
+    'books': {
+        'queryset': lambda: Book.objects.filter(is_available=True),
+        'serialize': public_book_dicts,
+        'scopes': ('books', 'categories'),
+    },
+    'videos': {
+        'queryset': lambda: Video.objects.all(),
+        'serialize': video_dicts,
+        'scopes': ('videos',),
+    },
+}
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+
+
+def catalog_dir(name):
+    return os.path.join(settings.MEDIA_ROOT, SNAPSHOT_DIR, name)
+
+
+def shard_for(pk):
+    return pk // SHARD_SIZE
+
+
+def _shard_name(shard):
+    return f'shard-{shard:04d}.ndjson'
+
+
+def _json_part_name(shard):
+    return f'shard-{shard:04d}.json'
+
+
+def _replace(path, data):
+    tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+# Magic, deflate, no flags, mtime 0, best compression, unknown OS.
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x02\xff'
+# An empty final block with fixed Huffman codes.
+DEFLATE_END = b'\x03\x00'
+
+
+def _deflate_segment(data):
+    """Raw deflate blocks for ``data``, ending byte aligned and not final."""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def _gzip_join(segments, data):
+    """A single-member gzip file of ``data`` from deflate ``segments`` encoding it in order."""
+    trailer = struct.pack('<II', zlib.crc32(data), len(data) & 0xffffffff)
+    return GZIP_HEADER + b''.join(segments) + DEFLATE_END + trailer
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _write_variants(path, data):
+    """Write ``path`` plus its compressed variants, each atomically."""
+    _replace(path, data)
+    _replace(path + '.gz', _gzip(data))
+    if brotli is not None:
+        _replace(path + '.br', brotli.compress(data, quality=9))
+
+
+def _remove_variants(path):
+    for suffix in ('', '.gz', '.br', '.z'):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_shard(directory, shard):
+    _remove_variants(os.path.join(directory, _shard_name(shard)))
+    _remove_variants(os.path.join(directory, _json_part_name(shard)))
+
+
+def _write_joined(path, data, segments, full):
+    if full and brotli is not None:
+        _replace(path + '.br', brotli.compress(data, quality=9))
+    else:
+        # Would no longer match: gzip and identity until the next full build.
+        try:
+            os.remove(path + '.br')
+        except FileNotFoundError:
+            pass
+    _replace(path, data)
+    _replace(path + '.gz', _gzip_join(segments, data))
+
+
+def _existing_shards(directory):
+    return sorted(
+        int(entry[len('shard-'):-len('.ndjson')])
+        for entry in os.listdir(directory)
+        if entry.startswith('shard-') and entry.endswith('.ndjson')
+    )
+
+
+def _encode(row):
+    # Same output as DRF's JSONRenderer with its default compact settings.
+    return json.dumps(row, ensure_ascii=False, separators=(',', ':'))
+
+
+def build_shard(name, shard):
+    """Rewrite one shard from the database; returns its row count."""
+    catalog = CATALOGS[name]
+    directory = catalog_dir(name)
+    queryset = catalog['queryset']().filter(
+        pk__gte=shard * SHARD_SIZE, pk__lt=(shard + 1) * SHARD_SIZE
+    ).order_by('pk')
+    rows = catalog['serialize'](queryset)
+    if not rows:
+        _remove_shard(directory, shard)
+        return 0
+    lines = [_encode(row).encode() for row in rows]
+    path = os.path.join(directory, _shard_name(shard))
+    body = b''.join(line + b'\n' for line in lines)
+    _write_variants(path, body)
+    _replace(path + '.z', _deflate_segment(body))
+    _replace(os.path.join(directory, _json_part_name(shard)) + '.z', _deflate_segment(b','.join(lines)))
+    return len(rows)
+
+
+def refresh(name, shards=None):
+    """
+    Rebuild ``shards`` of catalog ``name`` (all of them when None or when no
+    snapshot exists yet), then reassemble the joined files.
+    """
+    catalog = CATALOGS[name]
+    directory = catalog_dir(name)
+    os.makedirs(directory, exist_ok=True)
+    manifest_path = os.path.join(directory, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        shards = None
+    full = shards is None
+    # Read before querying: writes committed after this point bump the
+    # stamps again, so the snapshot never claims data it may have missed.
+    versions = get_versions(catalog['scopes'])
+
+    if shards is None:
+        wanted = set()
+        last = catalog['queryset']().order_by('-pk').values_list('pk', flat=True).first()
+        if last is not None:
+            wanted = set(range(shard_for(last) + 1))
+        for stale in set(_existing_shards(directory)) - wanted:
+            _remove_shard(directory, stale)
+        shards = wanted
+    for shard in sorted(shards):
+        build_shard(name, shard)
+
+    # Joined from the shard files as they are: no row is re-encoded and
+    # nothing is recompressed.
+    ndjson, ndjson_z, json_parts, json_z, counts = [], [], [], [], {}
+    separator = _deflate_segment(b',')
+    for shard in _existing_shards(directory):
+        path = os.path.join(directory, _shard_name(shard))
+        body = _read(path)
+        counts[str(shard)] = body.count(b'\n')
+        ndjson.append(body)
+        ndjson_z.append(_read(path + '.z'))
+        # Encoded rows never contain a raw newline.
+        json_parts.append(body[:-1].replace(b'\n', b','))
+        if json_z:
+            json_z.append(separator)
+        json_z.append(_read(os.path.join(directory, _json_part_name(shard)) + '.z'))
+    _write_joined(os.path.join(directory, 'catalog.ndjson'), b''.join(ndjson), ndjson_z, full)
+    _write_joined(
+        os.path.join(directory, 'catalog.json'),
+        b'[' + b','.join(json_parts) + b']',
+        [_deflate_segment(b'['), *json_z, _deflate_segment(b']')],
+        full,
+    )
+    _replace(manifest_path, json.dumps({
+        'versions': [str(version) for version in versions],
+        'generated_at': timezone.now().isoformat(),
+        'rows': sum(counts.values()),
+        'shards': counts,
+    }).encode())
+
+
+def _drain(name):
+    with _lock:
+        shards = _pending.pop(name)
+    try:
+        refresh(name, shards)
+    except Exception:
+        logger.exception("Catalog snapshot refresh failed for %s", name)
+    finally:
+        connection.close()
+
+
+def schedule(name, pks=None):
+    """
+    Queue a refresh of the shards holding ``pks`` (everything when None).
+    Requests that arrive while one is queued are merged into it.
+    """
+    global _executor
+    if not getattr(settings, 'CATALOG_SNAPSHOTS', True):
+        return
+    shards = None if pks is None else {shard_for(pk) for pk in pks}
+    if not getattr(settings, 'CATALOG_SNAPSHOTS_ASYNC', True):
+        refresh(name, shards)
+        return
+    with _lock:
+        if name in _pending:
+            queued = _pending[name]
+            _pending[name] = None if queued is None or shards is None else queued | shards
+            return
+        _pending[name] = shards
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog-snapshot')
+    _executor.submit(_drain, name)
+
+
+def current_snapshot(name):
+    """Path of the joined JSON file when it matches the live catalog, else None."""
+    directory = catalog_dir(name)
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    versions = [str(version) for version in get_versions(CATALOGS[name]['scopes'])]
+    if manifest.get('versions') != versions:
+        return None
+    return os.path.join(directory, 'catalog.json')
+
+
+def snapshot_response(name, request):
+    """
+    Serve the current snapshot of ``name`` with the best precompressed
+    variant the client accepts, or None when the snapshot is stale.
+    """
+    path = current_snapshot(name)
+    if path is None:
+        return None
+    accepted = {
+        coding.split(';')[0].strip()
+        for coding in request.headers.get('Accept-Encoding', '').split(',')
+    }
+    for coding, suffix in (('br', '.br'), ('gzip', '.gz'), (None, '')):
+        if coding is not None and coding not in accepted:
+            continue
+        try:
+            handle = open(path + suffix, 'rb')
+        except FileNotFoundError:
+            continue
+        response = FileResponse(handle, content_type='application/json')
+        # An API body, not a download: FileResponse names it after the file.
+        del response['Content-Disposition']
+        if coding:
+            response['Content-Encoding'] = coding
+        response['Vary'] = 'Accept-Encoding'
+        return response
+    return None
@@ -0,0 +1,195 @@
+"""
+In-memory autocomplete index for SearchSuggestionsView.
+
+Each worker keeps sorted (key, value) arrays for book titles, authors,
+publishers and category names and answers prefix lookups with bisect, so a
+keypress never reaches the database. Every word start of a value is indexed,
+which lets "gats" find "The Great Gatsby".
+
+Book/Category signals publish value changes to a numbered change log in the
+shared cache. Workers replay the entries they have not seen yet on their next
+lookup and only fall back to a full rebuild when the log has a gap.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Book, Category
+
+FIELDS = ('title', 'author', 'category', 'publisher')
+BOOK_FIELDS = ('title', 'author', 'publisher')
+
+MAX_KEY_LENGTH = 50
+MAX_WORD_STARTS = 8
+MAX_REPLAY = 500
+SYNC_INTERVAL = 1.0
+CHANGE_TIMEOUT = 3600
+
+GENERATION_KEY = 'library:suggestions:generation'
+CHANGE_KEY = 'library:suggestions:change:{}'
+
+
+def _word_starts(value):
+    """Lowercased keys for every word start of ``value``."""
+    text = value.lower()
+    keys = []
+    for i, char in enumerate(text):
+        if len(keys) >= MAX_WORD_STARTS:
+            break
+        if not char.isspace() and (i == 0 or text[i - 1].isspace()):
+            keys.append(text[i:i + MAX_KEY_LENGTH])
+    return keys
+
+
+class PrefixIndex:
+    """Sorted ``(key, value)`` pairs with reference-counted values."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = []
+        self.refs = Counter()
+        self.truncated = False
+
+    def add(self, value):
+        if not value:
+            return
+        if self.refs[value]:
+            self.refs[value] += 1
+            return
+        keys = _word_starts(value)
+        if len(self.entries) + len(keys) > self.max_entries:
+            # Out of budget: drop the value rather than grow without bound.
+            del self.refs[value]
+            self.truncated = True
+            return
+        self.refs[value] = 1
+        for key in keys:
+            insort(self.entries, (key, value))
+
+    def remove(self, value):
+        if not self.refs.get(value):
+            return
+        self.refs[value] -= 1
+        if self.refs[value]:
+            return
+        del self.refs[value]
+        for key in _word_starts(value):
+            i = bisect_left(self.entries, (key, value))
+            if i < len(self.entries) and self.entries[i] == (key, value):
+                del self.entries[i]
+
+    def load(self, values):
+        """Bulk load, much cheaper than repeated add() on an empty index."""
+        refs = Counter(value for value in values if value)
+        entries = []
+        self.truncated = False
+        for value in list(refs):
+            keys = _word_starts(value)
+            if len(entries) + len(keys) > self.max_entries:
+                del refs[value]
+                self.truncated = True
+                continue
+            entries.extend((key, value) for key in keys)
+        entries.sort()
+        self.entries, self.refs = entries, refs
+
+    def lookup(self, prefix, limit):
+        prefix = prefix.lower()[:MAX_KEY_LENGTH]
+        results = []
+        i = bisect_left(self.entries, (prefix,))
+        while i < len(self.entries) and len(results) < limit:
+            key, value = self.entries[i]
+            if not key.startswith(prefix):
+                break
+            if value not in results:
+                results.append(value)
+            i += 1
+        return results
+
+
+class SuggestionIndex:
+    def __init__(self):
+        max_entries = getattr(settings, 'SEARCH_SUGGESTIONS_MAX_ENTRIES', 500000)
+        self.indexes = {field: PrefixIndex(max_entries) for field in FIELDS}
+        self.generation = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        generation = current_generation()
+        books = Book.objects.values_list(*BOOK_FIELDS)
+        columns = list(zip(*books)) or [(), (), ()]
+        for field, values in zip(BOOK_FIELDS, columns):
+            self.indexes[field].load(values)
+        self.indexes['category'].load(Category.objects.values_list('name', flat=True))
+        self.generation = generation
+
+    def apply(self, changes):
+        for field, added, removed in changes:
+            index = self.indexes[field]
+            for value in removed:
+                index.remove(value)
+            for value in added:
+                index.add(value)
+
+    def sync(self):
+        """Catch up with changes made by this or any other worker."""
+        now = time.monotonic()
+        if self.generation is not None and now - self.checked_at < SYNC_INTERVAL:
+            return
+        self.checked_at = now
+
+        generation = current_generation()
+        if self.generation is None or generation < self.generation \
+                or generation - self.generation > MAX_REPLAY:
+            self.rebuild()
+            return
+        if generation == self.generation:
+            return
+        keys = [CHANGE_KEY.format(n) for n in range(self.generation + 1, generation + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            self.rebuild()
+            return
+        for key in keys:
+            self.apply(changes[key])
+        self.generation = generation
+
+    def suggest(self, query, limit=3):
+        with self.lock:
+            self.sync()
+            return {field: self.indexes[field].lookup(query, limit) for field in FIELDS}
+
+
+def current_generation():
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    return cache.get(GENERATION_KEY, 0)
+
+
+def publish_changes(changes):
+    """Append a batch of ``(field, added, removed)`` changes to the shared log."""
+    changes = [(field, added, removed) for field, added, removed in changes if added or removed]
+    if not changes:
+        return
+    cache.add(GENERATION_KEY, 0, timeout=None)
+    generation = cache.incr(GENERATION_KEY)
+    cache.set(CHANGE_KEY.format(generation), changes, CHANGE_TIMEOUT)
+    # Make this worker pick the change up on its very next lookup.
+    suggestion_index.checked_at = 0.0
+
+
+def book_changes(previous, current):
+    """Diff two ``{field: value}`` snapshots of a book into change tuples."""
+    changes = []
+    for field in BOOK_FIELDS:
+        old, new = previous.get(field), current.get(field)
+        if old != new:
+            changes.append((field, [new] if new else [], [old] if old else []))
+    return changes
+
+
+suggestion_index = SuggestionIndex()
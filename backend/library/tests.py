@@ -0,0 +1,339 @@
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from .archive import archive_returned
+from .fast_serializers import book_dicts, public_book_dicts, video_dicts
+from .models import (
+    ArchivedBorrow, Book, BookHold, BorrowRecord, Category, FeaturedBook, ReminderLog, StaleVideoNeighbours, User,
+    Video, VideoNeighbour,
+)
+from .pagination import decode_cursor, encode_cursor
+from .reminders import dispatch
+from .search import search_books
+from .search_cache import search_cache
+from .serializers import BookSerializer, PublicBookSerializer, VideoSerializer
+from .views import BookCategoryView
+
+TEST_MEDIA = tempfile.mkdtemp()
+
+
+@override_settings(CATALOG_SNAPSHOTS=False, MEDIA_ROOT=TEST_MEDIA)
+class QueryBudgetTests(TestCase):
+    """
+    List endpoints cost a fixed number of queries however many rows they
+    return: each one is measured at two dataset sizes.
+    """
+    SIZES = (2, 8)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member = User.objects.create(username='member', email='member@example.org')
+        cls.admin = User.objects.create(username='admin', email='admin@example.org', role='admin', is_staff=True)
+        cls.fiction = Category.objects.create(name='Fiction')
+        cls.history = Category.objects.create(name='History')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.created = 0
+
+    def add_books(self, count, **fields):
+        books = []
+        for _ in range(count):
+            self.created += 1
+            book = Book.objects.create(
+                title=f'Book {self.created}', author='Author', description='Description',
+                book_uuid=f'BOOK-T{self.created:05d}', total_copies=5, available_copies=5, **fields
+            )
+            book.categories.set([self.fiction, self.history])
+            books.append(book)
+        return books
+
+    def add_borrows(self, count, returned_days_ago=None):
+        now = timezone.now()
+        for book in self.add_books(count):
+            returned = returned_days_ago is not None
+            BorrowRecord.objects.create(
+                user=self.member, book=book, due_date=now + timedelta(days=14), is_returned=returned,
+                return_date=now - timedelta(days=returned_days_ago) if returned else None,
+            )
+
+    def assertQueryBudget(self, queries, grow, get):
+        """``grow(n)`` adds n rows that ``get()`` returns, up to each size."""
+        shown = 0
+        for size in self.SIZES:
+            grow(size - shown)
+            shown = size
+            cache.clear()
+            with self.assertNumQueries(queries):
+                response = get()
+            self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_book_list(self):
+        self.assertQueryBudget(2, self.add_books, lambda: self.client.get('/api/books/'))
+
+    def test_book_list_by_category(self):
+        self.assertQueryBudget(2, self.add_books, lambda: self.client.get('/api/books/category/fiction/'))
+
+    def test_book_category_view(self):
+        view = BookCategoryView.as_view()
+        self.assertQueryBudget(
+            2, self.add_books, lambda: view(APIRequestFactory().get('/'), category='fiction')
+        )
+
+    def test_ebook_list(self):
+        self.assertQueryBudget(
+            2, lambda n: self.add_books(n, book_type='EBOOK'), lambda: self.client.get('/api/ebooks/')
+        )
+
+    def test_featured(self):
+        featured_set = FeaturedBook.objects.create(expires_at=timezone.now() + timedelta(hours=12))
+        self.assertQueryBudget(
+            4, lambda n: featured_set.books.add(*self.add_books(n)), lambda: self.client.get('/api/featured/')
+        )
+
+    def test_user_borrowed(self):
+        self.client.force_authenticate(self.member)
+        self.assertQueryBudget(2, self.add_borrows, lambda: self.client.get('/api/user/borrowed/'))
+
+    def test_user_borrow_history(self):
+        self.client.force_authenticate(self.member)
+
+        def grow(n):
+            self.add_borrows(n, returned_days_ago=400)
+            archive_returned()
+            self.add_borrows(n, returned_days_ago=1)
+
+        response = self.assertQueryBudget(4, grow, lambda: self.client.get('/api/user/borrow-history/'))
+        self.assertEqual(len(response.data), 2 * self.SIZES[-1])
+        self.assertTrue(ArchivedBorrow.objects.exists())
+        # The merge still reads return_date when the fieldset leaves it out.
+        with self.assertNumQueries(2):
+            sparse = self.client.get('/api/user/borrow-history/?fields=id')
+        self.assertEqual([row['id'] for row in sparse.data], [row['id'] for row in response.data])
+
+    def test_user_holds(self):
+        self.client.force_authenticate(self.member)
+        other = User.objects.create(username='other', email='other@example.org')
+
+        def grow(n):
+            for book in self.add_books(n):
+                BookHold.objects.create(user=other, book=book)
+                BookHold.objects.create(user=self.member, book=book)
+
+        response = self.assertQueryBudget(2, grow, lambda: self.client.get('/api/user/holds/'))
+        positions = [hold['queue_position'] for hold in response.data]
+        self.assertEqual(positions, [2] * self.SIZES[-1])
+        holds = BookHold.objects.filter(user=self.member).order_by('created_at')
+        self.assertEqual(positions, [hold.queue_position() for hold in holds])
+
+    def test_admin_borrows(self):
+        self.client.force_authenticate(self.admin)
+        self.assertQueryBudget(2, self.add_borrows, lambda: self.client.get('/api/admin/borrows/'))
+
+
+@override_settings(CATALOG_SNAPSHOTS=False, MEDIA_ROOT=TEST_MEDIA)
+class SearchCursorTests(TestCase):
+    """Cursor pages of a search walk its ranking without reloading all of it."""
+    PAGE_SIZE = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        for n in range(11):
+            # Differing description lengths give differing scores, with ties.
+            Book.objects.create(
+                title=f'Atlas {n}', author='Author', description='Description ' * (n % 4),
+                book_uuid=f'BOOK-S{n:05d}',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def get_page(self, cursor=''):
+        return self.client.get('/api/search/', {'q': 'atlas', 'cursor': cursor, 'page_size': self.PAGE_SIZE})
+
+    def next_cursor(self, response):
+        link = response.data['next']
+        return link and link.split('cursor=')[1].split('&')[0]
+
+    def test_pages_follow_ranking(self):
+        ids, cursor = [], ''
+        while cursor is not None:
+            response = self.get_page(cursor)
+            ids += [book['id'] for book in response.data['results']]
+            cursor = self.next_cursor(response)
+        self.assertEqual(ids, [book_id for book_id, _ in search_books('atlas')])
+
+    @patch('library.search_cache.RANKED_CHUNK', 4)
+    def test_deep_page_reads_only_its_chunks(self):
+        second = self.next_cursor(self.get_page())
+        third = self.next_cursor(self.get_page(second))
+        # With the first chunk gone only a page that spans it needs a rerank.
+        cache.delete(f"{search_cache.key_for('atlas')}:ranked:0")
+        with self.assertNumQueries(2):
+            response = self.get_page(third)
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_cursor_without_index(self):
+        second = self.next_cursor(self.get_page())
+        score, last_id, _ = decode_cursor(second)
+        response = self.get_page(encode_cursor([score, last_id]))
+        self.assertEqual(response.data['results'], self.get_page(second).data['results'])
+
+
+@override_settings(CATALOG_SNAPSHOTS=False, MEDIA_ROOT=TEST_MEDIA)
+class FastSerializerParityTests(TestCase):
+    """The values_list() serializers render byte for byte what DRF renders."""
+
+    @classmethod
+    def setUpTestData(cls):
+        zoology, art = Category.objects.create(name='Zoology'), Category.objects.create(name='Art')
+        cls.with_files = Book.objects.create(
+            title='Kapitel “Eins”', author='Author', description='Description', book_uuid='BOOK-P00001',
+            pdf_file='books/pdfs/one.pdf', cover_image='books/covers/one.png', publication_date='2020-02-29',
+            publisher='Publisher', summary='Summary', book_type='EBOOK', total_copies=3, available_copies=0,
+            external_source='https://example.org/one',
+        )
+        cls.with_files.categories.add(zoology, art)
+        # Null file fields, no categories, no external source.
+        Book.objects.create(title='Two', author='Author', description='Description', book_uuid='BOOK-P00002')
+        Video.objects.create(
+            title='Lecture', instructor='Instructor', description='Description', category='LECTURE',
+            video_file='videos/one.mp4', thumbnail='video_thumbnails/one.png', duration=61,
+            external_source='https://example.org/video',
+        )
+        Video.objects.create(
+            title='Other', instructor='Instructor', description='Description', video_file='videos/two.mp4',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertSameBytes(self, serializer_data, fast_data):
+        renderer = JSONRenderer()
+        self.assertEqual(renderer.render(serializer_data), renderer.render(fast_data))
+
+    def test_book_dicts(self):
+        books = Book.objects.order_by('id')
+        self.assertSameBytes(BookSerializer(books.prefetch_related('categories'), many=True).data, book_dicts(books))
+
+    def test_public_book_dicts(self):
+        books = Book.objects.order_by('id')
+        self.assertSameBytes(
+            PublicBookSerializer(books.prefetch_related('categories'), many=True).data, public_book_dicts(books)
+        )
+
+    def test_video_dicts(self):
+        videos = Video.objects.order_by('id')
+        self.assertSameBytes(VideoSerializer(videos, many=True).data, video_dicts(videos))
+
+
+@override_settings(CATALOG_SNAPSHOTS=False, MEDIA_ROOT=TEST_MEDIA)
+class StaleVideoNeighbourTests(TestCase):
+    """Video saves only queue a neighbour refresh; the command does the work."""
+
+    def add_video(self, title):
+        return Video.objects.create(
+            title=title, instructor='Instructor', description='Description', video_file='videos/one.mp4',
+        )
+
+    def test_refresh_runs_off_the_request_path(self):
+        first, second = self.add_video('Cell biology'), self.add_video('Cell division')
+        self.assertFalse(VideoNeighbour.objects.exists())
+        call_command('build_recommendations', '--stale', stdout=StringIO())
+        self.assertEqual([video.pk for video in first.get_related_videos()], [second.pk])
+        self.assertFalse(StaleVideoNeighbours.objects.exists())
+
+        second.delete()
+        call_command('build_recommendations', '--stale', stdout=StringIO())
+        self.assertEqual(first.get_related_videos(), [])
+
+
+@override_settings(
+    CATALOG_SNAPSHOTS=False, MEDIA_ROOT=TEST_MEDIA, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'
+)
+class ReminderDispatchTests(TestCase):
+    """One message per user over the mail backend, and nothing twice."""
+
+    def test_one_message_per_user_and_no_resend(self):
+        now = timezone.now()
+        users = [
+            User.objects.create(username=f'reader{i}', email=f'reader{i}@example.org' if i else '')
+            for i in range(3)
+        ]
+        for i, user in enumerate(users):
+            for days in (-3, 1):
+                book = Book.objects.create(
+                    title=f'Book {i} {days}', author='Author', description='Description',
+                    book_uuid=f'BOOK-R{i}{days + 3}',
+                )
+                BorrowRecord.objects.create(user=user, book=book, due_date=now + timedelta(days=days))
+
+        self.assertEqual(dispatch(batch_size=1), (2, 4))
+        self.assertEqual(sorted(message.to for message in mail.outbox), [[user.email] for user in users[1:]])
+        self.assertTrue(all('overdue' in message.body and 'due soon' in message.body for message in mail.outbox))
+        # The user without an email is logged too, so the rerun selects nothing.
+        self.assertEqual(ReminderLog.objects.count(), 6)
+        self.assertEqual(dispatch(), (0, 0))
+        self.assertEqual(len(mail.outbox), 2)
+
+
+@override_settings(CATALOG_SNAPSHOTS=False, MEDIA_ROOT=TEST_MEDIA)
+class ConcurrentBorrowTests(TransactionTestCase):
+    """Many members borrowing the last copy at once: exactly one gets it."""
+    BORROWERS = 8
+
+    def test_last_copy_is_not_oversold(self):
+        book = Book.objects.create(
+            title='Last Copy', author='Author', description='Description', book_uuid='BOOK-C00001',
+            total_copies=1, available_copies=1,
+        )
+        users = [User.objects.create(username=f'borrower{i}', email=f'borrower{i}@example.org')
+                 for i in range(self.BORROWERS)]
+        start = threading.Barrier(len(users))
+        outcomes = []
+
+        def borrow(user):
+            try:
+                start.wait()
+                while True:
+                    try:
+                        Book.objects.get(pk=book.pk).borrow_book(user, 14)
+                        outcomes.append('borrowed')
+                        return
+                    except ValueError as error:
+                        outcomes.append(str(error))
+                        return
+                    except OperationalError:
+                        # SQLite's shared in-memory test database reports lock
+                        # contention instead of waiting: try again.
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=borrow, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes.count('borrowed'), 1)
+        self.assertEqual(outcomes.count('No copies available'), len(users) - 1)
+        book.refresh_from_db()
+        self.assertEqual(book.available_copies, 0)
+        self.assertEqual(BorrowRecord.objects.filter(book=book, is_returned=False).count(), 1)
@@ -1,19 +1,22 @@
 # backend/library/urls.py
 from django.urls import path
 from .views import (
-    AdminBorrowView, AdminFeaturedBookView, AdminReturnView, AdminUserListView, AdminVideoView, BookDetailView, BookListView,
-    AdminBookView, BookRecommendations, BookSearchView, BorrowBookView, CategoryReportView, 
-    CategoryView, ExternalSourcesReport, LibraryStatsView, PDFViewerView, ReadingSessionView, ReturnBookView, 
-    SearchSuggestionsView, UserBorrowHistory, UserBorrowedBooks, DownloadBookView, EBookListView, 
-    LibraryReports, OverdueBooksView, VideoDetailView, VideoListView, VideoRecommendations, FeaturedBookView
+    AdminBorrowRecords, AdminBorrowView, AdminBulkBorrowView, AdminBulkReturnView, AdminFeaturedBookView, AdminReturnView, AdminUserListView, AdminVideoView, BookDetailView, BookListView,
+    AdminBookView, BatchBookView, BookHoldView, BookRecommendations, BookSearchView, BorrowBookView, CategoryReportView, 
+    CategoryView, ContentSearchView, FragmentCacheStatsView, ExternalSourcesReport, LibraryStatsView, PDFViewerView, ReadingSessionView, ReturnBookView, 
+    SearchSuggestionsView, UserBorrowHistory, UserBorrowedBooks, UserFeedView, UserHoldsView, DownloadBookView, EBookListView, 
+    LibraryReports, OverdueBooksView, PublicBookListView, SearchCacheStatsView, VideoDetailView, VideoListView, VideoRecommendations, FeaturedBookView
 )
 app_name = "library"  
 urlpatterns = [
     # Public endpoints
     path('books/', BookListView.as_view(), name='book-list'),
+    path('books/batch/', BatchBookView.as_view(), name='book-batch'),
+    path('public/books/', PublicBookListView.as_view(), name='public-book-list'),
     path('categories/', CategoryView.as_view(), name='category-list'),
     path('ebooks/', EBookListView.as_view(), name='ebook-list'),
     path('search/', BookSearchView.as_view(), name='book-search'),
+    path('search/content/', ContentSearchView.as_view(), name='content-search'),
     path('search/suggestions/', SearchSuggestionsView.as_view(), name='search-suggestions'),
     path('featured/', FeaturedBookView.as_view(), name='download-book'),
     path('admin/featured/refresh/', AdminFeaturedBookView.as_view(), name='refresh-featured'),
@@ -25,9 +28,12 @@ urlpatterns = [
     
     # User endpoints
     path('books/<str:book_uuid>/borrow/', BorrowBookView.as_view(), name='borrow-book'),
+    path('books/<str:book_uuid>/hold/', BookHoldView.as_view(), name='book-hold'),
     # path('books/return/<str:book_uuid>/', ReturnBookView.as_view(), name='return-book'),
     path('user/borrowed/', UserBorrowedBooks.as_view(), name='user-borrowed'),
     path('user/borrow-history/', UserBorrowHistory.as_view(), name='borrow-history'),
+    path('user/holds/', UserHoldsView.as_view(), name='user-holds'),
+    path('user/for-you/', UserFeedView.as_view(), name='user-feed'),
     path('books/<str:book_uuid>/read/', PDFViewerView.as_view(), name='read-book'),
     path('books/<str:book_uuid>/reading-progress/', ReadingSessionView.as_view(), name='reading-progress'),
     path('books/<str:book_uuid>/recommendations/', BookRecommendations.as_view(), name='book-recommendations'),
@@ -50,7 +56,12 @@ urlpatterns = [
     path('admin/reports/', LibraryReports.as_view(), name='library-reports'),
     path('admin/reports/categories/', CategoryReportView.as_view(), name='category-report'),
     path('admin/overdue/', OverdueBooksView.as_view(), name='overdue-books'),
+    path('admin/borrows/', AdminBorrowRecords.as_view(), name='admin-borrow-records'),
+    path('admin/circulation/borrow/', AdminBulkBorrowView.as_view(), name='bulk-borrow'),
+    path('admin/circulation/return/', AdminBulkReturnView.as_view(), name='bulk-return'),
     path('admin/borrows/active/', AdminBorrowView.as_view(), name='admin-active-borrows'),
     path('admin/borrows/return/<str:book_uuid>/<int:pk>/', AdminReturnView.as_view(), name='admin-return-book'),
+    path('admin/reports/search-cache/', SearchCacheStatsView.as_view(), name='search-cache-stats'),
+    path('admin/reports/fragment-cache/', FragmentCacheStatsView.as_view(), name='fragment-cache-stats'),
     path('admin/reports/external-sources/', ExternalSourcesReport.as_view(), name='external-sources-report'),
 ]
\ No newline at end of file
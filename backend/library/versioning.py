@@ -0,0 +1,132 @@
+"""
+Catalog version stamps and conditional GET support.
+
+Each scope ("books", "categories", ...) has a version stamp in the shared
+cache that model signals replace after every committed write. Public catalog
+views derive a strong ETag from the stamps they depend on plus the request
+path, so an ``If-None-Match`` revalidation is answered with 304 from the
+cache alone: no database query and no serialization.
+
+Scopes changed by management commands (cron) are "stored": their stamps
+live in the VersionStamp table, because a stamp written to the command's
+own cache is invisible to the web workers. They cost one query per request.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import VersionStamp
+
+KEY_PREFIX = 'library:version'
+
+
+def _key(scope):
+    return f'{KEY_PREFIX}:{scope}'
+
+
+def get_stamps(keys):
+    """``{key: stamp}`` for raw cache ``keys``, starting missing ones fresh."""
+    stamps = cache.get_many(keys)
+    missing = [key for key in keys if key not in stamps]
+    if missing:
+        # Never written or evicted: start a fresh stamp so that nothing
+        # issued before the eviction can match again.
+        stamp = time.time_ns()
+        for key in missing:
+            cache.add(key, stamp, timeout=None)
+        stamps.update(cache.get_many(missing))
+    return {key: stamps.get(key, 0) for key in keys}
+
+
+def get_versions(scopes):
+    stamps = get_stamps([_key(scope) for scope in scopes])
+    return [stamps[_key(scope)] for scope in scopes]
+
+
+def incr_counter(key, delta=1):
+    """Add ``delta`` to the shared counter ``key``; lost increments are fine."""
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+def bump(*scopes, timeout=None):
+    """
+    Replace the stamps of ``scopes``. With ``timeout`` the stamp also
+    expires on its own, for content that goes stale with time.
+    """
+    stamp = time.time_ns()
+    cache.set_many({_key(scope): stamp for scope in scopes}, timeout=timeout)
+
+
+def get_stored_versions(scopes):
+    """Stamps of stored ``scopes``, marked once their ``expires_at`` passed."""
+    if not scopes:
+        return []
+    now = timezone.now()
+    rows = {
+        scope: f'{stamp}:expired' if expires_at is not None and expires_at <= now else stamp
+        for scope, stamp, expires_at in VersionStamp.objects.filter(
+            scope__in=scopes
+        ).values_list('scope', 'stamp', 'expires_at')
+    }
+    return [rows.get(scope, 0) for scope in scopes]
+
+
+def bump_stored(*scopes, expires_at=None):
+    """
+    Replace the stored stamps of ``scopes``, in the caller's transaction.
+    With ``expires_at`` the stamp changes again by itself at that time.
+    """
+    stamp = time.time_ns()
+    VersionStamp.objects.bulk_create(
+        [VersionStamp(scope=scope, stamp=stamp, expires_at=expires_at) for scope in scopes],
+        update_conflicts=True, unique_fields=['scope'], update_fields=['stamp', 'expires_at'],
+    )
+
+
+def make_etag(scopes, request, stored=()):
+    versions = get_versions(scopes) + get_stored_versions(stored)
+    signature = '|'.join([request.get_full_path()] + [str(v) for v in versions])
+    return quote_etag(hashlib.sha1(signature.encode()).hexdigest())
+
+
+def encoded_etag(etag, coding):
+    """The ETag of the ``coding`` (e.g. gzip) encoded variant of ``etag``."""
+    return f'{etag[:-1]}-{coding}"' if coding else etag
+
+
+def catalog_etag(*scopes, stored=()):
+    """
+    Decorator for APIView ``get`` methods whose response only depends on the
+    request path and on data covered by ``scopes`` and ``stored`` scopes. A response the view
+    returns already encoded (precompressed snapshots) gets its own strong
+    ETag, per Content-Encoding.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            etag = make_etag(scopes, request, stored)
+            variants = {encoded_etag(etag, coding) for coding in ('', 'gzip', 'br')}
+            matched = variants.intersection(parse_etags(request.headers.get('If-None-Match', '')))
+            if matched:
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+                etag = min(matched)
+            else:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                etag = encoded_etag(etag, response.get('Content-Encoding'))
+            response['ETag'] = etag
+            response['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -3,7 +3,6 @@ from rest_framework.generics import ListAPIView
 from library.models import User
 from library.serializers import UserMiniSerializer
 from rest_framework.permissions import IsAdminUser
-from django.utils import timezone
 from rest_framework.parsers import JSONParser
 from rest_framework.decorators import parser_classes
 from datetime import timedelta
@@ -15,14 +14,31 @@ from rest_framework.response import Response
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from django.db.models import Count, Q
-from django.db import models
 from library.models import Book, BorrowRecord, Category, User, Video, ReadingSession  
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from .models import BorrowRecord, Category, Book, FeaturedBook
+from .models import ArchivedBorrow, BookHold, BorrowRecord, Category, Book, FeaturedBook
 from rest_framework.pagination import PageNumberPagination
-from .serializers import BookSearchSerializer, BorrowRecordSerializer, CategorySerializer, BookSerializer, FeaturedBookSerializer, PublicBookSerializer, RelatedBookSerializer, RelatedVideoSerializer, VideoSerializer
+from .pagination import BorrowRecordPagination, CatalogPagination, OverduePagination, SearchCursorPagination
+from .fragments import book_fragments, video_fragments
+from .fieldsets import parse_fieldsets, sparse_queryset
+from .fast_serializers import book_dicts, public_book_dicts, video_dicts
+from .facets import book_attributes, facet_counts, filter_ranked, filters_signature, parse_filters
+from .featured import current_set as current_featured_set
+from .feed import CANDIDATES as FEED_CANDIDATES, feed_for
+from .fuzzy import correct_query
+from .pdf_text import search_pages
+from .archive import merge_by, most_borrowed, recent_borrows
+from .batch import resolve_batch
+from .circulation import bulk_borrow, bulk_return
+from .overdue import overdue_count, overdue_records
+from .search import search_books
+from .search_cache import search_cache
+from .snapshots import snapshot_response
+from .suggestions import suggestion_index
+from .versioning import catalog_etag
+from .serializers import BatchRequestSerializer, BookHoldSerializer, BulkBorrowSerializer, BulkReturnSerializer, BookSearchSerializer, ArchivedBorrowSerializer, BorrowRecordSerializer, CategorySerializer, BookSerializer, FeaturedBookSerializer, PublicBookSerializer, RelatedBookSerializer, RelatedVideoSerializer, VideoSerializer
 from django.http import FileResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
@@ -32,6 +48,7 @@ from django.views.decorators.cache import cache_control
 
 
 class CategoryView(APIView):
+    @catalog_etag('categories')
     def get(self, request):
         categories = Category.objects.all()
         serializer = CategorySerializer(categories, many=True)
@@ -99,6 +116,9 @@ class CategoryReportView(APIView):
         return Response(data)
     
 class BookListView(APIView):
+    pagination_class = CatalogPagination
+
+    @catalog_etag('books', 'categories')
     def get(self, request, *args, **kwargs):
         books = Book.objects.filter(is_available=True)
         
@@ -106,18 +126,47 @@ class BookListView(APIView):
         if category:
             books = books.filter(categories__name__icontains=category)
         
-        serializer = BookSerializer(books, many=True)
-        return Response(serializer.data)
+        fields, expand = parse_fieldsets(request)
+        sparse = sparse_queryset(books.prefetch_related('categories'), BookSerializer, fields, expand)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(sparse, request, view=self)
+        if page is not None:
+            serializer = BookSerializer(page, many=True, fields=fields, expand=expand)
+            return paginator.get_paginated_response(serializer.data)
+        if fields is not None or expand is not None:
+            return Response(BookSerializer(sparse, many=True, fields=fields, expand=expand).data)
+        return Response(book_dicts(books))
 
 class BookCategoryView(APIView):
     def get(self, request, category):
         books = Book.objects.filter(
             is_available=True,
             categories__name__icontains=category
-        )
-        serializer = BookSerializer(books, many=True)
+        ).prefetch_related('categories')
+        fields, expand = parse_fieldsets(request)
+        books = sparse_queryset(books, BookSerializer, fields, expand)
+        serializer = BookSerializer(books, many=True, fields=fields, expand=expand)
         return Response(serializer.data)
     
+class BatchBookView(APIView):
+    """Several search/category rails plus explicit book lookups in one round trip."""
+
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        rails, books, missing = resolve_batch(
+            serializer.validated_data['queries'],
+            serializer.validated_data['book_uuids']
+        )
+        book_data = BookSerializer(books, many=True, context={'request': request}).data
+        return Response({
+            'results': rails,
+            'books': {book['book_uuid']: book for book in book_data},
+            'missing': missing,
+        })
+
 class BookDetailView(APIView):
     def get(self, request, book_uuid):
         book = get_object_or_404(Book, book_uuid=book_uuid)
@@ -143,6 +192,50 @@ class BorrowBookView(APIView):
         except Exception as e:
             return Response({"error": "An unexpected error occurred"}, status=500)
         
+class BookHoldView(APIView):
+    """Join (POST) or leave (DELETE) the waiting list of a book with no copies left."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, book_uuid):
+        book = get_object_or_404(Book, book_uuid=book_uuid)
+        try:
+            hold = BookHold.place(request.user, book)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        return Response(BookHoldSerializer(hold).data, status=201)
+
+    def delete(self, request, book_uuid):
+        hold = BookHold.objects.filter(
+            user=request.user,
+            book__book_uuid=book_uuid,
+            status__in=[BookHold.WAITING, BookHold.READY],
+        ).first()
+        if hold is None or not hold.cancel():
+            return Response({"error": "No open hold found"}, status=404)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class UserHoldsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        holds = BookHold.objects.filter(
+            user=request.user,
+            status__in=[BookHold.WAITING, BookHold.READY],
+        ).select_related('book').order_by('created_at')
+        return Response(BookHoldSerializer(BookHold.with_queue_positions(holds), many=True).data)
+
+class UserFeedView(APIView):
+    """Personalized "for you" books; candidates are precomputed (library.feed)."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), FEED_CANDIDATES))
+        except ValueError:
+            limit = 10
+        books = feed_for(request.user, limit)
+        return Response(RelatedBookSerializer(books, many=True).data)
+
 class SearchPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
@@ -150,32 +243,164 @@ class SearchPagination(PageNumberPagination):
 
 class BookSearchView(APIView):
     pagination_class = SearchPagination
+    cursor_pagination_class = SearchCursorPagination
     
     def get(self, request):
         query = request.GET.get('q', '').strip()
         if not query:
             return Response([])
-        
-        books = Book.objects.annotate(
-             relevance=models.Case(
-                models.When(title__icontains=query, then=3),
-                models.When(author__icontains=query, then=2),
-                models.When(publisher__icontains=query, then=1),
-                default=0,
-                output_field=models.IntegerField()
-            )
-        ).filter(
-            Q(title__icontains=query) |
-            Q(author__icontains=query) |
-            Q(publisher__icontains=query) |
-            Q(description__icontains=query)
-        ).order_by('-relevance', 'title')
 
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(books, request)
-        serializer = BookSerializer(page, many=True)
-        return paginator.get_paginated_response(serializer.data)
+        # Optional facets (?facets=true) and facet filters (?category=...,
+        # ?book_type=, ?availability=, ?publisher=) need the whole ranking;
+        # a plain cursor page only the part it shows.
+        filters = parse_filters(request.query_params)
+        want_facets = request.query_params.get('facets') in ('1', 'true')
+        if not filters and not want_facets and self.cursor_pagination_class().is_requested(request):
+            response = self.get_cursor_page(query, request, filters)
+            if response is not None:
+                return response
+
+        cache_key, ranked = self.get_ranked(query)
+
+        # Nothing matched: retry with misspelled words replaced by their
+        # closest title/author words and tell the client what we searched.
+        did_you_mean = None
+        if not ranked and cache_key:
+            did_you_mean = search_cache.get_correction(cache_key)
+            if did_you_mean is None:
+                did_you_mean = correct_query(query) or ''
+                search_cache.set_correction(cache_key, did_you_mean)
+            if did_you_mean:
+                cache_key, ranked = self.get_ranked(did_you_mean)
+
+        # Facets and filters share one attribute fetch.
+        facets = None
+        if filters or want_facets:
+            attributes = search_cache.get_attributes(cache_key) if cache_key else None
+            if attributes is None:
+                attributes = book_attributes(book_id for book_id, _ in ranked)
+                if cache_key:
+                    search_cache.set_attributes(cache_key, attributes)
+            if want_facets:
+                facets = facet_counts(ranked, attributes, filters)
+            ranked = filter_ranked(ranked, attributes, filters)
+
+        if self.cursor_pagination_class().is_requested(request):
+            paginator = self.cursor_pagination_class()
+            page = paginator.paginate_ranked(ranked, request)
+            page_id = f"cursor:{request.query_params.get('cursor', '')}:{paginator.get_page_size(request)}"
+        else:
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(ranked, request, view=self)
+            page_id = f"page:{paginator.page.number}:{paginator.get_page_size(request)}"
+        page_id = f"{page_id}:{filters_signature(filters)}"
+
+        response = paginator.get_paginated_response(self.get_page_data(cache_key, page, page_id))
+        if did_you_mean:
+            response.data['did_you_mean'] = did_you_mean
+        if facets is not None:
+            response.data['facets'] = facets
+        return response
+
+    def get_cursor_page(self, query, request, filters):
+        """
+        An unfiltered cursor page read from just its part of the ranking
+        (see SearchCursorPagination.paginate_ranked_window()): the chunks
+        of the cached ranking it spans or, for a first page, the top of the
+        ranking. None when the whole ranking is needed after all.
+        """
+        cache_key = search_cache.key_for(query)
+        if cache_key is None:
+            return None
+
+        def read(start, stop):
+            window = search_cache.get_ranked_slice(cache_key, start, stop)
+            if window is None and start == 0:
+                # One more than the page, to tell whether there is a next one.
+                top = search_cache.get_ranked(cache_key, stop + 1)
+                if top is None:
+                    top = search_books(query, stop + 1)
+                    search_cache.set_ranked(cache_key, top, stop + 1)
+                # Nothing found: the full path suggests a correction.
+                window = (top[:stop], len(top)) if top else None
+            return window
+
+        paginator = self.cursor_pagination_class()
+        page = paginator.paginate_ranked_window(read, request)
+        if page is None:
+            return None
+        page_id = f"cursor:{request.query_params.get('cursor', '')}:{paginator.get_page_size(request)}"
+        page_id = f"{page_id}:{filters_signature(filters)}"
+        return paginator.get_paginated_response(self.get_page_data(cache_key, page, page_id))
+
+    def get_page_data(self, cache_key, page, page_id):
+        data = search_cache.get_page(cache_key, page_id) if cache_key else None
+        if data is None:
+            books = Book.objects.prefetch_related('categories').in_bulk([book_id for book_id, _ in page])
+            page_books = [books[book_id] for book_id, _ in page if book_id in books]
+            data = BookSerializer(page_books, many=True).data
+            if cache_key:
+                search_cache.set_page(cache_key, page_id, data)
+        return data
+
+    def get_ranked(self, query):
+        cache_key = search_cache.key_for(query)
+        if cache_key is None:
+            return None, []
+        ranked = search_cache.get_ranked(cache_key)
+        if ranked is None:
+            ranked = search_books(query)
+            search_cache.set_ranked(cache_key, ranked)
+        return cache_key, ranked
     
+
+class ContentSearchView(APIView):
+    """Search inside ebook PDFs; each hit names the best matching page."""
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        if not query:
+            return Response([])
+
+        hits = search_pages(query)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(hits, request, view=self)
+        books = Book.objects.in_bulk([hit['book_id'] for hit in page])
+        results = []
+        for hit in page:
+            book = books.get(hit['book_id'])
+            if book is None:
+                continue
+            results.append({
+                'book': RelatedBookSerializer(book, context={'request': request}).data,
+                'page_number': hit['page_number'],
+                'snippet': hit['snippet'],
+            })
+        return paginator.get_paginated_response(results)
+
+
+class SearchCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(search_cache.stats())
+
+    def delete(self, request):
+        search_cache.reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class FragmentCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({'book': book_fragments.stats(), 'video': video_fragments.stats()})
+
+    def delete(self, request):
+        book_fragments.reset_stats()
+        video_fragments.reset_stats()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
 class SearchSuggestionsView(APIView):
     def get(self, request):
         query = request.GET.get('q', '').strip()[:50]
@@ -183,26 +408,9 @@ class SearchSuggestionsView(APIView):
             return Response([])
         
         suggestions = []
-        
-        titles = Book.objects.filter(
-            title__icontains=query
-        ).values_list('title', flat=True).distinct()[:3]
-        suggestions.extend([{'type': 'title', 'value': t} for t in titles])
-        
-        authors = Book.objects.filter(
-            author__icontains=query
-        ).values_list('author', flat=True).distinct()[:3]
-        suggestions.extend([{'type': 'author', 'value': a} for a in authors])
-        
-        categories = Category.objects.filter(
-            name__icontains=query
-        ).values_list('name', flat=True)[:3]
-        suggestions.extend([{'type': 'category', 'value': c} for c in categories])
-        
-        publishers = Book.objects.filter(
-            publisher__icontains=query
-        ).values_list('publisher', flat=True).distinct()[:3]
-        suggestions.extend([{'type': 'publisher', 'value': p} for p in publishers])
+        matches = suggestion_index.suggest(query, limit=3)
+        for field in ('title', 'author', 'category', 'publisher'):
+            suggestions.extend([{'type': field, 'value': v} for v in matches[field]])
         
         if len(query) >= 6 and query.startswith('BOOK-'):
             book_matches = Book.objects.filter(
@@ -222,32 +430,44 @@ class UserBorrowedBooks(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        records = BorrowRecord.objects.filter(user=request.user, is_returned=False)
-        serializer = BorrowRecordSerializer(records, many=True)
+        records = BorrowRecord.objects.filter(
+            user=request.user, is_returned=False
+        ).select_related('user', 'book').prefetch_related('book__categories')
+        fields, expand = parse_fieldsets(request)
+        records = sparse_queryset(records, BorrowRecordSerializer, fields, expand)
+        serializer = BorrowRecordSerializer(records, many=True, fields=fields, expand=expand)
         return Response(serializer.data)
     
 class UserBorrowHistory(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        records = BorrowRecord.objects.filter(
-            user=request.user,
-            is_returned=True
-        ).order_by('-return_date')
-        serializer = BorrowRecordSerializer(records, many=True)
-        return Response(serializer.data)
+        fields, expand = parse_fieldsets(request)
+        tiers = []
+        for model, serializer_class in (
+            (BorrowRecord, BorrowRecordSerializer), (ArchivedBorrow, ArchivedBorrowSerializer)
+        ):
+            records = model.objects.filter(user=request.user).select_related('user', 'book').prefetch_related(
+                'book__categories'
+            ).order_by('-return_date', '-id')
+            if model is BorrowRecord:
+                records = records.filter(is_returned=True)
+            # The merge below orders by return date.
+            records = list(sparse_queryset(
+                records, serializer_class, fields, expand, required_columns=('return_date',)
+            ))
+            data = serializer_class(records, many=True, fields=fields, expand=expand).data
+            tiers.append(zip(records, data))
+        history = merge_by(lambda row: (row[0].return_date, row[0].pk), *tiers, reverse=True)
+        return Response([data for _, data in history])
     
 class FeaturedBookView(APIView):
+    @catalog_etag('books', 'categories', stored=('featured',))
     def get(self, request):
-        featured_set = FeaturedBook.objects.filter(
-            expires_at__gt=timezone.now()
-        ).order_by('-created_at').first()
-
+        # Sets are drawn by `manage.py rotate_featured`, never here.
+        featured_set = current_featured_set()
         if not featured_set:
-            try:
-                featured_set = FeaturedBook.create_featured_set()
-            except Exception as e:
-                return Response({"books": [], "message": str(e)}, status=200)
+            return Response({"books": [], "message": "No featured books yet"}, status=200)
 
         serializer = FeaturedBookSerializer(featured_set)
         return Response(serializer.data)
@@ -289,10 +509,18 @@ class AdminBookView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 class AdminBorrowRecords(APIView):
     permission_classes = [IsAdminUser]
+    pagination_class = BorrowRecordPagination
 
     def get(self, request):
-        records = BorrowRecord.objects.all().select_related('user', 'book')
-        serializer = BorrowRecordSerializer(records, many=True)
+        records = BorrowRecord.objects.all().select_related('user', 'book').prefetch_related('book__categories')
+        fields, expand = parse_fieldsets(request)
+        records = sparse_queryset(records, BorrowRecordSerializer, fields, expand)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(records, request, view=self)
+        if page is not None:
+            serializer = BorrowRecordSerializer(page, many=True, fields=fields, expand=expand)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = BorrowRecordSerializer(records, many=True, fields=fields, expand=expand)
         return Response(serializer.data)
     
 class AdminReturnView(APIView):
@@ -305,13 +533,8 @@ class AdminReturnView(APIView):
                 book__book_uuid=book_uuid,
                 is_returned=False
             )
-            
-            record.book.available_copies += 1
-            record.book.save()
-            
-            record.is_returned = True
-            record.return_date = timezone.now()
-            record.save()
+            if not record.mark_returned():
+                raise BorrowRecord.DoesNotExist
             
             return Response({"message": "Book successfully returned"})
             
@@ -321,14 +544,51 @@ class AdminReturnView(APIView):
                 status=404
             )
         
+class AdminBulkBorrowView(APIView):
+    """Check out a whole cart: ``{"items": [{"book_uuid", "user", "days"}, ...]}``."""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = BulkBorrowSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        results = bulk_borrow(serializer.validated_data['items'])
+        return Response({
+            'results': results,
+            'borrowed': sum(result['status'] == 'borrowed' for result in results),
+            'failed': sum(result['status'] == 'error' for result in results),
+        })
+
+class AdminBulkReturnView(APIView):
+    """Check in a whole cart by ``record_ids`` and/or ``items`` of (book_uuid, user)."""
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = BulkReturnSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        record_results, item_results = bulk_return(
+            serializer.validated_data['record_ids'],
+            serializer.validated_data['items'],
+        )
+        results = record_results + item_results
+        return Response({
+            'records': record_results,
+            'items': item_results,
+            'returned': sum(result['status'] == 'returned' for result in results),
+            'failed': sum(result['status'] == 'error' for result in results),
+        })
+
 class AdminBorrowView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         active_borrows = BorrowRecord.objects.filter(
             is_returned=False
-        ).select_related('user', 'book')
-        serializer = BorrowRecordSerializer(active_borrows, many=True)
+        ).select_related('user', 'book').prefetch_related('book__categories')
+        fields, expand = parse_fieldsets(request)
+        active_borrows = sparse_queryset(active_borrows, BorrowRecordSerializer, fields, expand)
+        serializer = BorrowRecordSerializer(active_borrows, many=True, fields=fields, expand=expand)
         return Response(serializer.data)
 
 class AdminStatsView(APIView):
@@ -337,14 +597,9 @@ class AdminStatsView(APIView):
     def get(self, request):
         stats = {
             "total_active_borrows": BorrowRecord.objects.filter(is_returned=False).count(),
-            "total_overdue": BorrowRecord.objects.filter(
-                is_returned=False,
-                due_date__lt=timezone.now()
-            ).count(),
-            "most_borrowed_books": Book.objects.annotate(
-                borrow_count=models.Count('borrowrecord')
-            ).order_by('-borrow_count')[:5].values('title', 'borrow_count'),
-            "recent_borrows": BorrowRecord.objects.order_by('-borrowed_date')[:5]
+            "total_overdue": overdue_count(),
+            "most_borrowed_books": most_borrowed(5),
+            "recent_borrows": recent_borrows(5)
         }
         return Response(stats)
     
@@ -393,14 +648,12 @@ class LibraryReports(APIView):
                 category[1]: Video.objects.filter(category=category[0]).count()
                 for category in Video.VIDEO_CATEGORIES
             },
-            'overdue_books': BorrowRecord.objects.filter(
-                is_returned=False,
-                due_date__lt=timezone.now()
-            ).count()
+            'overdue_books': overdue_count()
         }
         return Response(data)
 
 class LibraryStatsView(APIView):
+    @catalog_etag('books', 'videos', 'categories', 'users')
     def get(self, request):
         stats = {
             'total_books': Book.objects.count(),
@@ -412,10 +665,14 @@ class LibraryStatsView(APIView):
         return Response(stats)
 
 class PublicBookListView(APIView):
+    @catalog_etag('books', 'categories')
     def get(self, request):
+        if not request.query_params:
+            snapshot = snapshot_response('books', request)
+            if snapshot is not None:
+                return snapshot
         books = Book.objects.filter(is_available=True)
-        serializer = PublicBookSerializer(books, many=True)   
-        return Response(serializer.data)
+        return Response(public_book_dicts(books))
 
 class PublicBookDetailView(APIView):
     def get(self, request, book_uuid):
@@ -424,41 +681,49 @@ class PublicBookDetailView(APIView):
         return Response(serializer.data)
     
 class EBookListView(APIView):
+    pagination_class = CatalogPagination
+
     def get(self, request):
-        ebooks = Book.objects.filter(book_type='EBOOK', is_available=True)
-        print(ebooks) 
-        serializer = BookSerializer(ebooks, many=True)
+        ebooks = Book.objects.filter(book_type='EBOOK', is_available=True).prefetch_related('categories')
+        fields, expand = parse_fieldsets(request)
+        ebooks = sparse_queryset(ebooks, BookSerializer, fields, expand)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(ebooks, request, view=self)
+        if page is not None:
+            serializer = BookSerializer(page, many=True, fields=fields, expand=expand)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = BookSerializer(ebooks, many=True, fields=fields, expand=expand)
         return Response(serializer.data)
 
 class OverdueBooksView(APIView):
     permission_classes = [IsAdminUser]
+    pagination_class = OverduePagination
     
     def get(self, request):
-        overdue = BorrowRecord.objects.filter(
-            is_returned=False,
-            due_date__lt=timezone.now()
-        )
-        serializer = BorrowRecordSerializer(overdue, many=True)
+        overdue = overdue_records().select_related('user', 'book').prefetch_related('book__categories')
+        fields, expand = parse_fieldsets(request)
+        overdue = sparse_queryset(overdue, BorrowRecordSerializer, fields, expand)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(overdue, request, view=self)
+        if page is not None:
+            serializer = BorrowRecordSerializer(page, many=True, fields=fields, expand=expand)
+            return paginator.get_paginated_response(serializer.data)
+        serializer = BorrowRecordSerializer(overdue, many=True, fields=fields, expand=expand)
         return Response(serializer.data)
 
 class ReturnBookView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, book_uuid):
-        try:
-            record = BorrowRecord.objects.get(
-                book__book_uuid=book_uuid,
-                user=request.user,
-                )
-            if not record.is_returned:
-                record.book.return_book()
-                record.is_returned = True
-                record.return_date = timezone.now()
-                record.save()
-                return Response({"message": "Book returned Succesfully"})
-            return Response({"error": "Book already returned"}, status=400)
-        except BorrowRecord.DoesNotExist:
+        record = BorrowRecord.objects.filter(
+            book__book_uuid=book_uuid,
+            user=request.user,
+        ).order_by('is_returned', '-borrowed_date').first()
+        if record is None:
             return Response({"error": "No active borrow record found"}, status=404)
+        if record.mark_returned():
+            return Response({"message": "Book returned Succesfully"})
+        return Response({"error": "Book already returned"}, status=400)
         
 @method_decorator(cache_control(private=True, max_age=3600), name='get')
 class PDFViewerView(APIView):
@@ -470,11 +735,20 @@ class PDFViewerView(APIView):
         if not book.pdf_file:
             return Response({"error": "PDF not available"}, status=404)
         
-        ReadingSession.objects.get_or_create(
-            user=request.user,
-            book=book,
-            defaults={'last_page': 1}
-        )
+        # ?page=N comes from content search hits and moves the reader there.
+        page = request.query_params.get('page')
+        if page and page.isdigit() and int(page) > 0:
+            ReadingSession.objects.update_or_create(
+                user=request.user,
+                book=book,
+                defaults={'last_page': int(page)}
+            )
+        else:
+            ReadingSession.objects.get_or_create(
+                user=request.user,
+                book=book,
+                defaults={'last_page': 1}
+            )
         
         response = FileResponse(
             book.pdf_file.open(),
@@ -496,20 +770,37 @@ class ReadingSessionView(APIView):
     
 
 class VideoListView(APIView):
+    pagination_class = CatalogPagination
+
+    @catalog_etag('videos')
     def get(self, request, *args, **kwargs):
+        if not request.query_params and not kwargs:
+            snapshot = snapshot_response('videos', request)
+            if snapshot is not None:
+                return snapshot
         videos = Video.objects.all()
         
         category = request.query_params.get('category') or kwargs.get('category')
         if category:
             videos = videos.filter(category__iexact=category)
         
-        serializer = VideoSerializer(videos, many=True)
-        return Response(serializer.data)
+        fields, expand = parse_fieldsets(request)
+        sparse = sparse_queryset(videos, VideoSerializer, fields, expand)
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(sparse, request, view=self)
+        if page is not None:
+            serializer = VideoSerializer(page, many=True, fields=fields, expand=expand)
+            return paginator.get_paginated_response(serializer.data)
+        if fields is not None or expand is not None:
+            return Response(VideoSerializer(sparse, many=True, fields=fields, expand=expand).data)
+        return Response(video_dicts(videos))
 
 class VideoCategoryView(APIView):
     def get(self, request, category):
         videos = Video.objects.filter(category__iexact=category)
-        serializer = VideoSerializer(videos, many=True)
+        fields, expand = parse_fieldsets(request)
+        videos = sparse_queryset(videos, VideoSerializer, fields, expand)
+        serializer = VideoSerializer(videos, many=True, fields=fields, expand=expand)
         return Response(serializer.data)
 
 class VideoDetailView(APIView):
@@ -551,6 +842,7 @@ class AdminVideoView(APIView):
             return Response({"error": "Video not found"}, status=status.HTTP_404_NOT_FOUND)
     
 class BookRecommendations(APIView):
+    @catalog_etag('books', 'categories', stored=('recommendations',))
     def get(self, request, book_uuid):
         book = get_object_or_404(Book, book_uuid=book_uuid)
         related_books = book.get_enhanced_recommendations()
@@ -558,8 +850,9 @@ class BookRecommendations(APIView):
         return Response(serializer.data)
 
 class VideoRecommendations(APIView):
-    def get(self, request, video_id):
-        video = get_object_or_404(Video, pk=video_id)
+    @catalog_etag('videos', stored=('recommendations',))
+    def get(self, request, video_uuid):
+        video = get_object_or_404(Video, video_uuid=video_uuid)
         related_videos = video.get_related_videos()
         serializer = RelatedVideoSerializer(related_videos, many=True)
         return Response(serializer.data)    
@@ -591,7 +884,7 @@ class ExternalSourcesReport(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        external_books = Book.objects.exclude(external_source__isnull=True)
+        external_books = Book.objects.exclude(external_source__isnull=True).prefetch_related('categories')
         bookserializer = BookSerializer(external_books, many=True)
         videoserializer = VideoSerializer(external_books, many=True)
         return Response({